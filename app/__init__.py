@@ -1,6 +1,7 @@
-from flask import Flask, render_template
+from flask import Flask, Response, abort, render_template
 from flask_cors import CORS
 from app.extensions import mongo
+from app.log import log_setup
 from config import config
 
 def create_app(config_name='default'):
@@ -8,11 +9,123 @@ def create_app(config_name='default'):
     
     # Load configuration
     app.config.from_object(config[config_name])
-    
+
+    # Logging handlers, format and sampling
+    log_setup.init_app(app)
+
     # Initialize extensions
     mongo.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # orjson for JSON responses and gzip/brotli for the clients that accept it
+    from app.encoding import response_encoding
+    response_encoding.init_app(app)
+    
+    from app.models.webhook_event import (
+        WebhookEvent, event_retention, events_version, hot_events, recent_events_cache, stats_rollups,
+        tenant_router
+    )
+    
+    # Per-tenant collections or sharding by repository owner
+    tenant_router.init_app(app)
+    
+    # Per-commit storage for pushes
+    from app.models.push_commit import commit_store
+    commit_store.init_app(app)
+    
+    # Pre-aggregated statistics
+    stats_rollups.init_app(app)
+    
+    # Retention window of webhook_events (TTL index or archive partitions)
+    event_retention.init_app(app)
+    
+    # Make sure the indexes the app relies on exist; the TTL index of
+    # each events collection comes with its other indexes
+    if app.config.get('MONGO_CREATE_INDEXES', True):
+        try:
+            WebhookEvent.ensure_indexes()
+            if commit_store.enabled:
+                commit_store.ensure_indexes()
+            if stats_rollups.enabled:
+                stats_rollups.ensure_indexes()
+        except Exception as e:
+            app.logger.error("Could not create indexes: %s", e)
+    
+    # Version token behind the API ETags
+    events_version.init_app(app)
+    
+    # Live fan-out of new events to dashboard streams
+    from app.broadcast import event_broadcaster
+    event_broadcaster.init_app(app)
+    
+    # In-memory copy of the newest events; events other workers store are
+    # republished to this worker's live streams
+    recent_events_cache.init_app(app)
+    if recent_events_cache.enabled:
+        try:
+            recent_events_cache.seed()
+        except Exception as e:
+            app.logger.error("Could not seed recent events cache: %s", e)
+        recent_events_cache.on_insert.append(
+            lambda document: event_broadcaster.publish(document['_id'], WebhookEvent.serialize(document, version=2))
+        )
+        recent_events_cache.on_reset.append(event_broadcaster.publish_reset)
+    
+    # JSON backend for webhook payloads
+    from app.webhook.parsing import payload_parser
+    payload_parser.init_app(app)
+    
+    # Webhook secrets per repository and organization
+    from app.webhook.signing import webhook_secrets
+    webhook_secrets.init_app(app)
+    
+    # Per-source rate limits and load shedding, shared by the workers
+    from app.webhook.admission import admission_control
+    admission_control.init_app(app)
+    
+    # (event, action) dispatch table of the webhook handlers
+    from app.webhook.handlers import handler_registry
+    handler_registry.init_app(app)
+    
+    # Process pool for the CPU work of large payloads
+    from app.webhook.offload import payload_offloader
+    payload_offloader.init_app(app)
+    
+    # Seen-set for redelivered webhooks
+    from app.webhook.dedup import delivery_deduplicator
+    delivery_deduplicator.init_app(app)
+    
+    # Background writers; the batcher is set up first so that on exit the
+    # ingest queue drains into it before it flushes
+    from app.models.batcher import write_batcher
+    write_batcher.init_app(app)
+    
+    # Capped copy of the newest events for the dashboard listing
+    hot_events.init_app(app, batcher=write_batcher)
+    if hot_events.enabled:
+        try:
+            hot_events.ensure_collection()
+        except Exception as e:
+            app.logger.error("Could not set up %s: %s", hot_events.COLLECTION_NAME, e)
+    
+    # Local spool for deliveries MongoDB cannot take; replays segments
+    # left behind by earlier processes
+    from app.webhook.spool import delivery_spool
+    delivery_spool.init_app(app)
+    delivery_spool.start()
+    
+    # Moves expired events into the archive partitions
+    event_retention.start()
+    
+    # Start the background ingest workers when async ingest is enabled
+    from app.webhook.ingest import ingest_queue
+    ingest_queue.init_app(app)
+    
+    # Prometheus metrics for this worker
+    from app.metrics import metrics
+    metrics.init_app(app)
+    metrics.register_gauges()
+    
     # Register blueprints
     from app.webhook.routes import webhook
     from app.api.routes import api
@@ -20,6 +133,13 @@ def create_app(config_name='default'):
     app.register_blueprint(webhook)
     app.register_blueprint(api)
     
+    # Maintenance commands (flask stats backfill, flask retention archive,
+    # flask secrets set)
+    from app.cli import retention_cli, secrets_cli, stats_cli
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(retention_cli)
+    app.cli.add_command(secrets_cli)
+    
     # Register main route for UI
     @app.route('/')
     def index():
@@ -30,4 +150,11 @@ def create_app(config_name='default'):
     def health():
         return {'status': 'healthy', 'message': 'Webhook receiver is running'}, 200
     
+    # Prometheus scrape endpoint; each worker process reports its own values
+    @app.route('/metrics')
+    def prometheus_metrics():
+        if not metrics.enabled:
+            abort(404)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
     return app
\ No newline at end of file
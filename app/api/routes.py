@@ -1,43 +1,243 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, current_app, jsonify, make_response, request, stream_with_context
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import dateutil.parser
+import hashlib
 import logging
-from app.models.webhook_event import WebhookEvent
+import time
+from bson import ObjectId
+from app.broadcast import event_broadcaster
+from app.encoding import columnar, response_encoding
+from app.models.push_commit import PushCommit, commit_store
+from app.models.stats import DIMENSIONS, GRANULARITIES, truncate
+from app.models.webhook_event import WebhookEvent, event_retention, events_version, stats_rollups
 
 logger = logging.getLogger(__name__)
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
+def parse_events_query(args, max_limit=200):
+    """Validate /api/events query parameters; raises ValueError on bad input"""
+    try:
+        limit = int(args.get('limit', 50))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f'limit must be between 1 and {max_limit}')
+    
+    before = args.get('before')
+    after = args.get('after')
+    if before and after:
+        raise ValueError('Use either before or after, not both')
+    # Reject malformed cursors up front with a 400
+    for cursor in (before, after):
+        if cursor:
+            WebhookEvent.decode_cursor(cursor)
+    
+    query = {
+        'limit': limit,
+        'before': before,
+        'after': after,
+        'repository': args.get('repository'),
+        'owner': args.get('owner'),
+        'author': args.get('author'),
+        'action': args.get('action')
+    }
+    for name in ('since', 'until'):
+        parsed = parse_timestamp_arg(args, name)
+        if parsed:
+            query[name] = parsed
+    return query
+
+# Bucket length and the window /api/stats covers when since is not given
+STATS_BUCKETS = {
+    'minute': (timedelta(minutes=1), timedelta(hours=1)),
+    'hour': (timedelta(hours=1), timedelta(days=1)),
+    'day': (timedelta(days=1), timedelta(days=30))
+}
+
+def parse_timestamp_arg(args, name):
+    """Optional ISO 8601 query parameter as an aware datetime; raises ValueError"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = dateutil.parser.isoparse(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 timestamp')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def parse_stats_query(args):
+    """Validate /api/stats query parameters; raises ValueError on bad input"""
+    granularity = args.get('granularity', 'hour')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    bucket_size, default_window = STATS_BUCKETS[granularity]
+    
+    until = parse_timestamp_arg(args, 'until') or datetime.now(timezone.utc)
+    since = parse_timestamp_arg(args, 'since') or until - default_window
+    if since >= until:
+        raise ValueError('since must be before until')
+    max_buckets = current_app.config.get('STATS_MAX_BUCKETS', 1500)
+    if (until - since) / bucket_size > max_buckets:
+        raise ValueError(f'Range spans more than {max_buckets} {granularity} buckets')
+    
+    filters = [(dimension, args[dimension]) for dimension in DIMENSIONS if dimension != 'all' and args.get(dimension)]
+    if len(filters) > 1:
+        raise ValueError('Filter by at most one of action, repository or author')
+    selected = filters[0] if filters else ('all', '*')
+    if selected[0] == 'action':
+        selected = ('action', selected[1].upper())
+    
+    return {'granularity': granularity, 'since': since, 'until': until, 'selected': selected}
+
+def response_version(args):
+    """Requested response shape, ?v=1 (default) or ?v=2; raises ValueError"""
+    version = args.get('v', '1')
+    if version not in ('1', '2'):
+        raise ValueError('v must be 1 or 2')
+    return int(version)
+
+# Fields of the columnar format holding names that repeat across events;
+# each distinct string is sent once
+COLUMNAR_DICTIONARY_FIELDS = ('action', 'author', 'repository', 'owner', 'from_branch', 'to_branch')
+
+def response_format(args):
+    """Requested listing layout, ?format=json (default) or ?format=columnar; raises ValueError"""
+    layout = args.get('format', 'json')
+    if layout not in ('json', 'columnar'):
+        raise ValueError('format must be json or columnar')
+    return layout
+
+def events_body(events, version, layout, next_cursor, prev_cursor):
+    """
+    Body of a successful /api/events response
+    The columnar layout sends one array per field instead of one object per
+    event, with the repeated names replaced by indexes into `strings`
+    """
+    serialized = [WebhookEvent.serialize(event, version) for event in events]
+    if layout != 'columnar':
+        return {
+            'success': True,
+            'events': serialized,
+            'count': len(serialized),
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        }
+    columns, strings = columnar(serialized, COLUMNAR_DICTIONARY_FIELDS)
+    return {
+        'success': True,
+        'format': 'columnar',
+        'columns': columns,
+        'strings': strings,
+        'dictionary_fields': [field for field in COLUMNAR_DICTIONARY_FIELDS if field in columns],
+        'count': len(serialized),
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+    }
+
+def make_events_etag(token, args, full_path, coding=None):
+    """Strong ETag for an events response at a collection version token"""
+    # Version 1 messages say "x minutes ago", so those bodies also change
+    # every minute; version 2 bodies only change with the data
+    minute = int(time.time() // 60) if args.get('v', '1') == '1' else 0
+    key = f"{token}|{minute}|{full_path}"
+    if coding:
+        # A compressed body is a different representation
+        key = f"{key}|{coding}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def events_etag():
+    """Strong ETag for an events response, or None if the version is unknown"""
+    token = events_version.token()
+    if token is None:
+        return None
+    coding = response_encoding.negotiate(request.headers.get('Accept-Encoding'))
+    return make_events_etag(token, request.args, request.full_path, coding)
+
+def page_cursors(events, has_more, query):
+    """(next_cursor, prev_cursor) for a page from WebhookEvent.find_events()"""
+    # next_cursor pages to older events, prev_cursor to newer ones
+    paging_newer = query.get('after') is not None
+    has_older = has_more if not paging_newer else bool(events)
+    has_newer = has_more if paging_newer else query.get('before') is not None and bool(events)
+    return (
+        WebhookEvent.encode_cursor(events[-1]) if events and has_older else None,
+        WebhookEvent.encode_cursor(events[0]) if events and has_newer else None
+    )
+
+def conditional(view):
+    """
+    Answer If-None-Match with 304 when the events collection has not changed
+    The version check happens before the view runs, so a 304 costs no query
+    or serialization
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = events_etag()
+        max_age = current_app.config.get('API_CACHE_MAX_AGE', 5)
+        
+        if etag and request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or not etag:
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+        return response
+    return wrapper
+
 @api.route('/events', methods=['GET'])
+@conditional
 def get_events():
     """
     API endpoint to fetch recent webhook events for the UI
     Returns formatted messages for display
+    
+    Query parameters:
+        v           response shape: 1 (message with relative time, default)
+                    or 2 (stored summary + UTC timestamp)
+        format      json (a list of event objects, default) or columnar
+                    (an array per field plus a string dictionary)
+        limit       page size (default 50)
+        before      cursor; return the page of events older than it
+        after       cursor; return the page of events newer than it
+        repository  repository name
+        owner       user or organization owning the repository
+        author      GitHub username
+        action      PUSH, PULL_REQUEST or MERGE
+        since       ISO timestamp, inclusive
+        until       ISO timestamp, exclusive
     """
     try:
-        # Get recent events from MongoDB
-        events = WebhookEvent.get_recent_events(limit=50)
-        
-        # Format events for display
-        formatted_events = []
-        for event in events:
-            formatted_message = WebhookEvent.format_message(event)
-            formatted_events.append({
-                'id': str(event['_id']),
-                'message': formatted_message,
-                'action': event['action'],
-                'author': event['author'],
-                'timestamp': event['timestamp'].isoformat() if hasattr(event['timestamp'], 'isoformat') else str(event['timestamp'])
-            })
+        version = response_version(request.args)
+        layout = response_format(request.args)
+        query = parse_events_query(request.args, current_app.config.get('API_MAX_PAGE_SIZE', 200))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'events': [],
+            'count': 0
+        }), 400
+    
+    try:
+        # Get a page of events from MongoDB
+        events, has_more = WebhookEvent.find_events(**query)
         
-        logger.info(f"Returning {len(formatted_events)} events")
+        logger.debug("Returning %s events", len(events))
         
-        return jsonify({
-            'success': True,
-            'events': formatted_events,
-            'count': len(formatted_events)
-        }), 200
+        # Format events for display
+        next_cursor, prev_cursor = page_cursors(events, has_more, query)
+        return jsonify(events_body(events, version, layout, next_cursor, prev_cursor)), 200
         
     except Exception as e:
-        logger.error(f"Error fetching events: {str(e)}")
+        logger.error("Error fetching events: %s", e)
         return jsonify({
             'success': False,
             'error': 'Failed to fetch events',
@@ -49,19 +249,21 @@ def get_events():
 def get_events_count():
     """
     Get total count of webhook events
+    With archiving on, archived events are reported separately
     """
     try:
-        from app.extensions import get_collection
-        collection = get_collection(WebhookEvent.COLLECTION_NAME)
-        count = collection.count_documents({})
-        
-        return jsonify({
+        count = WebhookEvent.count_events()
+        body = {
             'success': True,
             'count': count
-        }), 200
+        }
+        if event_retention.archive:
+            body['archived'] = event_retention.archived_count()
+        
+        return jsonify(body), 200
         
     except Exception as e:
-        logger.error(f"Error getting events count: {str(e)}")
+        logger.error("Error getting events count: %s", e)
         return jsonify({
             'success': False,
             'error': 'Failed to get events count',
@@ -69,26 +271,24 @@ def get_events_count():
         }), 500
 
 @api.route('/events/latest', methods=['GET'])
+@conditional
 def get_latest_event():
     """
     Get the most recent webhook event
+    Accepts the same ?v= response shape parameter as /events
     """
+    try:
+        version = response_version(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
     try:
         events = WebhookEvent.get_recent_events(limit=1)
         
         if events:
-            event = events[0]
-            formatted_message = WebhookEvent.format_message(event)
-            
             return jsonify({
                 'success': True,
-                'event': {
-                    'id': str(event['_id']),
-                    'message': formatted_message,
-                    'action': event['action'],
-                    'author': event['author'],
-                    'timestamp': event['timestamp'].isoformat() if hasattr(event['timestamp'], 'isoformat') else str(event['timestamp'])
-                }
+                'event': WebhookEvent.serialize(events[0], version)
             }), 200
         else:
             return jsonify({
@@ -98,8 +298,139 @@ def get_latest_event():
             }), 200
             
     except Exception as e:
-        logger.error(f"Error fetching latest event: {str(e)}")
+        logger.error("Error fetching latest event: %s", e)
         return jsonify({
             'success': False,
             'error': 'Failed to fetch latest event'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@api.route('/stats', methods=['GET'])
+def get_stats():
+    """
+    Event counts from the pre-aggregated rollups
+    Reads one document per bucket and value, never the events themselves
+    
+    Query parameters:
+        granularity  minute, hour (default) or day
+        since        ISO timestamp, inclusive (default: 1 hour, 1 day or
+                     30 days before until)
+        until        ISO timestamp, exclusive (default: now)
+        action, repository, author
+                     narrow total and series to one value; the breakdown
+                     always covers every event. Repositories are counted
+                     as owner/name; a bare name matches it under any owner
+    """
+    try:
+        query = parse_stats_query(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        granularity = query['granularity']
+        selected_dimension, selected_value = query['selected']
+        dimensions = {'action', 'repository', 'author', selected_dimension}
+        # A bare repository name selects that name under every owner
+        bare = selected_dimension == 'repository' and '/' not in selected_value
+        rollups = stats_rollups.query(granularity, query['since'], query['until'], dimensions)
+        
+        breakdown = {dimension: {} for dimension in DIMENSIONS if dimension != 'all'}
+        series = {}
+        for rollup in rollups:
+            dimension, value = rollup['dimension'], rollup['value']
+            if dimension in breakdown:
+                breakdown[dimension][value] = breakdown[dimension].get(value, 0) + rollup['count']
+            if dimension == selected_dimension and (
+                    value == selected_value or bare and value.endswith('/' + selected_value)):
+                series[rollup['bucket']] = series.get(rollup['bucket'], 0) + rollup['count']
+        
+        # One entry per bucket, including the empty ones
+        bucket_size = STATS_BUCKETS[granularity][0]
+        bucket = truncate(query['since'], granularity)
+        end = query['until'].astimezone(timezone.utc).replace(tzinfo=None)
+        points = []
+        while bucket < end:
+            points.append({
+                'bucket': bucket.replace(tzinfo=timezone.utc).isoformat(),
+                'count': series.get(bucket, 0)
+            })
+            bucket += bucket_size
+        
+        return jsonify({
+            'success': True,
+            'granularity': granularity,
+            'since': query['since'].isoformat(),
+            'until': query['until'].isoformat(),
+            'total': sum(point['count'] for point in points),
+            'breakdown': breakdown,
+            'series': points
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error fetching stats: %s", e)
+        return jsonify({
+            'success': False,
+            'error': 'Failed to fetch stats'
+        }), 500
+
+@api.route('/events/<event_id>/commits', methods=['GET'])
+def get_event_commits(event_id):
+    """
+    Every commit of a push event, in payload order
+    Only pushes stored with PUSH_EXPANSION_ENABLED have commit records
+    """
+    if not ObjectId.is_valid(event_id):
+        return jsonify({'success': False, 'error': 'Invalid event id', 'commits': [], 'count': 0}), 400
+    
+    try:
+        event = WebhookEvent.get_event(ObjectId(event_id))
+        if event is None:
+            return jsonify({'success': False, 'error': 'Event not found', 'commits': [], 'count': 0}), 404
+        
+        commits = commit_store.find(event['_id']) if event.get('commit_count') else []
+        return jsonify({
+            'success': True,
+            'commits': [PushCommit.serialize(commit) for commit in commits],
+            'count': len(commits)
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error fetching commits of event %s: %s", event_id, e)
+        return jsonify({
+            'success': False,
+            'error': 'Failed to fetch commits',
+            'commits': [],
+            'count': 0
+        }), 500
+
+@api.route('/events/stream', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of newly stored webhook events
+    Resumes after the Last-Event-ID header and sends periodic heartbeats
+    """
+    if not event_broadcaster.enabled:
+        return jsonify({'success': False, 'error': 'Event stream disabled'}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = event_broadcaster.subscribe(last_event_id)
+    if subscription is None:
+        response = jsonify({'success': False, 'error': 'Too many stream subscribers'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    
+    def generate():
+        # Ask EventSource to wait a few seconds between reconnects
+        yield 'retry: 5000\n\n'
+        for frame in subscription.frames(heartbeat):
+            yield frame
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # The server closes the response even when the body is never iterated
+    # (HEAD, or a client gone before the first frame)
+    response.call_on_close(subscription.close)
+    return response
@@ -0,0 +1,558 @@
+# app/asgi.py
+"""
+ASGI variant of the webhook receiver and event API
+
+Serves POST /webhook/receiver, GET /webhook/status, GET /api/events and
+GET /health and GET /metrics with the same contracts as the Flask app,
+on PyMongo's AsyncMongoClient. A worker keeps serving other requests while
+one waits on MongoDB, so concurrency is bounded by I/O rather than by the
+number of workers. Parsing, model construction, serialization, compression,
+cursors and ETags are shared with the Flask app.
+
+    uvicorn asgi:app --workers 2
+
+The dashboard, SSE stream and remaining API routes stay on the Flask app.
+INGEST_MODE and MONGO_BATCH_WRITES do not apply here.
+"""
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.api.routes import (
+    events_body, make_events_etag, page_cursors, parse_events_query, response_format, response_version
+)
+from app.broadcast import event_broadcaster
+from app.encoding import response_encoding
+from app.extensions import PoolStats, client_options, pool_summary
+from app.log import SAMPLED, bind_delivery, log_setup, reset_delivery, update_delivery
+from app.metrics import WEBHOOK_DELIVERIES, WEBHOOK_REQUEST_SECONDS, WEBHOOK_STAGE_SECONDS, metrics
+from app.models.push_commit import commit_store
+from app.models.tenants import merge_pages
+from app.models.webhook_event import WebhookEvent, events_version, recent_events_cache, stats_rollups, tenant_router
+from app.webhook.admission import admission_control
+from app.webhook.dedup import SETTLED_OUTCOMES, delivery_deduplicator
+from app.webhook.handlers import handler_registry
+from app.webhook.ingest import ingest_queue
+from app.webhook.offload import payload_offloader
+from app.webhook.parsing import payload_parser
+from app.webhook.processing import (
+    build_webhook_event, event_label, parse_payload, quick_ignore, repository_full_name,
+    verify_github_signature
+)
+from app.webhook.signing import webhook_secrets
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class Request:
+    """The parts of an ASGI HTTP request the handlers read"""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.args = dict(parse_qsl(self.query_string))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.body = body
+        self.remote_addr = (scope.get('client') or (None,))[0]
+        scheme = scope.get('scheme', 'http')
+        self.host_url = f"{scheme}://{self.headers.get('host', 'localhost')}/"
+
+    @property
+    def full_path(self):
+        # Same form as Flask's request.full_path, so ETags match across apps
+        return f"{self.path}?{self.query_string}"
+
+    @property
+    def is_json(self):
+        mimetype = self.headers.get('content-type', '').split(';')[0].strip()
+        return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+    def if_none_match(self, etag):
+        header = self.headers.get('if-none-match')
+        if not header:
+            return False
+        for candidate in header.split(','):
+            candidate = candidate.strip()
+            if candidate == '*' or candidate.removeprefix('W/').strip('"') == etag:
+                return True
+        return False
+
+def json_response(data, status=200, headers=None):
+    return status, response_encoding.dumps(data), dict(headers or {})
+
+class AsyncWebhookApp:
+    """Raw ASGI application; create it with create_asgi_app()"""
+
+    def __init__(self, config_name='default'):
+        settings = config[config_name]
+        self.config = {name: getattr(settings, name) for name in dir(settings) if name.isupper()}
+        self.client = None
+        self.db = None
+        self._started = None
+        self._flush_task = None
+        self.pool_stats = PoolStats()
+        self.routes = {
+            '/webhook/receiver': ('POST', self.receiver),
+            '/webhook/status': ('GET', self.webhook_status),
+            '/api/events': ('GET', self.get_events),
+            '/health': ('GET', self.health),
+            '/metrics': ('GET', self.prometheus_metrics)
+        }
+
+        # Shared components, configured like create_app() does
+        holder = SimpleNamespace(config=self.config)
+        log_setup.init_app(holder)
+        payload_parser.init_app(holder)
+        response_encoding.init_app(holder)
+        handler_registry.init_app(holder)
+        webhook_secrets.init_app(holder)
+        admission_control.init_app(holder)
+        tenant_router.init_app(holder)
+        delivery_deduplicator.init_app(holder)
+        commit_store.init_app(holder)
+        events_version.init_app(holder)
+        payload_offloader.init_app(holder)
+        metrics.init_app(holder)
+        metrics.register_gauges()
+        metrics.gauge('mongo_pool_connections_open', 'Open MongoDB connections', lambda: self.pool_stats.open)
+        metrics.gauge('mongo_pool_connections_checked_out', 'MongoDB connections in use',
+                      lambda: self.pool_stats.checked_out)
+        # Rollups are flushed by this app's event loop instead of a thread
+        stats_rollups.init_app(holder, background_flush=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        await self.startup()
+
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        request = Request(scope, body)
+
+        route = self.routes.get(request.path)
+        if route is None:
+            status, payload, headers = json_response({'error': 'Not found'}, 404)
+        elif request.method != route[0]:
+            status, payload, headers = json_response({'error': 'Method not allowed'}, 405, {'Allow': route[0]})
+        else:
+            status, payload, headers = await route[1](request)
+
+        content_type = headers.setdefault('Content-Type', 'application/json')
+        if response_encoding.compressible(content_type):
+            headers['Vary'] = 'Accept-Encoding'
+            if status == 200:
+                payload, coding = response_encoding.compress_body(payload, request.headers.get('accept-encoding'))
+                if coding is not None:
+                    headers['Content-Encoding'] = coding
+        headers['Content-Length'] = str(len(payload))
+        origin = request.headers.get('origin')
+        allowed = self.config.get('CORS_ORIGINS', ['*'])
+        if origin and ('*' in allowed or origin in allowed):
+            headers['Access-Control-Allow-Origin'] = '*' if '*' in allowed else origin
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        """Connect to MongoDB and start the rollup flush task, once per event loop"""
+        if self._started is not None:
+            return
+        self._started = True
+        self.client = AsyncMongoClient(
+            self.config['MONGO_URI'], event_listeners=[self.pool_stats], **client_options(self.config)
+        )
+        self.db = self.client.get_default_database()
+        if stats_rollups.enabled:
+            self._flush_task = asyncio.create_task(self._flush_stats_forever())
+        logger.info("ASGI webhook app started")
+
+    async def shutdown(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self.client is not None:
+            await self.flush_stats()
+            await self.client.close()
+            self.client = None
+        self._started = None
+
+    async def _flush_stats_forever(self):
+        while True:
+            await asyncio.sleep(stats_rollups.flush_interval)
+            await self.flush_stats()
+
+    async def flush_stats(self):
+        """Write pending rollup increments with one bulk of $inc upserts"""
+        pending, operations = stats_rollups.take_operations()
+        if not operations:
+            return
+        try:
+            await self.db[stats_rollups.COLLECTION_NAME].bulk_write(operations, ordered=False)
+        except Exception as e:
+            stats_rollups.requeue(pending, e)
+
+    async def refresh_secrets(self):
+        """Re-read webhook_secrets on this loop when due, so lookups never block on MongoDB"""
+        if not webhook_secrets.stale():
+            return
+        try:
+            cursor = self.db[webhook_secrets.COLLECTION_NAME].find({}, {'secret': 1})
+            webhook_secrets.load(await cursor.to_list(None))
+        except Exception as e:
+            webhook_secrets.defer(e)
+
+    async def event_collections(self, owner=None):
+        """Events collections a read visits, listing the tenant collections when due"""
+        if tenant_router.names_stale():
+            tenant_router.store_names(await self.db.list_collection_names(filter=tenant_router.name_filter()))
+        return tenant_router.collection_names(owner)
+
+    async def tenant_collection(self, owner):
+        """Collection for an owner's events, creating a tenant collection's indexes on first use"""
+        name = tenant_router.name_for(owner)
+        if name != WebhookEvent.COLLECTION_NAME and not tenant_router.ensured(name):
+            for keys, options in tenant_router.indexes:
+                await self.db[name].create_index(keys, **options)
+            tenant_router.mark_ensured(name)
+        return self.db[name]
+
+    async def save(self, webhook_event):
+        """Async counterpart of WebhookEvent.save()"""
+        collection = await self.tenant_collection(webhook_event.repository_owner)
+        document = webhook_event.to_dict()
+        if webhook_event.commits:
+            # Commits point at the push, so its _id is needed up front
+            document['_id'] = ObjectId()
+        inserted_id = (await collection.insert_one(document)).inserted_id
+        logger.debug("Webhook event saved with ID: %s", inserted_id)
+
+        if webhook_event.commits:
+            commits = self.db[commit_store.COLLECTION_NAME]
+            try:
+                await commits.insert_many(
+                    [record.to_dict(inserted_id) for record in webhook_event.commits], ordered=False
+                )
+            except Exception as e:
+                if not (isinstance(e, BulkWriteError) and commit_store.only_duplicates(e)):
+                    # Let a redelivery store the push and its commits again
+                    logger.error("Error saving commits of push %s: %s", inserted_id, e)
+                    await collection.delete_one({'_id': inserted_id})
+                    await commits.delete_many({'push_id': inserted_id})
+                    raise
+
+        document['_id'] = inserted_id
+        WebhookEvent.after_insert(document)
+        return inserted_id
+
+    async def receiver(self, request):
+        """GitHub webhook receiver, same contract as the Flask view"""
+        started = time.perf_counter()
+        delivery_id = None
+        event = 'other'
+        outcome = 'failed'
+        admitted = False
+        claimed = False
+        write_seconds = None
+        event_type = request.headers.get('x-github-event')
+        delivery_id = request.headers.get('x-github-delivery')
+        context = bind_delivery(delivery_id=delivery_id, event=event_type)
+        try:
+            signature = request.headers.get('x-hub-signature-256')
+            event = event_label(event_type)
+            logger.debug("Received webhook - Event: %s, Delivery ID: %s", event_type, delivery_id)
+
+            if not event_type:
+                logger.warning("No X-GitHub-Event header found")
+                outcome = 'invalid'
+                return json_response({'error': 'Missing event type header'}, 400)
+
+            if admission_control.rate_limiting:
+                retry_after = admission_control.check_address(request.remote_addr)
+                if retry_after:
+                    logger.warning("Rate limit exceeded for address %s", request.remote_addr, extra=SAMPLED)
+                    outcome = 'rate_limited'
+                    return json_response({'error': 'Rate limit exceeded, retry later', 'delivery_id': delivery_id},
+                                         429, {'Retry-After': str(retry_after)})
+            if admission_control.shedding:
+                if not admission_control.admit():
+                    logger.warning("Shedding load, too many deliveries in flight", extra=SAMPLED)
+                    outcome = 'shed'
+                    return json_response({'error': 'Server overloaded, retry later', 'delivery_id': delivery_id},
+                                         503, {'Retry-After': str(admission_control.retry_after)})
+                admitted = True
+
+            payload_body = request.body
+            await self.refresh_secrets()
+            webhook_secret = webhook_secrets.secret_for(payload_body)
+            if webhook_secret is None and webhook_secrets.configured:
+                logger.error("No webhook secret configured for this delivery's repository")
+                outcome = 'unauthorized'
+                return json_response({'error': 'Invalid signature'}, 401)
+            prepared = None
+            stage_started = time.perf_counter()
+            if payload_offloader.accepts(event_type, payload_body) and not delivery_deduplicator.seen(delivery_id):
+                # Keep the event loop free while a pool process does the CPU work;
+                # known redeliveries are only verified, then rejected by the claim
+                prepared = await asyncio.get_running_loop().run_in_executor(
+                    None, payload_offloader.prepare, event_type, payload_body, delivery_id, signature, webhook_secret
+                )
+                verified = prepared.verified
+                WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'offload')
+            else:
+                verified = not webhook_secret or verify_github_signature(payload_body, signature, webhook_secret)
+                WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'verify')
+            if not verified:
+                logger.error("Invalid webhook signature")
+                outcome = 'unauthorized'
+                return json_response({'error': 'Invalid signature'}, 401)
+
+            if admission_control.rate_limiting:
+                key = admission_control.source_key(request.headers, payload_body, request.remote_addr)
+                retry_after = admission_control.check_rate(key)
+                if retry_after:
+                    logger.warning("Rate limit exceeded for %s", key, extra=SAMPLED)
+                    outcome = 'rate_limited'
+                    return json_response({'error': 'Rate limit exceeded, retry later', 'delivery_id': delivery_id},
+                                         429, {'Retry-After': str(retry_after)})
+
+            if event_type == 'ping':
+                outcome = 'ping'
+                return json_response({
+                    'message': 'Webhook ping received successfully',
+                    'delivery_id': delivery_id
+                })
+
+            ignored_message = quick_ignore(event_type, payload_body)
+            if ignored_message:
+                logger.info(ignored_message, extra=SAMPLED)
+                outcome = 'ignored'
+                response = {'message': ignored_message, 'delivery_id': delivery_id}
+                if event_type not in handler_registry.supported_events:
+                    response['supported_events'] = handler_registry.supported_events
+                return json_response(response)
+
+            if not delivery_deduplicator.claim(delivery_id):
+                logger.info("Duplicate delivery %s, already processed", delivery_id, extra=SAMPLED)
+                outcome = 'duplicate'
+                return self.duplicate_delivery_response(delivery_id)
+            claimed = True
+
+            if not request.is_json or not payload_body:
+                logger.warning("No JSON payload received")
+                outcome = 'invalid'
+                return json_response({'error': 'No JSON payload'}, 400)
+            if prepared is not None:
+                webhook_event, ignored_message, repo_full_name = (
+                    prepared.webhook_event, prepared.ignored_message, prepared.repository
+                )
+            else:
+                stage_started = time.perf_counter()
+                payload = parse_payload(event_type, payload_body)
+                WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'parse')
+                if not payload:
+                    logger.warning("No JSON payload received")
+                    outcome = 'invalid'
+                    return json_response({'error': 'No JSON payload'}, 400)
+                repo_full_name = repository_full_name(payload)
+                logger.debug("Processing %s event for repository: %s", event_type, repo_full_name)
+                stage_started = time.perf_counter()
+                webhook_event, ignored_message = build_webhook_event(event_type, payload, delivery_id)
+                WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'build')
+            update_delivery(repository=repo_full_name)
+
+            if webhook_event is None:
+                outcome = 'ignored'
+                response = {'message': ignored_message, 'repository': repo_full_name, 'delivery_id': delivery_id}
+                if event_type not in handler_registry.supported_events:
+                    response['supported_events'] = handler_registry.supported_events
+                return json_response(response)
+
+            stage_started = time.perf_counter()
+            try:
+                event_id = await self.save(webhook_event)
+            except DuplicateKeyError:
+                outcome = 'duplicate'
+                return self.duplicate_delivery_response(delivery_id)
+            except Exception:
+                write_seconds = time.perf_counter() - stage_started
+                raise
+            write_seconds = time.perf_counter() - stage_started
+            WEBHOOK_STAGE_SECONDS.observe(write_seconds, event, 'insert')
+
+            outcome = 'processed'
+            logger.info("Webhook processed: %s %s by %s, event ID %s", event_type, webhook_event.action,
+                        webhook_event.author, event_id, extra=SAMPLED)
+            return json_response({
+                'message': 'Webhook processed successfully',
+                'event_id': str(event_id),
+                'event_type': event_type,
+                'action': webhook_event.action,
+                'repository': repo_full_name,
+                'author': webhook_event.author,
+                'delivery_id': delivery_id,
+                'timestamp': webhook_event.timestamp.isoformat()
+            })
+
+        except ValueError as e:
+            logger.error("Validation error: %s", e)
+            outcome = 'invalid'
+            return json_response({'error': f'Validation error: {str(e)}'}, 400)
+
+        except Exception as e:
+            logger.exception("Unexpected error processing webhook: %s", e)
+            return json_response({'error': 'Internal server error', 'delivery_id': delivery_id}, 500)
+
+        finally:
+            if admitted:
+                admission_control.release(write_seconds)
+            if claimed and outcome not in SETTLED_OUTCOMES:
+                delivery_deduplicator.forget(delivery_id)
+            WEBHOOK_DELIVERIES.inc(event, outcome)
+            WEBHOOK_REQUEST_SECONDS.observe(time.perf_counter() - started, event)
+            reset_delivery(context)
+
+    @staticmethod
+    def duplicate_delivery_response(delivery_id):
+        return json_response({
+            'message': 'Delivery already processed',
+            'delivery_id': delivery_id,
+            'duplicate': True
+        })
+
+    async def events_token(self):
+        """Collection version token for ETags, read from MongoDB when stale"""
+        token = events_version.current()
+        if token is not None:
+            return token
+        latest_ids = []
+        count = 0
+        for name in await self.event_collections():
+            collection = self.db[name]
+            latest = await collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+            if latest:
+                latest_ids.append(latest['_id'])
+            count += await collection.estimated_document_count()
+        return events_version.store(max(latest_ids, default=None), count)
+
+    async def get_events(self, request):
+        """Paginated event listing, same contract and ETags as GET /api/events"""
+        try:
+            version = response_version(request.args)
+            layout = response_format(request.args)
+            query = parse_events_query(request.args, self.config.get('API_MAX_PAGE_SIZE', 200))
+        except ValueError as e:
+            return json_response({'success': False, 'error': str(e), 'events': [], 'count': 0}, 400,
+                                 {'Cache-Control': 'no-store'})
+
+        try:
+            coding = response_encoding.negotiate(request.headers.get('accept-encoding'))
+            etag = make_events_etag(await self.events_token(), request.args, request.full_path, coding)
+        except Exception as e:
+            logger.error("Error reading events version: %s", e)
+            etag = None
+        cache_headers = {'Cache-Control': f"public, max-age={self.config.get('API_CACHE_MAX_AGE', 5)}"}
+        if etag:
+            cache_headers['ETag'] = f'"{etag}"'
+            if request.if_none_match(etag):
+                return 304, b'', cache_headers
+
+        try:
+            limit = query.pop('limit')
+            mongo_query, direction = WebhookEvent.events_query(**query)
+            # Every events collection is read concurrently on this loop
+            pages = await asyncio.gather(*[
+                self.db[name].find(mongo_query, WebhookEvent.LIST_PROJECTION).sort(
+                    [('timestamp', direction), ('_id', direction)]
+                ).limit(limit + 1).to_list(None)
+                for name in await self.event_collections(query.get('owner'))
+            ])
+            events, has_more = WebhookEvent.page(merge_pages(pages, direction, limit + 1), limit, direction)
+            next_cursor, prev_cursor = page_cursors(events, has_more, query)
+            return json_response(events_body(events, version, layout, next_cursor, prev_cursor), 200,
+                                 cache_headers if etag else {'Cache-Control': 'no-store'})
+        except Exception as e:
+            logger.error("Error fetching events: %s", e)
+            return json_response({
+                'success': False,
+                'error': 'Failed to fetch events',
+                'events': [],
+                'count': 0
+            }, 500, {'Cache-Control': 'no-store'})
+
+    async def webhook_status(self, request):
+        """Same fields as GET /webhook/status on the Flask app"""
+        try:
+            names = await self.event_collections()
+            event_count = sum(await asyncio.gather(*[self.db[name].estimated_document_count() for name in names]))
+            latest_events = await asyncio.gather(*[
+                self.db[name].find_one({}, WebhookEvent.LIST_PROJECTION, sort=[('timestamp', -1), ('_id', -1)])
+                for name in names
+            ])
+            latest = merge_pages([[event] for event in latest_events if event], -1, 1)
+            latest_event = latest[0] if latest else None
+            return json_response({
+                'webhook_endpoint': f"{request.host_url}webhook/receiver",
+                'database_connected': True,
+                'total_events': event_count,
+                'webhook_secret_configured': webhook_secrets.configured,
+                'webhook_secrets': webhook_secrets.stats(),
+                'latest_event': {
+                    'id': str(latest_event['_id']),
+                    'action': latest_event.get('action'),
+                    'author': latest_event.get('author'),
+                    'timestamp': latest_event['timestamp'].isoformat()
+                } if latest_event else None,
+                'supported_events': handler_registry.supported_events,
+                'ingest_queue': ingest_queue.metrics(),
+                'deduplication': delivery_deduplicator.stats(),
+                'event_stream': event_broadcaster.stats(),
+                'recent_cache': recent_events_cache.stats(),
+                'stats_rollups': stats_rollups.stats(),
+                'offload': payload_offloader.stats(),
+                'mongo_pool': pool_summary(client_options(self.config), self.pool_stats),
+                'tenants': tenant_router.stats(),
+                'admission': admission_control.stats(),
+                'server': 'asgi',
+                'status': 'healthy'
+            })
+        except Exception as e:
+            logger.error("Error in status endpoint: %s", e)
+            return json_response({'status': 'error', 'error': str(e), 'database_connected': False}, 500)
+
+    async def prometheus_metrics(self, request):
+        if not metrics.enabled:
+            return json_response({'error': 'Not found'}, 404)
+        return 200, metrics.render().encode('utf-8'), {'Content-Type': 'text/plain; version=0.0.4'}
+
+    async def health(self, request):
+        return json_response({'status': 'healthy', 'message': 'Webhook receiver is running'})
+
+def create_asgi_app(config_name='default'):
+    """Build the ASGI app from the same configuration classes as create_app()"""
+    return AsyncWebhookApp(config_name)
@@ -0,0 +1,120 @@
+# app/broadcast.py
+import json
+import logging
+import queue
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One Server-Sent Events client attached to the broadcaster"""
+
+    def __init__(self, broadcaster, max_queue):
+        self._broadcaster = broadcaster
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def push(self, frame):
+        """Queue a frame without blocking; a client that falls behind is dropped"""
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.closed = True
+            return False
+
+    def frames(self, heartbeat):
+        """Yield SSE frames, with a comment line whenever heartbeat seconds pass quietly"""
+        while not self.closed:
+            try:
+                yield self._queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+
+    def close(self):
+        self.closed = True
+        self._broadcaster.unsubscribe(self)
+
+class EventBroadcaster:
+    """
+    In-process pub/sub fan-out of newly stored events
+
+    Each event is encoded into an SSE frame once and handed to every
+    subscriber. A short history lets reconnecting clients resume from their
+    Last-Event-ID; clients too far behind get a 'reset' frame and refetch.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.max_subscribers = 500
+        self.subscriber_queue_size = 100
+        self._history = deque(maxlen=100)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the broadcaster from the Flask app config"""
+        self.enabled = app.config.get('SSE_ENABLED', True)
+        self.max_subscribers = app.config.get('SSE_MAX_SUBSCRIBERS', 500)
+        self.subscriber_queue_size = app.config.get('SSE_SUBSCRIBER_QUEUE_SIZE', 100)
+        self._history = deque(self._history, maxlen=app.config.get('SSE_HISTORY_SIZE', 100))
+
+    def publish(self, event_id, data):
+        """Encode an event once and fan it out to every subscriber"""
+        if not self.enabled:
+            return
+        frame = f"id: {event_id}\nevent: event\ndata: {json.dumps(data)}\n\n"
+        with self._lock:
+            self._history.append((str(event_id), frame))
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if not subscription.push(frame):
+                logger.warning("Dropping slow event stream subscriber")
+                self.unsubscribe(subscription)
+
+    def publish_reset(self):
+        """Tell every subscriber to reload its event list"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._history.clear()
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push('event: reset\ndata: {}\n\n')
+
+    def subscribe(self, last_event_id=None):
+        """
+        Attach a new subscriber, replaying history after last_event_id
+        Returns None when the subscriber limit is reached
+        """
+        subscription = Subscription(self, self.subscriber_queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id:
+                ids = [event_id for event_id, _ in self._history]
+                if last_event_id in ids:
+                    for _, frame in list(self._history)[ids.index(last_event_id) + 1:]:
+                        subscription.push(frame)
+                else:
+                    # Too far behind to replay; the client reloads the list
+                    subscription.push('event: reset\ndata: {}\n\n')
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'subscribers': len(self._subscribers),
+                'history': len(self._history)
+            }
+
+event_broadcaster = EventBroadcaster()
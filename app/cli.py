@@ -0,0 +1,66 @@
+# app/cli.py
+import click
+import dateutil.parser
+from datetime import timezone
+from flask.cli import AppGroup
+
+stats_cli = AppGroup('stats', help='Statistics rollup maintenance.')
+
+@stats_cli.command('backfill')
+@click.option('--since', help='ISO date; rebuild from the start of that day (default: everything).')
+def backfill_stats(since):
+    """Rebuild the stats rollups from the stored events"""
+    from app.models.webhook_event import stats_rollups
+    if since:
+        since = dateutil.parser.isoparse(since)
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+    events, rollups = stats_rollups.backfill(since)
+    click.echo(f"Backfilled {rollups} rollups from {events} events")
+
+retention_cli = AppGroup('retention', help='Event retention and archiving.')
+
+@retention_cli.command('archive')
+def archive_events():
+    """Move events past RETENTION_DAYS into the archive partitions"""
+    from app.models.webhook_event import event_retention
+    if not event_retention.archive:
+        raise click.ClickException("RETENTION_MODE is not 'archive'")
+    moved = event_retention.run()
+    click.echo(f"Archived {moved} events stored more than {event_retention.days} days ago")
+
+@retention_cli.command('status')
+def retention_status():
+    """Show the retention settings and the archive partitions"""
+    from app.extensions import get_collection
+    from app.models.webhook_event import event_retention
+    click.echo(f"Mode: {event_retention.mode}, {event_retention.days} days")
+    for name in event_retention.partitions(refresh=True):
+        click.echo(f"{name}: {get_collection(name).estimated_document_count()} events")
+
+secrets_cli = AppGroup('secrets', help='Webhook secrets per repository or organization (WEBHOOK_SECRETS_STORE=mongo).')
+
+@secrets_cli.command('set')
+@click.argument('scope')
+@click.option('--secret', prompt=True, hide_input=True, confirmation_prompt=True, help='The webhook secret.')
+def set_secret(scope, secret):
+    """Store the secret for SCOPE, an 'owner/repository' or an 'owner'"""
+    from app.webhook.signing import webhook_secrets
+    webhook_secrets.set(scope, secret)
+    click.echo(f"Stored the webhook secret for {scope.lower()}")
+
+@secrets_cli.command('delete')
+@click.argument('scope')
+def delete_secret(scope):
+    """Remove the stored secret for SCOPE"""
+    from app.webhook.signing import webhook_secrets
+    if not webhook_secrets.delete(scope):
+        raise click.ClickException(f"No stored secret for {scope}")
+    click.echo(f"Deleted the webhook secret for {scope.lower()}")
+
+@secrets_cli.command('list')
+def list_secrets():
+    """List the scopes with a stored secret (not the secrets)"""
+    from app.webhook.signing import webhook_secrets
+    for scope in webhook_secrets.stored_scopes():
+        click.echo(scope)
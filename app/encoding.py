@@ -0,0 +1,181 @@
+# app/encoding.py
+import gzip
+import json
+import logging
+from bson import json_util
+from flask import Flask, request
+from flask_pymongo import BSONProvider
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Response types worth compressing; everything else (images, fonts, files
+# sent with send_file) is passed through
+COMPRESSIBLE_TYPES = frozenset([
+    'application/json', 'application/javascript', 'text/javascript', 'text/css', 'text/html', 'text/plain'
+])
+
+# Content codings this module can produce, in order of preference
+CODINGS = ('br', 'gzip')
+
+def columnar(rows, dictionary_fields=()):
+    """
+    Turn a list of dicts with the same keys into (columns, strings)
+
+    columns maps each key to the list of its values in row order. String
+    values of dictionary_fields are replaced by their index in strings,
+    which holds every such string once; None stays None.
+    """
+    if not rows:
+        return {}, []
+    strings = []
+    positions = {}
+    columns = {}
+    for field in rows[0]:
+        values = [row.get(field) for row in rows]
+        if field in dictionary_fields:
+            encoded = []
+            for value in values:
+                if value is not None:
+                    position = positions.get(value)
+                    if position is None:
+                        position = positions[value] = len(strings)
+                        strings.append(value)
+                    value = position
+                encoded.append(value)
+            values = encoded
+        columns[field] = values
+    return columns, strings
+
+class OrjsonProvider(BSONProvider):
+    """
+    Flask JSON provider encoding with orjson
+
+    Replaces flask_pymongo's BSONProvider with the same output up to
+    whitespace: datetimes, ObjectIds and other types orjson does not take
+    as-is still go through bson.json_util ({"$date": ...}, {"$oid": ...}).
+    Parsing stays with BSONProvider.
+    """
+
+    OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson is not None else 0
+
+    @staticmethod
+    def default(obj):
+        return json_util.default(obj, json_options=json_util.RELAXED_JSON_OPTIONS)
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Bytes go straight into the response, without a str round trip
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=self.OPTIONS),
+                                        mimetype='application/json')
+
+class ResponseEncoding:
+    """
+    JSON encoding and negotiated compression of HTTP responses
+
+    With JSON_ENCODER 'auto' and orjson installed, JSON responses of the
+    Flask app and the ASGI app are encoded with orjson instead of the
+    stdlib encoder. Finished responses of a compressible type, of at least
+    COMPRESSION_MIN_SIZE bytes, are compressed with brotli (when the brotli
+    package is installed) or gzip, whichever the client's Accept-Encoding
+    prefers. Streamed responses such as the SSE stream and static files
+    are left alone. Conditional responses put the negotiated coding in
+    their ETag, so each representation has its own.
+    """
+
+    def __init__(self, app=None):
+        self.encoder = self._available('auto')
+        self.compression = True
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        self.codings = self._codings(CODINGS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure encoding from the app config; on a Flask app also install the provider and hook"""
+        self.encoder = self._available(app.config.get('JSON_ENCODER', 'auto'))
+        self.compression = app.config.get('COMPRESSION_ENABLED', True)
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+        self.codings = self._codings(app.config.get('COMPRESSION_CODINGS') or CODINGS)
+        if self.compression and not self.codings:
+            logger.warning("None of COMPRESSION_CODINGS can be produced here, responses are not compressed")
+            self.compression = False
+        if isinstance(app, Flask):
+            if self.encoder == 'orjson':
+                app.json = OrjsonProvider(app)
+            app.after_request(self.compress_response)
+        logger.info("JSON responses encoded with %s, compression %s", self.encoder,
+                    ', '.join(self.codings) if self.compression else 'off')
+
+    @staticmethod
+    def _available(preferred):
+        if preferred in ('auto', 'orjson') and orjson is not None:
+            return 'orjson'
+        return 'json'
+
+    @staticmethod
+    def _codings(codings):
+        return [coding for coding in codings if coding == 'gzip' or (coding == 'br' and brotli is not None)]
+
+    def dumps(self, data):
+        """Compact JSON encoding of data as bytes"""
+        if self.encoder == 'orjson':
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    def compressible(self, content_type):
+        """Whether responses of this Content-Type are compressed (so they vary on Accept-Encoding)"""
+        return self.compression and content_type.split(';')[0].strip() in COMPRESSIBLE_TYPES
+
+    def negotiate(self, accept_encoding):
+        """The coding to use for a request's Accept-Encoding header, or None"""
+        if not self.compression or not accept_encoding:
+            return None
+        return parse_accept_header(accept_encoding).best_match(self.codings)
+
+    def compress(self, body, coding):
+        if coding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        # mtime=0 keeps the output the same for the same body
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_body(self, body, accept_encoding):
+        """(body, coding) with body compressed when it is large enough and the client accepts a coding"""
+        if len(body) < self.min_size:
+            return body, None
+        coding = self.negotiate(accept_encoding)
+        if coding is None:
+            return body, None
+        return self.compress(body, coding), coding
+
+    def compress_response(self, response):
+        """after_request hook compressing a finished Flask response"""
+        if response.direct_passthrough or response.is_streamed or not self.compressible(response.content_type or ''):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        body, coding = self.compress_body(response.get_data(), request.headers.get('Accept-Encoding'))
+        if coding is not None:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = coding
+        return response
+
+response_encoding = ResponseEncoding()
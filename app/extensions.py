@@ -1,7 +1,221 @@
-from flask_pymongo import PyMongo
+# app/extensions.py
+import logging
+import os
+import threading
+from collections import Counter, deque
+from flask_pymongo import BSONObjectIdConverter, BSONProvider
+from pymongo import MongoClient, WriteConcern, uri_parser
+from pymongo.monitoring import ConnectionPoolListener
+
+logger = logging.getLogger(__name__)
+
+def client_options(config):
+    """MongoClient keyword arguments for the MONGO_* pool, timeout and write settings"""
+    options = {
+        'maxPoolSize': config.get('MONGO_MAX_POOL_SIZE', 100),
+        'minPoolSize': config.get('MONGO_MIN_POOL_SIZE', 0),
+        'maxIdleTimeMS': config.get('MONGO_MAX_IDLE_TIME_MS'),
+        'waitQueueTimeoutMS': config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        'connectTimeoutMS': config.get('MONGO_CONNECT_TIMEOUT_MS', 10000),
+        'socketTimeoutMS': config.get('MONGO_SOCKET_TIMEOUT_MS'),
+        'serverSelectionTimeoutMS': config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        'retryWrites': config.get('MONGO_RETRY_WRITES', True)
+    }
+    write_concern = config.get('MONGO_WRITE_CONCERN')
+    if write_concern:
+        options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+    if config.get('MONGO_JOURNAL') is not None:
+        options['journal'] = config['MONGO_JOURNAL']
+    if config.get('MONGO_WRITE_TIMEOUT_MS'):
+        options['wTimeoutMS'] = config['MONGO_WRITE_TIMEOUT_MS']
+    if config.get('MONGO_COMPRESSORS'):
+        options['compressors'] = config['MONGO_COMPRESSORS']
+    return {name: value for name, value in options.items() if value is not None}
+
+def pool_summary(options, pool_stats):
+    """Client pool settings from client_options() alongside PoolStats counters"""
+    summary = {
+        'max_pool_size': options.get('maxPoolSize'),
+        'min_pool_size': options.get('minPoolSize'),
+        'wait_queue_timeout_ms': options.get('waitQueueTimeoutMS'),
+        'compressors': options.get('compressors'),
+        'write_concern': WriteConcern(
+            w=options.get('w'), j=options.get('journal'), wtimeout=options.get('wTimeoutMS')
+        ).document or 'server default'
+    }
+    summary.update(pool_stats.stats())
+    return summary
+
+class PoolStats(ConnectionPoolListener):
+    """
+    Connection pool counters from the driver's CMAP events
+
+    Tracks connections open and checked out (current and peak), checkout
+    failures by reason and how long requests waited for a connection.
+    """
+
+    WAIT_SAMPLES = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open = 0
+            self.checked_out = 0
+            self.peak_checked_out = 0
+            self.checkouts = 0
+            self.pool_clears = 0
+            self.failures = Counter()
+            self._waits = deque(maxlen=self.WAIT_SAMPLES)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            if event.duration is not None:
+                self._waits.append(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures[event.reason] += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self):
+        """Counters plus checkout wait percentiles in milliseconds"""
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                'connections_open': self.open,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': dict(self.failures),
+                'pool_clears': self.pool_clears
+            }
+        stats['checkout_wait_ms'] = {
+            'p50': round(waits[int(len(waits) * 0.50)] * 1000, 3) if waits else None,
+            'p99': round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 3) if waits else None,
+            'max': round(waits[-1] * 1000, 3) if waits else None
+        }
+        return stats
+
+class Mongo:
+    """
+    MongoDB client created lazily in each process
+
+    gunicorn imports the app in the master and forks workers; a MongoClient
+    must not cross a fork, so the client is created on first use in every
+    process (and again in a child that inherited one). Collection handles
+    are cached per client so get_collection() is a dictionary lookup.
+    """
+
+    def __init__(self, app=None):
+        self.uri = None
+        self.options = {}
+        self.pool_stats = PoolStats()
+        self._client = None
+        self._db = None
+        self._pid = None
+        self._collections = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read the connection settings from the Flask app config"""
+        self.uri = app.config.get('MONGO_URI')
+        if not self.uri:
+            raise ValueError("You must set the MONGO_URI config variable")
+        self.options = client_options(app.config)
+        self._pid = None
+        app.url_map.converters['ObjectId'] = BSONObjectIdConverter
+        app.json = BSONProvider(app)
+
+    def _connect(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Sockets and monitor threads do not survive a fork; drop the
+                # parent's client without closing it from the child
+                self.pool_stats.reset()
+            self._client = MongoClient(self.uri, event_listeners=[self.pool_stats], **self.options)
+            database_name = uri_parser.parse_uri(self.uri)['database']
+            self._db = self._client[database_name] if database_name else None
+            self._collections = {}
+            self._pid = os.getpid()
+            logger.info("Created MongoDB client in process %s (maxPoolSize %s)", self._pid, self.options.get('maxPoolSize'))
+
+    @property
+    def cx(self):
+        if self._pid != os.getpid():
+            self._connect()
+        return self._client
+
+    @property
+    def db(self):
+        if self._pid != os.getpid():
+            self._connect()
+        return self._db
+
+    @db.setter
+    def db(self, database):
+        # Point the app at another database object (benchmarks, tools)
+        with self._lock:
+            self._db = database
+            self._collections = {}
+            self._pid = os.getpid()
+
+    def collection(self, name):
+        """Cached collection handle for this process's client"""
+        if self._pid != os.getpid():
+            self._connect()
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = self._db[name]
+        return collection
+
+    def stats(self):
+        """Pool settings and counters for /webhook/status"""
+        stats = {'pid': self._pid}
+        stats.update(pool_summary(self.options, self.pool_stats))
+        return stats
 
 # Initialize MongoDB
-mongo = PyMongo()
+mongo = Mongo()
 
 def get_db():
     """Get database instance"""
@@ -9,4 +223,4 @@ def get_db():
 
 def get_collection(collection_name):
     """Get specific collection"""
-    return mongo.db[collection_name]
\ No newline at end of file
+    return mongo.collection(collection_name)
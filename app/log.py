@@ -0,0 +1,169 @@
+# app/log.py
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Fields of the delivery being handled, attached to every record logged
+# while it is in progress (per thread, and per task under asyncio)
+_delivery = contextvars.ContextVar('delivery', default=None)
+
+CONTEXT_FIELDS = ('delivery_id', 'event', 'repository')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s%(context)s'
+
+# Pass as extra= on success-path records; LOG_SAMPLE_RATE of them are kept
+SAMPLED = {'sampled': True}
+
+def bind_delivery(**fields):
+    """Start a delivery context; returns a token for reset_delivery()"""
+    return _delivery.set(fields)
+
+def update_delivery(**fields):
+    """Add fields (e.g. the repository once parsed) to the current delivery"""
+    current = _delivery.get()
+    if current is not None:
+        current.update(fields)
+
+def reset_delivery(token):
+    _delivery.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Copy the delivery context onto records, in the thread that logs them"""
+
+    def filter(self, record):
+        context = _delivery.get()
+        for name in CONTEXT_FIELDS:
+            setattr(record, name, context.get(name) if context else None)
+        if context:
+            record.context = ' [' + ' '.join(
+                f'{name}={context[name]}' for name in CONTEXT_FIELDS if context.get(name)
+            ) + ']'
+        else:
+            record.context = ''
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records logged with extra=SAMPLED; others always pass"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or not getattr(record, 'sampled', False):
+            return True
+        return random.random() < self.rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the delivery context as fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler whose listener thread runs in the current process
+
+    The listener is (re)started on the first record in each process, so it
+    works when gunicorn forks workers after the app is imported. Records are
+    not formatted here: message formatting and I/O happen on the listener
+    thread, off the request path.
+    """
+
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited across fork has no listener; start afresh
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Only render the traceback now; it refers to frames that change
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._ensure_listener()
+        self.queue.put_nowait(record)
+
+    def stop(self):
+        """Flush queued records and stop the listener thread"""
+        with self._lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+                self.listener = None
+                self._pid = None
+
+class LogSetup:
+    """
+    Root logger configuration for the app
+
+    LOG_FORMAT picks human-readable text or one JSON object per line,
+    LOG_SAMPLE_RATE thins routine success-path records, and LOG_QUEUE moves
+    formatting and writing to a background thread.
+    """
+
+    def __init__(self, app=None):
+        self.handler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, stream=None):
+        """Install the handler on the root logger, replacing an earlier one"""
+        root = logging.getLogger()
+        if self.handler is not None:
+            root.removeHandler(self.handler)
+            if isinstance(self.handler, ProcessQueueHandler):
+                self.handler.stop()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        if app.config.get('LOG_FORMAT', 'text') == 'json':
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        handler = ProcessQueueHandler(output) if app.config.get('LOG_QUEUE', True) else output
+        handler.addFilter(SamplingFilter(app.config.get('LOG_SAMPLE_RATE', 1.0)))
+        handler.addFilter(ContextFilter())
+        root.addHandler(handler)
+        root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+        self.handler = handler
+
+log_setup = LogSetup()
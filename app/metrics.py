@@ -0,0 +1,231 @@
+# app/metrics.py
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from HMAC checks (~10µs) to slow inserts
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter; inc() touches only the calling thread's shard"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def inc(self, *label_values, amount=1):
+        if not self.registry.enabled:
+            return
+        shard = self.registry.shard()
+        key = (self.name, label_values)
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self, shards):
+        totals = {}
+        for shard in shards:
+            for (name, label_values), value in shard.items():
+                if name == self.name:
+                    totals[label_values] = totals.get(label_values, 0) + value
+        return [
+            f'{self.name}{_labels(self.labels, label_values)} {_number(value)}'
+            for label_values, value in sorted(totals.items())
+        ]
+
+class Histogram:
+    """
+    Bucketed latency histogram
+
+    Each thread keeps its own per-bucket counts and sum for every label set;
+    they are only added up when /metrics is scraped.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        if not self.registry.enabled:
+            return
+        shard = self.registry.shard()
+        key = (self.name, label_values)
+        cells = shard.get(key)
+        if cells is None:
+            # One count per bucket, one for +Inf, then the sum
+            cells = shard[key] = [0] * (len(self.buckets) + 2)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def collect(self, shards):
+        totals = {}
+        for shard in shards:
+            for (name, label_values), cells in shard.items():
+                if name != self.name:
+                    continue
+                merged = totals.get(label_values)
+                if merged is None:
+                    totals[label_values] = list(cells)
+                else:
+                    for index, value in enumerate(cells):
+                        merged[index] += value
+        lines = []
+        for label_values, cells in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), cells):
+                cumulative += count
+                le = 'le="+Inf"' if bound == '+Inf' else f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, label_values)} {_number(cells[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labels, label_values)} {cumulative}')
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time, so it costs nothing to keep current"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def collect(self, shards):
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.error("Error reading gauge %s: %s", self.name, e)
+            return []
+        return [] if value is None else [f'{self.name} {_number(value)}']
+
+class MetricsRegistry:
+    """
+    Prometheus metrics for this worker process
+
+    Counters and histograms write into a dict owned by the calling thread,
+    so the request path takes no lock; a lock is only held once per thread
+    to register its shard. Scraping copies every shard and adds them up.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self._local = threading.local()
+        self._shards = []
+        self._metrics = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure metrics from the Flask app config"""
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+
+    def shard(self):
+        """This thread's metric values"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def _register(self, metric):
+        # Registering a name again replaces it (create_app() may run repeatedly)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(self, name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labels, buckets))
+
+    def gauge(self, name, documentation, callback):
+        return self._register(Gauge(name, documentation, callback))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic, so owners may keep writing while we read
+        shards = [shard.copy() for shard in shards]
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.collect(shards))
+        return '\n'.join(lines) + '\n'
+
+    def register_gauges(self):
+        """Gauges for the queues, buffers and pools of this process"""
+        from app.broadcast import event_broadcaster
+        from app.extensions import mongo
+        from app.models.batcher import write_batcher
+        from app.models.webhook_event import stats_rollups
+        from app.webhook.dedup import delivery_deduplicator
+        from app.webhook.ingest import ingest_queue
+        from app.webhook.spool import delivery_spool
+
+        self.gauge('webhook_ingest_queue_depth', 'Deliveries waiting in the async ingest queue',
+                   lambda: ingest_queue.metrics()['depth'])
+        self.gauge('webhook_ingest_queue_capacity', 'Size of the async ingest queue',
+                   lambda: ingest_queue.metrics()['capacity'])
+        self.gauge('webhook_write_batcher_pending', 'Documents waiting in the write batcher',
+                   write_batcher.pending_count)
+        self.gauge('webhook_stats_rollups_pending', 'Rollup increments waiting to be flushed',
+                   lambda: stats_rollups.stats()['pending'])
+        self.gauge('webhook_spool_pending_bytes', 'Spooled delivery bytes waiting to be replayed into MongoDB',
+                   lambda: delivery_spool.pending_bytes() if delivery_spool.enabled else None)
+        self.gauge('webhook_dedup_seen_size', 'Delivery ids in the deduplication seen-set',
+                   lambda: delivery_deduplicator.stats()['size'])
+        self.gauge('webhook_event_stream_subscribers', 'Open live event streams',
+                   lambda: event_broadcaster.stats()['subscribers'])
+        self.gauge('mongo_pool_connections_open', 'Open MongoDB connections',
+                   lambda: mongo.pool_stats.open)
+        self.gauge('mongo_pool_connections_checked_out', 'MongoDB connections in use',
+                   lambda: mongo.pool_stats.checked_out)
+
+metrics = MetricsRegistry()
+
+# Receiver instrumentation. The event label is limited to the supported events
+# plus 'other' so a client cannot create unbounded label sets
+WEBHOOK_DELIVERIES = metrics.counter(
+    'webhook_deliveries_total', 'Deliveries answered by the receiver, by outcome', ('event', 'outcome')
+)
+WEBHOOK_REQUEST_SECONDS = metrics.histogram(
+    'webhook_request_duration_seconds', 'End-to-end receiver latency', ('event',)
+)
+WEBHOOK_STAGE_SECONDS = metrics.histogram(
+    'webhook_stage_duration_seconds',
+    'Time spent in each receiver stage: verify, parse, build, insert (or offload, spool)',
+    ('event', 'stage')
+)
+INGEST_DELIVERIES = metrics.counter(
+    'webhook_ingest_deliveries_total', 'Queued deliveries finished by the ingest workers, by outcome',
+    ('event', 'outcome')
+)
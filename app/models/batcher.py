@@ -0,0 +1,168 @@
+# app/models/batcher.py
+import atexit
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.extensions import get_collection
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current caller's insert must be written, set
+# with WriteBatcher.timeout(); pymongo.timeout() does not reach the flush thread
+_deadline = contextvars.ContextVar('write_batcher_deadline', default=None)
+
+class WriteBatcher:
+    """
+    Write-behind batcher for MongoDB inserts
+
+    Documents are grouped per collection and flushed with one unordered
+    insert_many when the batch reaches MONGO_BATCH_SIZE or the oldest document
+    has waited MONGO_BATCH_MAX_LATENCY_MS, whichever comes first. Documents
+    that fail inside a batch are retried individually.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.batch_size = 100
+        self.max_latency = 0.02
+        self.result_timeout = 30.0
+        self._pending = {}
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._thread_pid = None
+        self._running = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the batcher from the Flask app config"""
+        self.enabled = app.config.get('MONGO_BATCH_WRITES', False)
+        self.batch_size = max(1, app.config.get('MONGO_BATCH_SIZE', 100))
+        self.max_latency = app.config.get('MONGO_BATCH_MAX_LATENCY_MS', 20) / 1000.0
+        self.result_timeout = app.config.get('MONGO_BATCH_RESULT_TIMEOUT', 30.0)
+        if self.enabled:
+            self._running = True
+            atexit.register(self.shutdown)
+            logger.info("Batched writes enabled: %s docs / %.0f ms", self.batch_size, self.max_latency * 1000)
+
+    def _ensure_thread(self):
+        """Start the flush thread in the current process (after any fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='write-batcher', daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def submit(self, collection_name, document):
+        """Queue a document for insertion and return a Future of its _id"""
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError('Write batcher is not running'))
+            return future
+        # Assign the id up front so every caller gets its own id back
+        document.setdefault('_id', ObjectId())
+        self._ensure_thread()
+        with self._condition:
+            self._pending.setdefault(collection_name, []).append((document, future))
+            if self._oldest is None:
+                # Wake the flush thread so it starts the latency deadline
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            elif sum(len(batch) for batch in self._pending.values()) >= self.batch_size:
+                self._condition.notify()
+        return future
+
+    def insert(self, collection_name, document):
+        """Insert a document through the batcher, blocking until it is written or the caller's deadline"""
+        timeout = self.result_timeout
+        deadline = _deadline.get()
+        if deadline is not None:
+            timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+        return self.submit(collection_name, document).result(timeout=timeout)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def timeout(seconds):
+        """Bound how long inserts in this block wait for their batch"""
+        deadline = time.monotonic() + seconds
+        current = _deadline.get()
+        token = _deadline.set(deadline if current is None else min(current, deadline))
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._flush_due():
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(0, self._oldest + self.max_latency - time.monotonic())
+                    self._condition.wait(timeout)
+                pending, self._pending, self._oldest = self._pending, {}, None
+                running = self._running
+            for collection_name, batch in pending.items():
+                self._flush(collection_name, batch)
+            if not running:
+                return
+
+    def _flush_due(self):
+        if self._oldest is None:
+            return False
+        if sum(len(batch) for batch in self._pending.values()) >= self.batch_size:
+            return True
+        return time.monotonic() - self._oldest >= self.max_latency
+
+    def _flush(self, collection_name, batch):
+        collection = get_collection(collection_name)
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            failed = []
+            try:
+                collection.insert_many([document for document, _ in chunk], ordered=False)
+            except BulkWriteError as e:
+                failed_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+                failed = [chunk[index] for index in sorted(failed_indexes)]
+                logger.warning("Bulk insert into %s: %s of %s documents failed, retrying individually", collection_name, len(failed), len(chunk))
+                chunk = [item for index, item in enumerate(chunk) if index not in failed_indexes]
+            except Exception as e:
+                logger.error("Bulk insert into %s failed: %s, retrying individually", collection_name, e)
+                failed, chunk = chunk, []
+            for document, future in chunk:
+                future.set_result(document['_id'])
+            for document, future in failed:
+                self._insert_one(collection, document, future)
+
+    def _insert_one(self, collection, document, future):
+        try:
+            future.set_result(collection.insert_one(document).inserted_id)
+        except Exception as e:
+            future.set_exception(e)
+
+    def shutdown(self):
+        """Flush pending documents and stop the flush thread"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(self.result_timeout)
+
+    def pending_count(self):
+        """Documents waiting for the next flush"""
+        with self._condition:
+            return sum(len(batch) for batch in self._pending.values())
+
+write_batcher = WriteBatcher()
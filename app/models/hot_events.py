@@ -0,0 +1,117 @@
+# app/models/hot_events.py
+import logging
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+
+from app.extensions import get_collection
+from app.models.tenants import merge_pages
+
+logger = logging.getLogger(__name__)
+
+class HotEvents:
+    """
+    Small capped collection with the newest events in listing form
+
+    Every stored event is also written here, so the dashboard's newest-first
+    listing reads from a collection of at most HOT_COLLECTION_SIZE documents
+    whatever the size of the live collection. It backs the reads the
+    recent events cache cannot answer (cache disabled, not yet seeded or a
+    page larger than the cache).
+
+    MongoDB drops the earliest inserts once the collection is full, but
+    events are listed by timestamp, and a spool replay or a push of old
+    commits inserts events older than ones already there. So each row
+    records a watermark, at least the timestamp of every row inserted
+    before it: its received_at for stored events, which come after the
+    events they report. Every evicted row was inserted before the earliest
+    remaining one, so the collection holds every event newer than that
+    row's watermark, and recent() only answers when its page is newer.
+    """
+
+    COLLECTION_NAME = 'webhook_events_hot'
+
+    INDEXES = [
+        ([('timestamp', -1), ('_id', -1)], {'name': 'timestamp_desc'})
+    ]
+
+    def __init__(self, source_collection, fields, app=None, collections=None):
+        self.source_collection = source_collection
+        self.collections = collections or (lambda: [source_collection])
+        self.fields = list(fields)
+        self.enabled = False
+        self.size = 1000
+        self.max_bytes = 4194304
+        self._batcher = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, batcher=None):
+        """
+        Configure the collection from the Flask app config
+        Inserts go through batcher when it is enabled, without waiting
+        """
+        self.enabled = app.config.get('HOT_COLLECTION_ENABLED', False)
+        self.size = max(1, app.config.get('HOT_COLLECTION_SIZE', 1000))
+        self.max_bytes = app.config.get('HOT_COLLECTION_MAX_BYTES', 4194304)
+        self._batcher = batcher
+
+    def ensure_collection(self):
+        """Create the capped collection and fill it from the source collections when empty"""
+        database = get_collection(self.source_collection).database
+        if self.COLLECTION_NAME not in database.list_collection_names(filter={'name': self.COLLECTION_NAME}):
+            database.create_collection(self.COLLECTION_NAME, capped=True, size=self.max_bytes, max=self.size)
+            logger.info("Created capped collection %s (%s events)", self.COLLECTION_NAME, self.size)
+        collection = get_collection(self.COLLECTION_NAME)
+        for keys, options in self.INDEXES:
+            collection.create_index(keys, **options)
+        if collection.estimated_document_count() == 0:
+            projection = {field: 1 for field in self.fields}
+            documents = merge_pages([list(get_collection(name).find({}, projection).sort(
+                [('timestamp', -1), ('_id', -1)]
+            ).limit(self.size)) for name in self.collections()], -1, self.size)
+            if documents:
+                # Oldest first, so the capped collection evicts in the same order
+                documents.reverse()
+                watermark = None
+                for document in documents:
+                    document['watermark'], watermark = watermark, document['timestamp']
+                collection.insert_many(documents, ordered=False)
+                logger.info("Filled %s with %s events", self.COLLECTION_NAME, len(documents))
+
+    def add(self, document):
+        """Copy a newly stored event into the collection; failures are logged, not raised"""
+        if not self.enabled:
+            return
+        hot = {field: document.get(field) for field in self.fields}
+        hot['_id'] = document['_id']
+        hot['watermark'] = document.get('received_at') or datetime.now(timezone.utc)
+        try:
+            if self._batcher is not None and self._batcher.enabled:
+                self._batcher.submit(self.COLLECTION_NAME, hot).add_done_callback(self._check)
+            else:
+                get_collection(self.COLLECTION_NAME).insert_one(hot)
+        except DuplicateKeyError:
+            pass
+        except Exception as e:
+            logger.warning("Could not copy event %s to %s: %s", document['_id'], self.COLLECTION_NAME, e)
+
+    def _check(self, future):
+        error = future.exception()
+        if error is not None and not isinstance(error, DuplicateKeyError):
+            logger.warning("Could not copy event to %s: %s", self.COLLECTION_NAME, error)
+
+    def recent(self, limit):
+        """The newest limit events, or None when the collection cannot answer"""
+        if not self.enabled or limit > self.size:
+            return None
+        collection = get_collection(self.COLLECTION_NAME)
+        events = list(collection.find({}, {'watermark': 0}).sort([('timestamp', -1), ('_id', -1)]).limit(limit))
+        earliest = collection.find_one({}, {'watermark': 1}, sort=[('$natural', 1)])
+        if earliest is None or 'watermark' not in earliest:
+            # Empty, or rows written before watermarks were recorded
+            return None if earliest is not None else events
+        floor = earliest['watermark']
+        if floor is not None and (len(events) < limit or events[-1]['timestamp'] <= floor):
+            # Rows this old may have been evicted by later, older inserts
+            return None
+        return events
@@ -0,0 +1,157 @@
+# app/models/push_commit.py
+import logging
+import sys
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from app.extensions import get_collection
+import dateutil.parser
+
+logger = logging.getLogger(__name__)
+
+def _parse_timestamp(value, default):
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            return dateutil.parser.parse(value)
+        except Exception:
+            return default
+
+class PushCommit:
+    """
+    Compact record of one commit in a push
+
+    Records from the same push share their interned repository, branch and
+    author strings, so a large push holds one copy of each.
+    """
+
+    __slots__ = ('position', 'sha', 'author', 'message', 'timestamp', 'repository_name', 'branch')
+
+    def __init__(self, position, sha, author, message, timestamp, repository_name, branch):
+        self.position = position
+        self.sha = sha
+        self.author = author
+        self.message = message
+        self.timestamp = timestamp
+        self.repository_name = repository_name
+        self.branch = branch
+
+    def to_dict(self, push_id):
+        """Convert to dictionary for MongoDB storage"""
+        return {
+            'push_id': push_id,
+            'position': self.position,
+            'sha': self.sha,
+            'author': self.author,
+            'message': self.message,
+            'timestamp': self.timestamp,
+            'repository_name': self.repository_name,
+            'branch': self.branch
+        }
+
+    @staticmethod
+    def serialize(document):
+        """Shape a stored commit for the API"""
+        timestamp = document['timestamp']
+        if isinstance(timestamp, datetime) and timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return {
+            'sha': document['sha'],
+            'position': document['position'],
+            'author': document.get('author'),
+            'message': document.get('message'),
+            'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
+        }
+
+class CommitStore:
+    """
+    Per-commit storage for push events
+
+    When PUSH_EXPANSION_ENABLED is set, every commit in a push becomes a
+    PushCommit in the webhook_commits collection, written with one unordered
+    insert_many and referenced from the push event by push_id.
+    """
+
+    COLLECTION_NAME = 'webhook_commits'
+
+    INDEXES = [
+        # One record per commit of a push; makes a retried insert idempotent
+        ([('push_id', 1), ('position', 1)], {'name': 'push_position_unique', 'unique': True}),
+        ([('repository_name', 1), ('timestamp', -1)], {'name': 'repository_timestamp'}),
+        ([('sha', 1)], {'name': 'sha'})
+    ]
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure push expansion from the Flask app config"""
+        self.enabled = app.config.get('PUSH_EXPANSION_ENABLED', False)
+
+    def ensure_indexes(self):
+        """Create the indexes the webhook_commits collection relies on"""
+        collection = get_collection(self.COLLECTION_NAME)
+        for keys, options in self.INDEXES:
+            collection.create_index(keys, **options)
+        logger.info("Ensured %s indexes on %s", len(self.INDEXES), self.COLLECTION_NAME)
+
+    @staticmethod
+    def expand(commits, repository_name, branch, default_author, default_timestamp):
+        """Turn the commits array of a push payload into PushCommit records"""
+        intern = sys.intern
+        repository_name = intern(repository_name)
+        branch = intern(branch)
+        authors = {}
+        records = []
+        for position, commit in enumerate(commits or ()):
+            name = (commit.get('author') or {}).get('name') or default_author
+            author = authors.get(name)
+            if author is None:
+                author = authors[name] = intern(name)
+            records.append(PushCommit(
+                position=position,
+                sha=commit.get('id'),
+                author=author,
+                message=commit.get('message', ''),
+                timestamp=_parse_timestamp(commit.get('timestamp'), default_timestamp),
+                repository_name=repository_name,
+                branch=branch
+            ))
+        return records
+
+    def insert(self, push_id, records):
+        """Store the commits of a push with one bulk write"""
+        if not records:
+            return 0
+        collection = get_collection(self.COLLECTION_NAME)
+        try:
+            result = collection.insert_many([record.to_dict(push_id) for record in records], ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            if self.only_duplicates(e):
+                return e.details.get('nInserted', 0)
+            raise
+
+    @staticmethod
+    def only_duplicates(error):
+        """Whether a bulk insert only hit commits stored by an earlier attempt"""
+        errors = error.details.get('writeErrors', [])
+        return bool(errors) and all(write_error.get('code') == 11000 for write_error in errors)
+
+    def find(self, push_id, limit=None):
+        """Commits of a push in payload order"""
+        collection = get_collection(self.COLLECTION_NAME)
+        cursor = collection.find({'push_id': push_id}, {'_id': 0, 'push_id': 0}).sort('position', 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+    def delete(self, push_id):
+        collection = get_collection(self.COLLECTION_NAME)
+        collection.delete_many({'push_id': push_id})
+
+commit_store = CommitStore()
@@ -0,0 +1,266 @@
+# app/models/recent_cache.py
+import bisect
+import logging
+import os
+import threading
+from datetime import timedelta, timezone
+from bson import ObjectId
+from app.extensions import get_collection
+from app.models.tenants import merge_pages
+
+logger = logging.getLogger(__name__)
+
+def _sort_key(document):
+    """Descending (timestamp, _id) order as a sortable ascending key"""
+    timestamp = document['timestamp'].replace(tzinfo=timezone.utc).timestamp()
+    return (-timestamp, -int.from_bytes(document['_id'].binary, 'big'))
+
+def _normalize(document, fields):
+    """Keep the listed fields and store timestamps as naive UTC, as MongoDB returns them"""
+    cached = {field: document.get(field) for field in fields}
+    cached['_id'] = document['_id']
+    timestamp = document['timestamp']
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    cached['timestamp'] = timestamp
+    return cached
+
+class RecentEventsCache:
+    """
+    Bounded in-memory copy of the newest N events
+
+    WebhookEvent.save() writes through to it and it is seeded from MongoDB
+    at startup, so the dashboard read endpoints need no database round trip.
+
+    Each gunicorn worker has its own copy. Writes made by other workers are
+    picked up by a sync thread, which uses a MongoDB change stream when the
+    deployment supports one (replica sets) and otherwise polls for documents
+    newer than the newest _id it has seen. Observed inserts are also
+    republished to this worker's live event stream. collections() names
+    every collection events are stored in when they are split by tenant.
+    """
+
+    POLL_LOOKBACK = 5
+
+    def __init__(self, collection_name, fields, app=None, collections=None):
+        self.collection_name = collection_name
+        self.collections = collections or (lambda: [collection_name])
+        self.fields = list(fields)
+        self.enabled = False
+        self.size = 200
+        self.sync_mode = 'auto'
+        self.poll_interval = 1.0
+        self.on_insert = []
+        self.on_reset = []
+        self._events = []
+        self._keys = []
+        self._ids = set()
+        self._count = None
+        self._latest_id = None
+        # True when the collection holds no more events than the cache
+        self._complete = False
+        self._seeded = False
+        self._lock = threading.RLock()
+        self._sync_pid = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the cache from the Flask app config"""
+        self.enabled = app.config.get('RECENT_CACHE_ENABLED', True)
+        self.size = max(1, app.config.get('RECENT_CACHE_SIZE', 200))
+        self.sync_mode = app.config.get('RECENT_CACHE_SYNC', 'auto')
+        self.poll_interval = app.config.get('RECENT_CACHE_POLL_INTERVAL', 1.0)
+
+    def seed(self):
+        """Load the newest events from MongoDB, replacing the cache contents"""
+        projection = {field: 1 for field in self.fields}
+        pages = []
+        count = 0
+        latest_ids = []
+        for name in self.collections():
+            collection = get_collection(name)
+            pages.append(list(collection.find({}, projection).sort(
+                [('timestamp', -1), ('_id', -1)]
+            ).limit(self.size)))
+            count += collection.estimated_document_count()
+            latest = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+            if latest:
+                latest_ids.append(latest['_id'])
+        documents = merge_pages(pages, -1, self.size)
+        with self._lock:
+            self._events = []
+            self._keys = []
+            self._ids = set()
+            for document in documents:
+                self._insert(_normalize(document, self.fields))
+            self._count = count
+            self._latest_id = max(latest_ids, default=None)
+            self._complete = len(documents) < self.size
+            self._seeded = True
+        logger.info("Recent events cache seeded with %s events", len(documents))
+
+    def add(self, document):
+        """Write-through of a newly stored event; returns False if already cached"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if document['_id'] in self._ids:
+                return False
+            if self._count is not None:
+                self._count += 1
+            if self._latest_id is None or document['_id'] > self._latest_id:
+                self._latest_id = document['_id']
+            return self._insert(_normalize(document, self.fields))
+
+    def _insert(self, document):
+        key = _sort_key(document)
+        position = bisect.bisect_left(self._keys, key)
+        if position >= self.size:
+            # Older than everything we keep
+            self._complete = False
+            return False
+        self._keys.insert(position, key)
+        self._events.insert(position, document)
+        self._ids.add(document['_id'])
+        if len(self._events) > self.size:
+            self._keys.pop()
+            self._ids.discard(self._events.pop()['_id'])
+            self._complete = False
+        return True
+
+    def recent(self, limit):
+        """The newest limit events, or None when the cache cannot answer"""
+        if not self.enabled:
+            return None
+        self._ensure_sync()
+        with self._lock:
+            if not self._seeded:
+                return None
+            if limit > len(self._events) and not self._complete:
+                return None
+            return [dict(document) for document in self._events[:limit]]
+
+    def count(self):
+        """Estimated event count, or None when unknown"""
+        if not self.enabled:
+            return None
+        self._ensure_sync()
+        with self._lock:
+            return self._count if self._seeded else None
+
+    def version(self):
+        """(newest _id, count) of the collection as last observed"""
+        with self._lock:
+            return self._latest_id, self._count
+
+    def _ensure_sync(self):
+        """Start the cross-worker sync thread in the current process (after any fork)"""
+        if self.sync_mode == 'none' or self._sync_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sync_pid == os.getpid():
+                return
+            self._sync_pid = os.getpid()
+            self._stop.clear()
+            thread = threading.Thread(target=self._run_sync, name='recent-cache-sync', daemon=True)
+            thread.start()
+
+    def _run_sync(self):
+        while not self._stop.is_set():
+            try:
+                if not self._seeded:
+                    self.seed()
+                if self.sync_mode in ('auto', 'change_stream') and self._watch():
+                    # The stream ended; reload anything missed while reconnecting
+                    self._reset()
+                    continue
+                self._poll()
+            except Exception as e:
+                logger.error("Recent events cache sync failed: %s", e)
+                self._stop.wait(self.poll_interval)
+
+    def _watch(self):
+        """
+        Follow the collection change stream until it ends
+        Returns False when change streams are unavailable (standalone mongod)
+        """
+        names = self.collections()
+        collection = get_collection(names[0])
+        try:
+            if len(names) == 1:
+                stream = collection.watch(max_await_time_ms=int(self.poll_interval * 1000))
+            else:
+                # One database stream for every tenant collection
+                stream = collection.database.watch(
+                    [{'$match': {'ns.coll': {'$in': names}}}], max_await_time_ms=int(self.poll_interval * 1000)
+                )
+        except Exception as e:
+            if self.sync_mode == 'change_stream':
+                raise
+            logger.info("Change streams unavailable (%s), polling for new events instead", e)
+            self.sync_mode = 'poll'
+            return False
+        
+        with stream:
+            logger.info("Recent events cache following change stream")
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    if self.collections() != names:
+                        # A tenant collection was added; reopen over all of them
+                        break
+                    continue
+                if change['operationType'] == 'insert':
+                    self._observe_insert(change['fullDocument'])
+                else:
+                    self._reset()
+        return True
+
+    def _poll(self):
+        """Pick up events newer than the newest _id seen, and notice deletions"""
+        latest_id, known_count = self.version()
+        query = {}
+        if latest_id is not None:
+            # Ids from other workers are only roughly time-ordered, so look a
+            # little behind the newest one; already cached ids are skipped
+            since = latest_id.generation_time - timedelta(seconds=self.POLL_LOOKBACK)
+            query = {'_id': {'$gt': ObjectId.from_datetime(since)}}
+        projection = {field: 1 for field in self.fields}
+        count = 0
+        for name in self.collections():
+            collection = get_collection(name)
+            for document in collection.find(query, projection).sort('_id', 1).limit(self.size):
+                self._observe_insert(document)
+            count += collection.estimated_document_count()
+        with self._lock:
+            observed = self._count
+            self._count = count
+        if known_count is not None and observed is not None and count < observed:
+            # Something was deleted; reload rather than guess what
+            self._reset()
+        self._stop.wait(self.poll_interval)
+
+    def _observe_insert(self, document):
+        if self.add(document):
+            for callback in self.on_insert:
+                callback(document)
+
+    def _reset(self):
+        self.seed()
+        for callback in self.on_reset:
+            callback()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'seeded': self._seeded,
+                'size': len(self._events),
+                'capacity': self.size,
+                'sync': self.sync_mode
+            }
@@ -0,0 +1,332 @@
+# app/models/retention.py
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from app.extensions import get_collection
+
+logger = logging.getLogger(__name__)
+
+# Server error codes for an index that exists with other options
+INDEX_CONFLICT_CODES = (85, 86)
+
+def _naive_utc(timestamp):
+    """Timestamps compared against stored ones, which MongoDB returns as naive UTC"""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _sort_key(document):
+    return (_naive_utc(document['timestamp']), document['_id'])
+
+class EventRetention:
+    """
+    Keeps the live events collection to a retention window
+
+    Age is counted from when an event was stored, not from its timestamp,
+    which is the event's own time (a push's first commit may be years old).
+    RETENTION_MODE 'ttl' puts a TTL index on received_at, so MongoDB
+    deletes events stored more than RETENTION_DAYS ago by itself. 'archive'
+    instead moves them, selected by the creation time of their _id,
+    RETENTION_BATCH at a time, into monthly partitions (by timestamp) named
+    <collection>_archive_YYYY_MM, created with ARCHIVE_COMPRESSOR block
+    compression, and then deletes them from the live collection. The move
+    runs every RETENTION_INTERVAL seconds in whichever worker holds a lease
+    document, or from `flask retention archive`.
+
+    Listings that reach past the live events continue into the partitions,
+    merged in (timestamp, _id) order, so the API still pages through
+    archived history. With per-tenant collections, collections() names
+    them all; each gets the TTL index, or is archived into the shared
+    partitions.
+    """
+
+    TTL_INDEX = 'received_at_ttl'
+    # Expired events by timestamp; dropped wherever it is found
+    LEGACY_TTL_INDEX = 'timestamp_ttl'
+    LEASE_COLLECTION = 'webhook_leases'
+    # Seconds the list of archive partitions is cached
+    PARTITIONS_TTL = 60
+
+    def __init__(self, collection_name, indexes, app=None, collections=None):
+        self.collection_name = collection_name
+        self.collections = collections or (lambda: [collection_name])
+        self.indexes = indexes
+        self.prefix = f'{collection_name}_archive_'
+        self.mode = 'none'
+        self.days = 90
+        self.interval = 3600.0
+        self.batch_size = 1000
+        self.compressor = 'zstd'
+        self._partitions = None
+        self._partitions_at = None
+        self._created = set()
+        self._owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._moved = 0
+        self._runs = 0
+        self._last_run = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure retention from the Flask app config"""
+        self.mode = app.config.get('RETENTION_MODE', 'none')
+        if self.mode not in ('none', 'ttl', 'archive'):
+            logger.warning("Unknown RETENTION_MODE %r, keeping events forever", self.mode)
+            self.mode = 'none'
+        self.days = max(1, app.config.get('RETENTION_DAYS', 90))
+        self.interval = app.config.get('RETENTION_INTERVAL', 3600.0)
+        self.batch_size = max(1, app.config.get('RETENTION_BATCH', 1000))
+        self.compressor = app.config.get('ARCHIVE_COMPRESSOR', 'zstd')
+        if self.mode == 'archive' and self.interval > 0:
+            atexit.register(self.shutdown)
+
+    @property
+    def archive(self):
+        return self.mode == 'archive'
+
+    def cutoff(self):
+        """Events stored before this are past the retention window"""
+        return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=self.days)
+
+    def ensure_indexes(self, collection_name=None):
+        """Create, update or drop the TTL index to match RETENTION_MODE, on one or every events collection"""
+        for name in [collection_name] if collection_name else self.collections():
+            self._ensure_ttl_index(name)
+
+    def _ensure_ttl_index(self, name):
+        collection = get_collection(name)
+        existing = collection.index_information()
+        for index in (self.LEGACY_TTL_INDEX, self.TTL_INDEX):
+            if index in existing and (self.mode != 'ttl' or index == self.LEGACY_TTL_INDEX):
+                collection.drop_index(index)
+                logger.info("Dropped %s on %s", index, name)
+        if self.mode != 'ttl':
+            return
+        seconds = self.days * 86400
+        try:
+            collection.create_index([('received_at', 1)], name=self.TTL_INDEX, expireAfterSeconds=seconds)
+        except OperationFailure as e:
+            if e.code not in INDEX_CONFLICT_CODES:
+                raise
+            # RETENTION_DAYS changed; collMod updates the index in place
+            collection.database.command('collMod', name, index={
+                'name': self.TTL_INDEX, 'expireAfterSeconds': seconds
+            })
+        # Events stored before received_at was recorded expire by the creation
+        # time of their _id; the TTL index finds them (missing is null)
+        result = collection.update_many({'received_at': None}, [{'$set': {'received_at': {'$toDate': '$_id'}}}])
+        if result.modified_count:
+            logger.info("Set received_at on %s older events of %s", result.modified_count, name)
+        logger.info("Events on %s expire after %s days", name, self.days)
+
+    # Partitions
+
+    def partition_name(self, timestamp):
+        return f'{self.prefix}{timestamp:%Y_%m}'
+
+    def partition_bounds(self, name):
+        """[start, end) of the months a partition holds, as naive UTC"""
+        year, month = (int(part) for part in name[len(self.prefix):].split('_'))
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        return start, end
+
+    def partitions(self, refresh=False):
+        """Archive partition names, newest first"""
+        with self._lock:
+            fresh = self._partitions_at is not None and time.monotonic() - self._partitions_at < self.PARTITIONS_TTL
+            if fresh and not refresh:
+                return self._partitions
+        database = get_collection(self.collection_name).database
+        names = database.list_collection_names(filter={'name': {'$regex': f'^{self.prefix}\\d{{4}}_\\d{{2}}$'}})
+        names = sorted(names, reverse=True)
+        with self._lock:
+            self._partitions = names
+            self._partitions_at = time.monotonic()
+        return names
+
+    def _partition(self, name):
+        """Collection for a partition, creating it compressed and indexed on first use"""
+        if name in self._created:
+            return get_collection(name)
+        database = get_collection(self.collection_name).database
+        if name not in database.list_collection_names(filter={'name': name}):
+            options = {}
+            if self.compressor and self.compressor != 'none':
+                options['storageEngine'] = {'wiredTiger': {'configString': f'block_compressor={self.compressor}'}}
+            try:
+                database.create_collection(name, **options)
+                logger.info("Created archive partition %s (%s)", name, self.compressor)
+            except OperationFailure as e:
+                # Created concurrently by another worker
+                if e.code != 48:
+                    raise
+        collection = get_collection(name)
+        for keys, index_options in self.indexes:
+            collection.create_index(keys, **index_options)
+        self._created.add(name)
+        with self._lock:
+            self._partitions_at = None
+        return collection
+
+    # Moving
+
+    def archive_batch(self, cutoff=None, collection_name=None):
+        """Move the earliest stored batch of expired events of a live collection into their partitions; returns how many"""
+        cutoff = cutoff or self.cutoff()
+        live = get_collection(collection_name or self.collection_name)
+        # _id embeds the time the event was stored, and its index serves this
+        documents = list(live.find({'_id': {'$lt': ObjectId.from_datetime(cutoff)}}).sort(
+            '_id', 1
+        ).limit(self.batch_size))
+        if not documents:
+            return 0
+        by_partition = {}
+        for document in documents:
+            by_partition.setdefault(self.partition_name(document['timestamp']), []).append(document)
+        for name, batch in by_partition.items():
+            try:
+                self._partition(name).insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Copied by an earlier run that stopped before its delete
+                errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != 11000 for error in errors):
+                    raise
+        live.delete_many({'_id': {'$in': [document['_id'] for document in documents]}})
+        with self._lock:
+            self._moved += len(documents)
+        return len(documents)
+
+    def run(self):
+        """Archive every expired event; returns how many were moved"""
+        cutoff = self.cutoff()
+        moved = 0
+        started = time.perf_counter()
+        for name in self.collections():
+            while not self._stop.is_set():
+                count = self.archive_batch(cutoff, name)
+                moved += count
+                if count < self.batch_size:
+                    break
+        with self._lock:
+            self._runs += 1
+            self._last_run = datetime.now(timezone.utc)
+        if moved:
+            logger.info("Archived %s events stored before %s in %.1fs", moved, cutoff, time.perf_counter() - started)
+        return moved
+
+    def start(self):
+        """Start the archive thread in the current process (after any fork)"""
+        if not self.archive or self.interval <= 0 or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._owner = f'{socket.gethostname()}:{os.getpid()}'
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='event-archiver', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._acquire_lease():
+                    self.run()
+            except Exception as e:
+                logger.error("Archiving expired events failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def _acquire_lease(self):
+        """True when this process may run the archive pass until the next interval"""
+        now = datetime.now(timezone.utc)
+        leases = get_collection(self.LEASE_COLLECTION)
+        try:
+            leases.update_one(
+                {'_id': f'{self.collection_name}-archive', '$or': [
+                    {'owner': self._owner}, {'expires_at': {'$lt': now}}
+                ]},
+                {'$set': {'owner': self._owner, 'expires_at': now + timedelta(seconds=self.interval * 2)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The lease exists and belongs to another worker
+            return False
+
+    def shutdown(self):
+        """Stop the archive thread; a pass in progress stops after its batch"""
+        self._stop.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(5)
+
+    # Reading
+
+    def _candidates(self, direction, since=None, until=None, cursor=None):
+        """Partitions that can hold matches, in the order a listing visits them"""
+        since, until, cursor = _naive_utc(since), _naive_utc(until), _naive_utc(cursor)
+        names = self.partitions()
+        if direction == 1:
+            names = list(reversed(names))
+        candidates = []
+        for name in names:
+            start, end = self.partition_bounds(name)
+            if since and end <= since or until and start >= until:
+                continue
+            if cursor and (direction == -1 and start > cursor or direction == 1 and end <= cursor):
+                continue
+            candidates.append((name, start, end))
+        return candidates
+
+    def extend(self, events, query, projection, direction, limit, since=None, until=None, cursor=None):
+        """
+        Merge archived matches into the live results of a listing
+        events holds up to limit live documents sorted in direction; the
+        merged, sorted and trimmed list is returned. Partitions are visited
+        from the live end outwards and the walk stops once a full page is
+        entirely beyond the next partition's time range.
+        """
+        for name, start, end in self._candidates(direction, since, until, cursor):
+            if len(events) >= limit:
+                boundary = _naive_utc(events[limit - 1]['timestamp'])
+                if direction == -1 and end <= boundary or direction == 1 and start > boundary:
+                    break
+            archived = list(get_collection(name).find(query, projection).sort(
+                [('timestamp', direction), ('_id', direction)]
+            ).limit(limit))
+            if archived:
+                events = sorted(events + archived, key=_sort_key, reverse=direction == -1)[:limit]
+        return events
+
+    def find_one(self, query, projection=None):
+        """First archived document matching query, newest partition first"""
+        for name in self.partitions():
+            document = get_collection(name).find_one(query, projection)
+            if document is not None:
+                return document
+        return None
+
+    def archived_count(self):
+        """Estimated number of archived events"""
+        return sum(get_collection(name).estimated_document_count() for name in self.partitions())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'days': self.days,
+                'moved': self._moved,
+                'runs': self._runs,
+                'last_run': self._last_run.isoformat() if self._last_run else None
+            }
@@ -0,0 +1,257 @@
+# app/models/stats.py
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.extensions import get_collection
+
+logger = logging.getLogger(__name__)
+
+# Bucket sizes, with how long their rollups are kept (None keeps them forever)
+GRANULARITIES = {
+    'minute': timedelta(days=2),
+    'hour': timedelta(days=90),
+    'day': None
+}
+
+# Event fields counted per bucket; 'all' counts every event. Repositories
+# are counted by owner/name, so same-named repositories of different owners
+# stay apart
+DIMENSIONS = {
+    'all': None,
+    'action': 'action',
+    'repository': 'repository_name',
+    'author': 'author'
+}
+
+def truncate(timestamp, granularity):
+    """Start of the bucket a timestamp falls in, as naive UTC"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def dimension_value(event, dimension):
+    """The value an event counts towards in a dimension, or None"""
+    field = DIMENSIONS[dimension]
+    if field is None:
+        return '*'
+    value = event.get(field)
+    if value is None:
+        return None
+    if dimension == 'repository' and event.get('repository_owner'):
+        # Events stored before owners were recorded keep the bare name
+        return f"{event['repository_owner']}/{value}"
+    return str(value)
+
+def rollup_keys(event):
+    """(granularity, bucket, dimension, value) of every rollup an event counts towards"""
+    keys = []
+    for granularity in GRANULARITIES:
+        bucket = truncate(event['timestamp'], granularity)
+        for dimension in DIMENSIONS:
+            value = dimension_value(event, dimension)
+            if value is not None:
+                keys.append((granularity, bucket, dimension, value))
+    return keys
+
+class StatsRollups:
+    """
+    Pre-aggregated event counts per minute, hour and day
+
+    Each stored event increments one rollup document per granularity and
+    dimension (all events, action, repository, author). Increments are
+    summed in memory and written every STATS_FLUSH_INTERVAL seconds as one
+    unordered bulk of $inc upserts, so every worker can add to the same
+    documents. Reads cost one document per bucket and value, however many
+    events the buckets cover.
+    """
+
+    COLLECTION_NAME = 'webhook_stats'
+
+    INDEXES = [
+        ([('granularity', 1), ('dimension', 1), ('bucket', 1)], {'name': 'granularity_dimension_bucket'}),
+        # Minute and hour rollups expire; day rollups have no expire_at
+        ([('expire_at', 1)], {'name': 'expire_at_ttl', 'expireAfterSeconds': 0})
+    ]
+
+    def __init__(self, source_collection, app=None, collections=None):
+        self.source_collection = source_collection
+        self.collections = collections or (lambda: [source_collection])
+        self.enabled = False
+        self.flush_interval = 1.0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.background_flush = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, background_flush=True):
+        """
+        Configure the rollups from the Flask app config
+        Without background_flush the caller writes take_operations() itself
+        """
+        self.enabled = app.config.get('STATS_ENABLED', True)
+        self.flush_interval = app.config.get('STATS_FLUSH_INTERVAL', 1.0)
+        self.background_flush = background_flush
+        if self.enabled and background_flush:
+            atexit.register(self.shutdown)
+
+    def ensure_indexes(self):
+        """Create the indexes the webhook_stats collection relies on"""
+        collection = get_collection(self.COLLECTION_NAME)
+        for keys, options in self.INDEXES:
+            collection.create_index(keys, **options)
+        logger.info("Ensured %s indexes on %s", len(self.INDEXES), self.COLLECTION_NAME)
+
+    def record(self, event):
+        """Count a newly stored event towards its rollups"""
+        if not self.enabled:
+            return
+        keys = rollup_keys(event)
+        if self.background_flush:
+            self._ensure_thread()
+        with self._lock:
+            for key in keys:
+                self._pending[key] = self._pending.get(key, 0) + 1
+
+    def _ensure_thread(self):
+        """Start the flush thread in the current process (after any fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stats-rollups', daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the pending increments with one bulk of $inc upserts"""
+        pending, operations = self.take_operations()
+        if not operations:
+            return 0
+        try:
+            get_collection(self.COLLECTION_NAME).bulk_write(operations, ordered=False)
+        except Exception as e:
+            self.requeue(pending, e)
+        return len(operations)
+
+    def take_operations(self):
+        """Remove the pending increments, returned with their $inc upserts"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne({'_id': self._document_id(key)}, {
+                '$inc': {'count': count},
+                '$setOnInsert': self._fields(key)
+            }, upsert=True)
+            for key, count in pending.items()
+        ]
+        return pending, operations
+
+    def requeue(self, pending, error):
+        """Put back the increments of a failed flush for the next one"""
+        keys = list(pending)
+        if isinstance(error, BulkWriteError):
+            failed = [keys[write_error['index']] for write_error in error.details.get('writeErrors', [])]
+            logger.warning("Stats rollup flush: %s of %s updates failed, retrying", len(failed), len(keys))
+        else:
+            failed = keys
+            logger.error("Stats rollup flush failed: %s, retrying", error)
+        with self._lock:
+            for key in failed:
+                self._pending[key] = self._pending.get(key, 0) + pending[key]
+
+    @staticmethod
+    def _document_id(key):
+        granularity, bucket, dimension, value = key
+        return f"{granularity}|{bucket.isoformat()}|{dimension}|{value}"
+
+    @staticmethod
+    def _fields(key):
+        granularity, bucket, dimension, value = key
+        fields = {'granularity': granularity, 'bucket': bucket, 'dimension': dimension, 'value': value}
+        retention = GRANULARITIES[granularity]
+        if retention is not None:
+            fields['expire_at'] = bucket + retention
+        return fields
+
+    def query(self, granularity, since, until, dimensions):
+        """Rollup documents of the given dimensions with since <= bucket < until"""
+        collection = get_collection(self.COLLECTION_NAME)
+        return list(collection.find({
+            'granularity': granularity,
+            'dimension': {'$in': list(dimensions)},
+            'bucket': {'$gte': truncate(since, granularity), '$lt': until.astimezone(timezone.utc).replace(tzinfo=None)}
+        }, {'_id': 0, 'bucket': 1, 'dimension': 1, 'value': 1, 'count': 1}))
+
+    def backfill(self, since=None, batch_size=1000):
+        """
+        Rebuild the rollups from the stored events, from the start of the day
+        of since (or from the beginning). Increments recorded while this runs
+        for the same buckets can be lost, so run it while ingest is quiet
+        Returns (events read, rollups written)
+        """
+        query = {}
+        if since is not None:
+            since = truncate(since, 'day')
+            query = {'timestamp': {'$gte': since}}
+        projection = {'_id': 0, 'timestamp': 1, 'action': 1, 'repository_owner': 1, 'repository_name': 1, 'author': 1}
+
+        counts = {}
+        events = 0
+        for name in self.collections():
+            for event in get_collection(name).find(query, projection).batch_size(5000):
+                if event.get('timestamp') is None:
+                    continue
+                events += 1
+                for key in rollup_keys(event):
+                    counts[key] = counts.get(key, 0) + 1
+
+        collection = get_collection(self.COLLECTION_NAME)
+        collection.delete_many({'bucket': {'$gte': since}} if since is not None else {})
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        operations = []
+        written = 0
+        for key, count in counts.items():
+            fields = self._fields(key)
+            if fields.get('expire_at') is not None and fields['expire_at'] < now:
+                # Would be removed by the TTL index straight away
+                continue
+            fields['count'] = count
+            operations.append(UpdateOne({'_id': self._document_id(key)}, {'$set': fields}, upsert=True))
+            if len(operations) >= batch_size:
+                collection.bulk_write(operations, ordered=False)
+                written += len(operations)
+                operations = []
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            written += len(operations)
+        logger.info("Backfilled %s stats rollups from %s events", written, events)
+        return events, written
+
+    def shutdown(self):
+        """Flush pending increments and stop the flush thread"""
+        self._stop.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'pending': len(self._pending)}
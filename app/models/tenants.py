@@ -0,0 +1,263 @@
+# app/models/tenants.py
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from pymongo.errors import OperationFailure
+
+from app.extensions import get_collection
+
+logger = logging.getLogger(__name__)
+
+# Characters kept from an owner login in its collection name
+_UNSAFE = re.compile(r'[^a-z0-9_-]')
+
+def _naive_utc(timestamp):
+    if timestamp is not None and getattr(timestamp, 'tzinfo', None) is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _sort_key(document):
+    return (_naive_utc(document['timestamp']), document['_id'])
+
+def merge_pages(pages, direction, limit):
+    """Merge result lists each sorted on (timestamp, _id) in direction, trimmed to limit"""
+    pages = [page for page in pages if page]
+    if len(pages) <= 1:
+        return pages[0][:limit] if pages else []
+    merged = heapq.merge(*pages, key=_sort_key, reverse=direction == -1)
+    return list(itertools.islice(merged, limit))
+
+class TenantRouter:
+    """
+    Places events by repository owner (organization or user)
+
+    TENANT_ROUTING 'none' keeps every event in one collection. 'collection'
+    writes the events of each owner in TENANT_OWNERS (every owner when it
+    is unset) to its own <collection>_tenant_<owner> collection with the
+    same indexes, so busy tenants stop contending for one collection and
+    its index pages; other owners stay in the shared collection. Reads
+    filtered by owner visit its collection and the shared one; others fan
+    out to every events collection on a small thread pool and the sorted
+    pages are merged. 'shard' keeps one collection and shards it on
+    (repository_owner, repository_name) when MongoDB is a sharded cluster,
+    so mongos spreads the writes and sends reads naming both to one shard.
+    """
+
+    MODES = ('none', 'collection', 'shard')
+    SHARD_KEY = {'repository_owner': 1, 'repository_name': 1}
+    # Seconds the list of tenant collections is cached
+    NAMES_TTL = 60
+
+    def __init__(self, collection_name, indexes, app=None):
+        self.collection_name = collection_name
+        self.base_indexes = indexes
+        self.prefix = f'{collection_name}_tenant_'
+        self.mode = 'none'
+        self.owners = None
+        self.fanout_workers = 8
+        # Called with a collection's name once its indexes exist
+        self.on_create = []
+        self._names = []
+        self._names_at = None
+        self._ensured = set()
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure routing from the Flask app config"""
+        self.mode = app.config.get('TENANT_ROUTING', 'none')
+        if self.mode not in self.MODES:
+            logger.warning("Unknown TENANT_ROUTING %r, using one collection", self.mode)
+            self.mode = 'none'
+        owners = app.config.get('TENANT_OWNERS')
+        self.owners = frozenset(owner.lower() for owner in owners) if owners else None
+        self.fanout_workers = max(1, app.config.get('TENANT_FANOUT_WORKERS', 8))
+        with self._lock:
+            self._names_at = None
+            self._ensured = set()
+
+    @property
+    def indexes(self):
+        """Index specs of an events collection in this mode"""
+        if self.mode != 'shard':
+            return self.base_indexes
+        # Unique indexes of a sharded collection must start with the shard
+        # key; a delivery belongs to one repository, so ids stay unique
+        indexes = [([('repository_owner', 1), ('repository_name', 1), ('timestamp', -1), ('_id', -1)],
+                    {'name': 'owner_repository_timestamp'})]
+        for keys, options in self.base_indexes:
+            if options.get('unique'):
+                keys = list(self.SHARD_KEY.items()) + list(keys)
+                options = dict(options, name=f"shard_{options['name']}")
+            indexes.append((keys, options))
+        return indexes
+
+    # Writing
+
+    def name_for(self, owner):
+        """Collection the events of a repository owner are written to"""
+        if self.mode != 'collection' or not owner:
+            return self.collection_name
+        owner = owner.lower()
+        if self.owners is not None and owner not in self.owners:
+            return self.collection_name
+        return self.prefix + _UNSAFE.sub('_', owner)[:64]
+
+    def collection_for(self, owner):
+        """name_for(), creating a tenant collection's indexes on first use in this process"""
+        name = self.name_for(owner)
+        if name != self.collection_name and name not in self._ensured:
+            self.ensure(name)
+        return name
+
+    def ensure(self, name):
+        """Create the indexes of one events collection"""
+        collection = get_collection(name)
+        for keys, options in self.indexes:
+            collection.create_index(keys, **options)
+        for callback in self.on_create:
+            callback(name)
+        self.mark_ensured(name)
+
+    def mark_ensured(self, name):
+        with self._lock:
+            self._ensured.add(name)
+            if name not in self._names and name != self.collection_name:
+                self._names_at = None
+
+    def ensured(self, name):
+        return name in self._ensured
+
+    def ensure_indexes(self):
+        """Index every events collection; in 'shard' mode also shard the collection"""
+        for name in self.collection_names(refresh=True):
+            self.ensure(name)
+        logger.info("Ensured %s indexes on %s", len(self.indexes), self.collection_name)
+        if self.mode == 'shard':
+            self._drop_unprefixed_unique()
+            self.shard()
+
+    def _drop_unprefixed_unique(self):
+        """Drop unique indexes shardCollection would refuse, once their prefixed copies exist"""
+        collection = get_collection(self.collection_name)
+        existing = collection.index_information()
+        for keys, options in self.base_indexes:
+            if options.get('unique') and options['name'] in existing:
+                collection.drop_index(options['name'])
+                logger.info("Dropped %s on %s in favour of shard_%s", options['name'], self.collection_name, options['name'])
+
+    def shard(self):
+        """Shard the events collection on SHARD_KEY; False unless MongoDB is a sharded cluster"""
+        database = get_collection(self.collection_name).database
+        admin = database.client.admin
+        namespace = f'{database.name}.{self.collection_name}'
+        try:
+            try:
+                # Needed before MongoDB 6.0, a no-op after
+                admin.command('enableSharding', database.name)
+            except OperationFailure as e:
+                if e.code == 59:
+                    raise
+            admin.command('shardCollection', namespace, key=self.SHARD_KEY)
+        except OperationFailure as e:
+            if e.code == 59:
+                # CommandNotFound: a replica set or standalone server
+                logger.info("Not a sharded cluster; %s stays unsharded", namespace)
+            else:
+                logger.warning("Could not shard %s: %s", namespace, e)
+            return False
+        logger.info("Sharded %s on %s", namespace, ', '.join(self.SHARD_KEY))
+        return True
+
+    # Reading
+
+    def name_filter(self):
+        """listCollections filter matching the tenant collections"""
+        return {'name': {'$regex': f'^{re.escape(self.prefix)}'}}
+
+    def names_stale(self):
+        if self.mode != 'collection':
+            return False
+        with self._lock:
+            return self._names_at is None or time.monotonic() - self._names_at >= self.NAMES_TTL
+
+    def store_names(self, names):
+        """Record the tenant collections as listed by MongoDB"""
+        with self._lock:
+            self._names = sorted(names)
+            self._names_at = time.monotonic()
+
+    def collection_names(self, owner=None, refresh=False):
+        """Events collections a read has to visit, the shared one first"""
+        if self.mode != 'collection':
+            return [self.collection_name]
+        if owner:
+            # Events stored before routing was turned on stay in the
+            # shared collection
+            name = self.name_for(owner)
+            return [self.collection_name] if name == self.collection_name else [self.collection_name, name]
+        if refresh or self.names_stale():
+            database = get_collection(self.collection_name).database
+            self.store_names(database.list_collection_names(filter=self.name_filter()))
+        with self._lock:
+            names = set(self._names) | self._ensured
+        names.discard(self.collection_name)
+        return [self.collection_name] + sorted(names)
+
+    def map(self, func, names):
+        """func(name) for every name, concurrently when there is more than one"""
+        if len(names) == 1:
+            return [func(names[0])]
+        return list(self._pool().map(func, names))
+
+    def _pool(self):
+        # Threads do not survive a fork, so each process gets its own pool
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.fanout_workers, thread_name_prefix='tenant-fanout'
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def find(self, query, projection, direction, limit, owner=None):
+        """The first limit matches in (timestamp, _id) direction order across the events collections"""
+        sort = [('timestamp', direction), ('_id', direction)]
+
+        def page(name):
+            return list(get_collection(name).find(query, projection).sort(sort).limit(limit))
+
+        return merge_pages(self.map(page, self.collection_names(owner)), direction, limit)
+
+    def find_one(self, query, projection=None):
+        """A document matching query from any events collection, or None"""
+        names = self.collection_names()
+        document = get_collection(names[0]).find_one(query, projection)
+        if document is not None or len(names) == 1:
+            return document
+        found = self.map(lambda name: get_collection(name).find_one(query, projection), names[1:])
+        return next((document for document in found if document is not None), None)
+
+    def count(self):
+        """Estimated number of events across the events collections"""
+        return sum(self.map(lambda name: get_collection(name).estimated_document_count(), self.collection_names()))
+
+    def stats(self):
+        stats = {'mode': self.mode}
+        if self.mode == 'collection':
+            with self._lock:
+                stats['tenant_collections'] = len((set(self._names) | self._ensured) - {self.collection_name})
+            stats['owners'] = sorted(self.owners) if self.owners is not None else 'all'
+        elif self.mode == 'shard':
+            stats['shard_key'] = list(self.SHARD_KEY)
+        return stats
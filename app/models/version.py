@@ -0,0 +1,92 @@
+# app/models/version.py
+import logging
+import threading
+import time
+from app.extensions import get_collection
+
+logger = logging.getLogger(__name__)
+
+class CollectionVersion:
+    """
+    Cheap version token for a collection: its newest _id plus its count
+
+    Local inserts bump the token immediately. Inserts made by other worker
+    processes are picked up by re-reading the newest _id and the estimated
+    count at most once every EVENTS_VERSION_TTL seconds, so conditional GETs
+    within that window are answered without touching MongoDB. When a synced
+    recent events cache is tracked, its view of the collection is used
+    instead and no reads are needed at all.
+    """
+
+    def __init__(self, collection_name, app=None, collections=None):
+        self.collection_name = collection_name
+        self.collections = collections or (lambda: [collection_name])
+        self.ttl = 2.0
+        self._latest_id = None
+        self._count = None
+        self._checked_at = None
+        self._cache = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the refresh interval from the Flask app config"""
+        self.ttl = app.config.get('EVENTS_VERSION_TTL', 2.0)
+
+    def track(self, cache):
+        """Take the version from a synced RecentEventsCache instead of MongoDB"""
+        self._cache = cache
+
+    def bump(self, inserted_id):
+        """Record a local insert"""
+        with self._lock:
+            self._latest_id = inserted_id
+            if self._count is not None:
+                self._count += 1
+
+    def invalidate(self):
+        """Force the next token lookup to re-read MongoDB"""
+        with self._lock:
+            self._checked_at = None
+
+    def current(self):
+        """Version token if it is known without reading MongoDB, else None"""
+        if self._cache is not None and self._cache.count() is not None:
+            latest_id, count = self._cache.version()
+            return f"{latest_id}-{count}"
+        with self._lock:
+            fresh = self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl
+            if fresh:
+                return self._format()
+        return None
+
+    def store(self, latest_id, count):
+        """Record a version read from MongoDB and return its token"""
+        with self._lock:
+            self._latest_id = latest_id
+            self._count = count
+            self._checked_at = time.monotonic()
+            return self._format()
+
+    def token(self):
+        """Current version token, or None when it cannot be determined"""
+        token = self.current()
+        if token is not None:
+            return token
+        try:
+            latest_ids = []
+            count = 0
+            for name in self.collections():
+                collection = get_collection(name)
+                latest = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+                if latest:
+                    latest_ids.append(latest['_id'])
+                count += collection.estimated_document_count()
+        except Exception as e:
+            logger.error("Error reading %s version: %s", self.collection_name, e)
+            return None
+        return self.store(max(latest_ids, default=None), count)
+
+    def _format(self):
+        return f"{self._latest_id}-{self._count}"
@@ -1,7 +1,19 @@
 # app/models/webhook_event.py
+import base64
 from datetime import datetime, timezone
+from app.broadcast import event_broadcaster
 from app.extensions import get_collection
+from app.log import SAMPLED
+from app.models.batcher import write_batcher
+from app.models.hot_events import HotEvents
+from app.models.push_commit import commit_store
+from app.models.recent_cache import RecentEventsCache
+from app.models.retention import EventRetention
+from app.models.stats import StatsRollups
+from app.models.tenants import TenantRouter
+from app.models.version import CollectionVersion
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 import logging
 import dateutil.parser
 
@@ -10,24 +22,69 @@ logger = logging.getLogger(__name__)
 class WebhookEvent:
     COLLECTION_NAME = 'webhook_events'
     
+    # Fields the API and dashboard read; everything else stays on the server
+    LIST_PROJECTION = {
+        'author': 1,
+        'action': 1,
+        'timestamp': 1,
+        'from_branch': 1,
+        'to_branch': 1,
+        'repository_name': 1,
+        'repository_owner': 1,
+        'commit_message': 1,
+        'pull_request_title': 1,
+        'summary': 1,
+        'commit_count': 1,
+        'title': 1,
+        'status': 1
+    }
+    
+    # Newest-first listing, optionally narrowed by one filter field; _id
+    # breaks timestamp ties so the sort order is total
+    INDEXES = [
+        ([('timestamp', -1), ('_id', -1)], {'name': 'timestamp_desc'}),
+        ([('repository_name', 1), ('timestamp', -1), ('_id', -1)], {'name': 'repository_timestamp'}),
+        ([('author', 1), ('timestamp', -1), ('_id', -1)], {'name': 'author_timestamp'}),
+        ([('action', 1), ('timestamp', -1), ('_id', -1)], {'name': 'action_timestamp'}),
+        # Older documents have no delivery id, so only enforce uniqueness
+        # where one is present
+        ([('delivery_id', 1)], {
+            'name': 'delivery_id_unique',
+            'unique': True,
+            'partialFilterExpression': {'delivery_id': {'$type': 'string'}}
+        })
+    ]
+    
     def __init__(self, request_id, author, action, from_branch=None, to_branch=None, 
                  repository_name=None, repository_url=None, commit_message=None, 
-                 pull_request_title=None, timestamp=None):
+                 pull_request_title=None, timestamp=None, delivery_id=None, commits=None,
+                 title=None, status=None, repository_owner=None):
         self.request_id = request_id
         self.author = author
         self.action = action
         self.from_branch = from_branch
         self.to_branch = to_branch
         self.repository_name = repository_name
+        # Login of the user or organization owning the repository; events
+        # are routed to tenant collections or shards by it
+        self.repository_owner = repository_owner
         self.repository_url = repository_url
         self.commit_message = commit_message
         self.pull_request_title = pull_request_title
         # Use provided timestamp or current UTC time
         self.timestamp = timestamp if timestamp else datetime.now(timezone.utc)
+        # GitHub X-GitHub-Delivery id, unique per delivery and reused on redelivery
+        self.delivery_id = delivery_id
+        # PushCommit records when push expansion is enabled
+        self.commits = commits
+        # Issue title, release tag or workflow name, and the issue action or
+        # run conclusion, for events other than pushes and pull requests
+        self.title = title
+        self.status = status
     
     def to_dict(self):
         """Convert to dictionary for MongoDB storage"""
-        return {
+        document = {
             'request_id': self.request_id,
             'author': self.author,
             'action': self.action,
@@ -37,43 +94,262 @@ class WebhookEvent:
             'repository_url': self.repository_url,
             'commit_message': self.commit_message,
             'pull_request_title': self.pull_request_title,
-            'timestamp': self.timestamp
+            'timestamp': self.timestamp,
+            'delivery_id': self.delivery_id,
+            # When the event was stored; retention counts from it, as
+            # timestamp is the event's own time
+            'received_at': datetime.now(timezone.utc)
         }
+        if self.commits is not None:
+            # The push document references its commits in webhook_commits
+            document['commit_count'] = len(self.commits)
+            document['commit_shas'] = [commit.sha for commit in self.commits]
+        if self.repository_owner is not None:
+            document['repository_owner'] = self.repository_owner
+        if self.title is not None:
+            document['title'] = self.title
+        if self.status is not None:
+            document['status'] = self.status
+        # Precompute the display text once so reads do no string formatting
+        document['summary'] = WebhookEvent.build_summary(document)
+        return document
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create the indexes the events collections rely on"""
+        tenant_router.ensure_indexes()
+    
+    @staticmethod
+    def count_events():
+        """Total number of events from collection metadata, without a scan"""
+        cached = recent_events_cache.count()
+        if cached is not None:
+            return cached
+        return tenant_router.count()
     
     def save(self):
-        """Save event to MongoDB"""
+        """Save event to MongoDB, in the collection of its repository owner"""
         try:
-            collection = get_collection(self.COLLECTION_NAME)
-            result = collection.insert_one(self.to_dict())
-            logger.info(f"Webhook event saved with ID: {result.inserted_id}")
-            return result.inserted_id
+            document = self.to_dict()
+            if self.commits:
+                # Commits point at the push, so its _id is needed up front
+                document['_id'] = ObjectId()
+            collection_name = tenant_router.collection_for(self.repository_owner)
+            if write_batcher.enabled:
+                inserted_id = write_batcher.insert(collection_name, document)
+            else:
+                collection = get_collection(collection_name)
+                inserted_id = collection.insert_one(document).inserted_id
+            logger.debug("Webhook event saved with ID: %s", inserted_id)
+            
+            if self.commits:
+                self._save_commits(inserted_id, collection_name)
+            
+            document['_id'] = inserted_id
+            WebhookEvent.after_insert(document)
+            return inserted_id
+        except DuplicateKeyError:
+            logger.info("Delivery %s already stored, skipping duplicate", self.delivery_id, extra=SAMPLED)
+            raise
         except Exception as e:
-            logger.error(f"Error saving webhook event: {str(e)}")
+            logger.error("Error saving webhook event: %s", e)
             raise
     
+    @staticmethod
+    def after_insert(document):
+        """Update caches, version, rollups and live streams for a stored event"""
+        recent_events_cache.add(document)
+        hot_events.add(document)
+        events_version.bump(document['_id'])
+        stats_rollups.record(document)
+        event_broadcaster.publish(document['_id'], WebhookEvent.serialize(document, version=2))
+    
+    def _save_commits(self, push_id, collection_name=None):
+        """Store the push's commits, removing the push again if that fails"""
+        try:
+            commit_store.insert(push_id, self.commits)
+        except Exception as e:
+            # Without this a redelivery would be rejected as a duplicate and
+            # the commits would never be stored
+            logger.error("Error saving commits of push %s: %s", push_id, e)
+            get_collection(collection_name or tenant_router.name_for(self.repository_owner)).delete_one({'_id': push_id})
+            commit_store.delete(push_id)
+            raise
+    
+    def _complete_commits(self, collection_name):
+        """
+        Store the commits of this push if it is already stored
+
+        The compensating delete in _save_commits runs under the caller's
+        deadline, so a save that ran out of time can leave the push without
+        its commits. Commit inserts are idempotent, so this is safe to repeat.
+        """
+        stored = get_collection(collection_name).find_one({'delivery_id': self.delivery_id}, {'_id': 1})
+        if stored is not None:
+            commit_store.insert(stored['_id'], self.commits)
+    
+    @staticmethod
+    def get_event(event_id):
+        """One event by _id with the listing fields, or None"""
+        event = tenant_router.find_one({'_id': event_id}, WebhookEvent.LIST_PROJECTION)
+        if event is None and event_retention.archive:
+            event = event_retention.find_one({'_id': event_id}, WebhookEvent.LIST_PROJECTION)
+        return event
+    
     @staticmethod
     def get_recent_events(limit=50):
-        """Get recent webhook events from MongoDB"""
+        """Get recent webhook events, from the in-memory cache when it can answer"""
+        cached = recent_events_cache.recent(limit)
+        if cached is not None:
+            return cached
         try:
-            collection = get_collection(WebhookEvent.COLLECTION_NAME)
-            events = collection.find().sort('timestamp', -1).limit(limit)
-            return list(events)
+            hot = hot_events.recent(limit)
+            if hot is not None:
+                return hot
+            return tenant_router.find({}, WebhookEvent.LIST_PROJECTION, -1, limit)
         except Exception as e:
-            logger.error(f"Error fetching webhook events: {str(e)}")
+            logger.error("Error fetching webhook events: %s", e)
             return []
     
+    @staticmethod
+    def find_events(limit=50, before=None, after=None, repository=None, author=None,
+                    action=None, since=None, until=None, owner=None):
+        """
+        Keyset-paginated, filtered listing of events, newest first
+        before/after are opaque cursors from encode_cursor(); returns
+        (events, has_more) where has_more means another page exists in the
+        direction being paged. Listings that run past the live events
+        continue into the archive partitions. With per-tenant collections the
+        listing reads the owner's collections, or all of them merged
+        """
+        query, direction = WebhookEvent.events_query(before, after, repository, author, action, since, until, owner)
+        
+        # The unfiltered first page is served from the in-memory cache, or
+        # the capped hot collection
+        if not query:
+            cached = recent_events_cache.recent(limit + 1)
+            if cached is None:
+                cached = hot_events.recent(limit + 1)
+            if cached is not None:
+                return cached[:limit], len(cached) > limit
+        
+        events = tenant_router.find(query, WebhookEvent.LIST_PROJECTION, direction, limit + 1, owner)
+        if event_retention.archive:
+            cursor = before or after
+            events = event_retention.extend(
+                events, query, WebhookEvent.LIST_PROJECTION, direction, limit + 1,
+                since, until, WebhookEvent.decode_cursor(cursor)[0] if cursor else None
+            )
+        return WebhookEvent.page(events, limit, direction)
+    
+    @staticmethod
+    def events_query(before=None, after=None, repository=None, author=None, action=None,
+                     since=None, until=None, owner=None):
+        """MongoDB filter and sort direction for find_events()"""
+        conditions = []
+        if owner:
+            conditions.append({'repository_owner': owner})
+        if repository:
+            conditions.append({'repository_name': repository})
+        if author:
+            conditions.append({'author': author})
+        if action:
+            conditions.append({'action': action.upper()})
+        if since or until:
+            time_range = {}
+            if since:
+                time_range['$gte'] = since
+            if until:
+                time_range['$lt'] = until
+            conditions.append({'timestamp': time_range})
+        
+        # Seek past the cursor on (timestamp, _id) instead of skipping rows,
+        # so deep pages cost the same as the first one
+        direction = -1
+        if before:
+            timestamp, event_id = WebhookEvent.decode_cursor(before)
+            conditions.append({'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': event_id}}
+            ]})
+        elif after:
+            timestamp, event_id = WebhookEvent.decode_cursor(after)
+            conditions.append({'$or': [
+                {'timestamp': {'$gt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$gt': event_id}}
+            ]})
+            direction = 1
+        
+        query = {'$and': conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+        return query, direction
+    
+    @staticmethod
+    def page(events, limit, direction):
+        """Trim a limit + 1 result to (events newest first, has_more)"""
+        has_more = len(events) > limit
+        events = events[:limit]
+        if direction == 1:
+            events.reverse()
+        return events, has_more
+    
+    @staticmethod
+    def encode_cursor(event):
+        """Opaque pagination cursor pointing at an event's (timestamp, _id)"""
+        timestamp = event['timestamp']
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        raw = f"{timestamp.isoformat()}|{event['_id']}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor from encode_cursor(); raises ValueError when malformed"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+            timestamp, event_id = raw.split('|', 1)
+            return datetime.fromisoformat(timestamp), ObjectId(event_id)
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor}")
+    
+    @staticmethod
+    def serialize(event, version=1):
+        """
+        Shape a stored event for the API and the live event stream
+        Version 1 carries a server-rendered message with relative time. Version
+        2 carries the summary stored at ingest plus a UTC timestamp, and the
+        client renders the relative time
+        """
+        timestamp = event['timestamp']
+        if version == 2:
+            if isinstance(timestamp, datetime) and timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            return {
+                'id': str(event['_id']),
+                'summary': event.get('summary') or WebhookEvent.build_summary(event),
+                'detail': WebhookEvent.message_detail(event),
+                'action': event['action'],
+                'author': event['author'],
+                'repository': event.get('repository_name'),
+                'owner': event.get('repository_owner'),
+                'from_branch': event.get('from_branch'),
+                'to_branch': event.get('to_branch'),
+                'commit_count': event.get('commit_count'),
+                'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
+            }
+        return {
+            'id': str(event['_id']),
+            'message': WebhookEvent.format_message(event),
+            'action': event['action'],
+            'author': event['author'],
+            'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
+        }
+    
     @staticmethod
     def format_message(event):
         """Format event message for display with proper current time calculation"""
         try:
-            author = event['author']
-            action = event['action']
             timestamp = event['timestamp']
-            from_branch = event.get('from_branch')
-            to_branch = event.get('to_branch')
-            repository_name = event.get('repository_name', 'Unknown Repository')
-            commit_message = event.get('commit_message')
-            pull_request_title = event.get('pull_request_title')
             
             # Calculate time difference from now
             now = datetime.now(timezone.utc)
@@ -94,31 +370,57 @@ class WebhookEvent:
                 except:
                     formatted_time = str(timestamp)
             
-            # Format message based on action type
-            if action == 'PUSH':
-                base_message = f'"{author}" pushed to "{to_branch}" in "{repository_name}" {formatted_time}'
-                if commit_message:
-                    base_message += f' - "{commit_message}"'
-                return base_message
-                
-            elif action == 'PULL_REQUEST':
-                base_message = f'"{author}" submitted a pull request from "{from_branch}" to "{to_branch}" in "{repository_name}" {formatted_time}'
-                if pull_request_title:
-                    base_message += f' - "{pull_request_title}"'
-                return base_message
-                
-            elif action == 'MERGE':
-                base_message = f'"{author}" merged branch "{from_branch}" to "{to_branch}" in "{repository_name}" {formatted_time}'
-                if pull_request_title:
-                    base_message += f' - "{pull_request_title}"'
-                return base_message
-            else:
-                return f'"{author}" performed {action} in "{repository_name}" {formatted_time}'
+            # Summary is stored at ingest; older documents build it here
+            summary = event.get('summary') or WebhookEvent.build_summary(event)
+            message = f'{summary} {formatted_time}'
+            detail = WebhookEvent.message_detail(event)
+            if detail:
+                message += f' - "{detail}"'
+            return message
                 
         except Exception as e:
-            logger.error(f"Error formatting message: {str(e)}")
+            logger.error("Error formatting message: %s", e)
             return "Error formatting event message"
     
+    @staticmethod
+    def build_summary(event):
+        """Static part of an event message: everything except time and detail"""
+        author = event['author']
+        action = event['action']
+        from_branch = event.get('from_branch')
+        to_branch = event.get('to_branch')
+        repository_name = event.get('repository_name', 'Unknown Repository')
+        
+        # Format message based on action type
+        if action == 'PUSH':
+            return f'"{author}" pushed to "{to_branch}" in "{repository_name}"'
+        elif action == 'PULL_REQUEST':
+            return f'"{author}" submitted a pull request from "{from_branch}" to "{to_branch}" in "{repository_name}"'
+        elif action == 'MERGE':
+            return f'"{author}" merged branch "{from_branch}" to "{to_branch}" in "{repository_name}"'
+        elif action == 'ISSUE':
+            return f'"{author}" {event.get("status")} an issue in "{repository_name}"'
+        elif action == 'RELEASE':
+            return f'"{author}" published release "{event.get("title")}" in "{repository_name}"'
+        elif action == 'WORKFLOW_RUN':
+            return f'Workflow "{event.get("title")}" run by "{author}" on "{to_branch}" in "{repository_name}": {event.get("status")}'
+        elif action == 'CHECK_SUITE':
+            return f'"{author}" checks on "{to_branch}" in "{repository_name}": {event.get("status")}'
+        else:
+            return f'"{author}" performed {action} in "{repository_name}"'
+    
+    @staticmethod
+    def message_detail(event):
+        """Commit message or pull request title shown after the summary"""
+        action = event['action']
+        if action == 'PUSH':
+            return event.get('commit_message')
+        if action in ('PULL_REQUEST', 'MERGE'):
+            return event.get('pull_request_title')
+        if action == 'ISSUE':
+            return event.get('title')
+        return None
+    
     @staticmethod
     def _format_time_ago(time_diff):
         """Format time difference as human-readable string"""
@@ -140,8 +442,11 @@ class WebhookEvent:
             return f"{weeks} week{'s' if weeks > 1 else ''} ago"
     
     @staticmethod
-    def from_github_push(payload):
-        """Create WebhookEvent from GitHub push payload using actual commit timestamp"""
+    def from_github_push(payload, expand_commits=False):
+        """
+        Create WebhookEvent from GitHub push payload using actual commit timestamp
+        With expand_commits every commit in the push is kept as a PushCommit
+        """
         try:
             # Extract commit information from the latest commit
             commit_message = None
@@ -156,9 +461,9 @@ class WebhookEvent:
                 if commit_timestamp_str:
                     try:
                         commit_timestamp = dateutil.parser.parse(commit_timestamp_str)
-                        logger.info(f"Using GitHub commit timestamp: {commit_timestamp}")
+                        logger.debug("Using GitHub commit timestamp: %s", commit_timestamp)
                     except Exception as e:
-                        logger.warning(f"Could not parse commit timestamp {commit_timestamp_str}: {e}")
+                        logger.warning("Could not parse commit timestamp %s: %s", commit_timestamp_str, e)
                         commit_timestamp = datetime.now(timezone.utc)
                 else:
                     # Fallback to webhook received time
@@ -175,18 +480,27 @@ class WebhookEvent:
             ref = payload.get('ref', '')
             branch_name = ref.split('/')[-1] if ref.startswith('refs/heads/') else ref
             
+            author = payload['pusher']['name']
+            commits = None
+            if expand_commits:
+                commits = commit_store.expand(
+                    payload.get('commits'), repository_name, branch_name, author, commit_timestamp
+                )
+            
             return WebhookEvent(
                 request_id=payload.get('after', '')[:12],
-                author=payload['pusher']['name'],
+                author=author,
                 action='PUSH',
                 to_branch=branch_name,
                 repository_name=repository_name,
                 repository_url=repository_url,
+                repository_owner=(repository.get('owner') or {}).get('login'),
                 commit_message=commit_message,
-                timestamp=commit_timestamp
+                timestamp=commit_timestamp,
+                commits=commits
             )
         except KeyError as e:
-            logger.error(f"Missing key in push payload: {str(e)}")
+            logger.error("Missing key in push payload: %s", e)
             raise ValueError(f"Invalid push payload: missing {str(e)}")
     
     @staticmethod
@@ -202,9 +516,9 @@ class WebhookEvent:
             if created_at:
                 try:
                     pr_timestamp = dateutil.parser.parse(created_at)
-                    logger.info(f"Using GitHub PR timestamp: {pr_timestamp}")
+                    logger.debug("Using GitHub PR timestamp: %s", pr_timestamp)
                 except Exception as e:
-                    logger.warning(f"Could not parse PR timestamp {created_at}: {e}")
+                    logger.warning("Could not parse PR timestamp %s: %s", created_at, e)
             
             return WebhookEvent(
                 request_id=str(pr['id']),
@@ -214,11 +528,12 @@ class WebhookEvent:
                 to_branch=pr['base']['ref'],
                 repository_name=repository.get('name', 'Unknown'),
                 repository_url=repository.get('html_url', ''),
+                repository_owner=(repository.get('owner') or {}).get('login'),
                 pull_request_title=pr.get('title', '')[:100],
                 timestamp=pr_timestamp
             )
         except KeyError as e:
-            logger.error(f"Missing key in pull request payload: {str(e)}")
+            logger.error("Missing key in pull request payload: %s", e)
             raise ValueError(f"Invalid pull request payload: missing {str(e)}")
     
     @staticmethod
@@ -234,9 +549,9 @@ class WebhookEvent:
             if merged_at:
                 try:
                     merge_timestamp = dateutil.parser.parse(merged_at)
-                    logger.info(f"Using GitHub merge timestamp: {merge_timestamp}")
+                    logger.debug("Using GitHub merge timestamp: %s", merge_timestamp)
                 except Exception as e:
-                    logger.warning(f"Could not parse merge timestamp {merged_at}: {e}")
+                    logger.warning("Could not parse merge timestamp %s: %s", merged_at, e)
             
             return WebhookEvent(
                 request_id=str(pr['id']),
@@ -246,9 +561,141 @@ class WebhookEvent:
                 to_branch=pr['base']['ref'],
                 repository_name=repository.get('name', 'Unknown'),
                 repository_url=repository.get('html_url', ''),
+                repository_owner=(repository.get('owner') or {}).get('login'),
                 pull_request_title=pr.get('title', '')[:100],
                 timestamp=merge_timestamp
             )
         except KeyError as e:
-            logger.error(f"Missing key in merge payload: {str(e)}")
-            raise ValueError(f"Invalid merge payload: missing {str(e)}")
\ No newline at end of file
+            logger.error("Missing key in merge payload: %s", e)
+            raise ValueError(f"Invalid merge payload: missing {str(e)}")
+    
+    @staticmethod
+    def _github_timestamp(value, what):
+        """Parse a GitHub ISO timestamp, falling back to now"""
+        if value:
+            try:
+                return dateutil.parser.parse(value)
+            except Exception as e:
+                logger.warning("Could not parse %s timestamp %s: %s", what, value, e)
+        return datetime.now(timezone.utc)
+    
+    @staticmethod
+    def from_github_issue(payload):
+        """Create WebhookEvent from GitHub issues payload (opened, closed, reopened)"""
+        try:
+            issue = payload['issue']
+            repository = payload.get('repository', {})
+            action = payload['action']
+            # When the issue was opened or closed; reopening only bumps updated_at
+            when = {'opened': 'created_at', 'closed': 'closed_at'}.get(action, 'updated_at')
+            
+            return WebhookEvent(
+                request_id=str(issue['id']),
+                author=(payload.get('sender') or issue['user'])['login'],
+                action='ISSUE',
+                repository_name=repository.get('name', 'Unknown'),
+                repository_url=repository.get('html_url', ''),
+                repository_owner=(repository.get('owner') or {}).get('login'),
+                timestamp=WebhookEvent._github_timestamp(issue.get(when), 'issue'),
+                title=(issue.get('title') or '')[:100],
+                status=action
+            )
+        except KeyError as e:
+            logger.error("Missing key in issues payload: %s", e)
+            raise ValueError(f"Invalid issues payload: missing {str(e)}")
+    
+    @staticmethod
+    def from_github_release(payload):
+        """Create WebhookEvent from GitHub release payload"""
+        try:
+            release = payload['release']
+            repository = payload.get('repository', {})
+            
+            return WebhookEvent(
+                request_id=str(release['id']),
+                author=release['author']['login'],
+                action='RELEASE',
+                to_branch=release.get('target_commitish'),
+                repository_name=repository.get('name', 'Unknown'),
+                repository_url=repository.get('html_url', ''),
+                repository_owner=(repository.get('owner') or {}).get('login'),
+                timestamp=WebhookEvent._github_timestamp(release.get('published_at'), 'release'),
+                title=release['tag_name'][:100],
+                status=payload.get('action')
+            )
+        except KeyError as e:
+            logger.error("Missing key in release payload: %s", e)
+            raise ValueError(f"Invalid release payload: missing {str(e)}")
+    
+    @staticmethod
+    def from_github_workflow_run(payload):
+        """Create WebhookEvent from a completed GitHub workflow_run payload"""
+        try:
+            run = payload['workflow_run']
+            repository = payload.get('repository', {})
+            
+            return WebhookEvent(
+                request_id=str(run['id']),
+                author=(run.get('actor') or payload['sender'])['login'],
+                action='WORKFLOW_RUN',
+                to_branch=run.get('head_branch'),
+                repository_name=repository.get('name', 'Unknown'),
+                repository_url=repository.get('html_url', ''),
+                repository_owner=(repository.get('owner') or {}).get('login'),
+                timestamp=WebhookEvent._github_timestamp(run.get('updated_at'), 'workflow run'),
+                title=(run.get('name') or '')[:100],
+                status=run.get('conclusion')
+            )
+        except KeyError as e:
+            logger.error("Missing key in workflow_run payload: %s", e)
+            raise ValueError(f"Invalid workflow_run payload: missing {str(e)}")
+    
+    @staticmethod
+    def from_github_check_suite(payload):
+        """Create WebhookEvent from a completed GitHub check_suite payload"""
+        try:
+            suite = payload['check_suite']
+            repository = payload.get('repository', {})
+            app = suite.get('app') or {}
+            
+            return WebhookEvent(
+                request_id=str(suite['id']),
+                author=app.get('name') or payload['sender']['login'],
+                action='CHECK_SUITE',
+                to_branch=suite.get('head_branch'),
+                repository_name=repository.get('name', 'Unknown'),
+                repository_url=repository.get('html_url', ''),
+                repository_owner=(repository.get('owner') or {}).get('login'),
+                timestamp=WebhookEvent._github_timestamp(suite.get('updated_at'), 'check suite'),
+                status=suite.get('conclusion')
+            )
+        except KeyError as e:
+            logger.error("Missing key in check_suite payload: %s", e)
+            raise ValueError(f"Invalid check_suite payload: missing {str(e)}")
+
+# Per-tenant collections or sharding of webhook_events by repository owner
+tenant_router = TenantRouter(WebhookEvent.COLLECTION_NAME, WebhookEvent.INDEXES)
+
+# Newest events kept in memory for the dashboard read endpoints
+recent_events_cache = RecentEventsCache(
+    WebhookEvent.COLLECTION_NAME, WebhookEvent.LIST_PROJECTION, collections=tenant_router.collection_names
+)
+
+# Newest events in a capped collection, for reads the cache cannot answer
+hot_events = HotEvents(
+    WebhookEvent.COLLECTION_NAME, WebhookEvent.LIST_PROJECTION, collections=tenant_router.collection_names
+)
+
+# TTL expiry or archiving of events past the retention window
+event_retention = EventRetention(
+    WebhookEvent.COLLECTION_NAME, WebhookEvent.INDEXES, collections=tenant_router.collection_names
+)
+# Tenant collections created later get the TTL index too
+tenant_router.on_create.append(event_retention.ensure_indexes)
+
+# Version token of webhook_events used for API ETags
+events_version = CollectionVersion(WebhookEvent.COLLECTION_NAME, collections=tenant_router.collection_names)
+events_version.track(recent_events_cache)
+
+# Per-minute/hour/day event counts behind /api/stats
+stats_rollups = StatsRollups(WebhookEvent.COLLECTION_NAME, collections=tenant_router.collection_names)
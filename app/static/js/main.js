@@ -5,6 +5,17 @@ let isLoading = false;
 let lastEventCount = 0;
 let pollInterval;
 let lastEventId = null;
+let eventSource = null;
+let currentEvents = [];
+
+// Events kept on screen, matching the /api/events page size
+const MAX_EVENTS = 50;
+
+// Response shape with a stored summary and UTC timestamp; relative times
+// are rendered here instead of on the server. The columnar format sends
+// each repeated name once and is turned back into objects by
+// decodeColumnar()
+const EVENTS_URL = '/api/events?v=2&format=columnar';
 
 // DOM elements
 const statusDot = document.getElementById('statusDot');
@@ -16,6 +27,13 @@ const loadingEl = document.getElementById('loading');
 const noEventsEl = document.getElementById('noEvents');
 const eventsListEl = document.getElementById('eventsList');
 const webhookUrlEl = document.getElementById('webhookUrl');
+const refreshRateEl = document.getElementById('refreshRate');
+const last24hEl = document.getElementById('last24h');
+const last24hBreakdownEl = document.getElementById('last24hBreakdown');
+
+// Rollup counts change at most once a second, so a minute is plenty
+const STATS_URL = '/api/stats?granularity=hour';
+const STATS_REFRESH_MS = 60000;
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -27,11 +45,18 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initial fetch
     fetchEvents();
     
-    // Start polling every 10 seconds
-    startPolling();
+    // Prefer the live event stream, polling every 10 seconds as a fallback
+    startLiveUpdates();
     
     // Add refresh button click handler
     refreshBtn.addEventListener('click', fetchEvents);
+    
+    // Keep "x minutes ago" current without refetching
+    setInterval(refreshRelativeTimes, 30000);
+    
+    // Last 24 hours breakdown from the pre-aggregated rollups
+    fetchStats();
+    setInterval(fetchStats, STATS_REFRESH_MS);
 });
 
 function setWebhookUrl() {
@@ -52,6 +77,69 @@ function startPolling() {
     console.log('Started polling every 10 seconds');
 }
 
+function stopPolling() {
+    if (pollInterval) {
+        clearInterval(pollInterval);
+        pollInterval = null;
+    }
+}
+
+function startLiveUpdates() {
+    // Browsers without EventSource keep polling
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    if (eventSource) {
+        eventSource.close();
+    }
+    
+    // EventSource reconnects on its own and resends Last-Event-ID
+    eventSource = new EventSource('/api/events/stream');
+    
+    eventSource.addEventListener('open', function() {
+        console.log('Live event stream connected');
+        stopPolling();
+        updateStatus('online', 'Live');
+        refreshRateEl.textContent = 'Live';
+    });
+    
+    eventSource.addEventListener('event', function(e) {
+        handleStreamedEvent(JSON.parse(e.data));
+    });
+    
+    // Sent when the server cannot replay everything we missed
+    eventSource.addEventListener('reset', function() {
+        fetchEvents();
+    });
+    
+    eventSource.addEventListener('error', function() {
+        // Poll while the stream is down or reconnecting
+        if (!pollInterval) {
+            console.log('Live event stream unavailable, falling back to polling');
+            refreshRateEl.textContent = '10s';
+            startPolling();
+        }
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+        }
+    });
+}
+
+function handleStreamedEvent(event) {
+    if (currentEvents.some(existing => existing.id === event.id)) {
+        return;
+    }
+    
+    currentEvents = [event, ...currentEvents].slice(0, MAX_EVENTS);
+    lastEventId = event.id;
+    displayEvents(currentEvents, true);
+    updateStats(currentEvents.length);
+    updateLastUpdateTime();
+    showSuccessMessage('New activity detected!');
+}
+
 async function fetchEvents() {
     if (isLoading) {
         return;
@@ -61,17 +149,19 @@ async function fetchEvents() {
     updateLoadingState(true);
     
     try {
-        const response = await fetch('/api/events');
+        const response = await fetch(EVENTS_URL);
         const data = await response.json();
         
         if (data.success) {
-            displayEvents(data.events);
+            const events = data.format === 'columnar' ? decodeColumnar(data) : data.events;
+            currentEvents = events;
+            displayEvents(events);
             updateStats(data.count);
             updateStatus('online', 'Connected');
             
             // Check for new events
-            if (data.events.length > 0 && data.events[0].id !== lastEventId) {
-                lastEventId = data.events[0].id;
+            if (events.length > 0 && events[0].id !== lastEventId) {
+                lastEventId = events[0].id;
                 if (lastEventCount > 0) {
                     showSuccessMessage('New activity detected!');
                 }
@@ -92,6 +182,23 @@ async function fetchEvents() {
     }
 }
 
+// Rebuild event objects from a columnar /api/events response: one array
+// per field, with dictionary fields holding indexes into data.strings
+function decodeColumnar(data) {
+    const fields = Object.keys(data.columns);
+    const dictionaryFields = new Set(data.dictionary_fields);
+    const events = [];
+    for (let row = 0; row < data.count; row++) {
+        const event = {};
+        for (const field of fields) {
+            const value = data.columns[field][row];
+            event[field] = dictionaryFields.has(field) && value !== null ? data.strings[value] : value;
+        }
+        events.push(event);
+    }
+    return events;
+}
+
 function updateLoadingState(loading) {
     if (loading && !eventsListEl.querySelector('.event-item')) {
         // Only show loading if there are no events displayed
@@ -108,7 +215,7 @@ function updateLoadingState(loading) {
         '<i class="fas fa-sync-alt"></i> Refresh';
 }
 
-function displayEvents(events) {
+function displayEvents(events, hasNewEvent = false) {
     if (!events || events.length === 0) {
         eventsListEl.style.display = 'none';
         noEventsEl.style.display = 'block';
@@ -119,7 +226,7 @@ function displayEvents(events) {
     eventsListEl.style.display = 'block';
     
     // Check for new events
-    const hasNewEvents = events.length > lastEventCount;
+    const hasNewEvents = hasNewEvent || events.length > lastEventCount;
     
     // Clear existing events
     eventsListEl.innerHTML = '';
@@ -142,9 +249,7 @@ function createEventElement(event, isNew = false) {
     const actionType = event.action.toLowerCase().replace('_', '-');
     const iconClass = getIconClass(event.action);
     const badgeClass = actionType;
-    
-    // Parse additional details from the message
-    const eventDetails = parseEventMessage(event.message);
+    const branches = getBranches(event);
     
     // Clean event display - no redundant timestamps
     eventItem.innerHTML = `
@@ -152,18 +257,22 @@ function createEventElement(event, isNew = false) {
             <i class="${iconClass}"></i>
         </div>
         <div class="event-content">
-            <div class="event-message">${escapeHtml(event.message)}</div>
+            <div class="event-message">
+                ${escapeHtml(event.summary)}
+                <span class="event-time" data-timestamp="${escapeHtml(event.timestamp)}">${formatTimeAgo(event.timestamp)}</span>
+                ${event.detail ? ` - "${escapeHtml(event.detail)}"` : ''}
+            </div>
             <div class="event-meta">
-                ${eventDetails.repository ? `
+                ${event.repository ? `
                     <span class="event-repo">
                         <i class="fab fa-github"></i>
-                        ${escapeHtml(eventDetails.repository)}
+                        ${escapeHtml(event.repository)}
                     </span>
                 ` : ''}
-                ${eventDetails.branches ? `
+                ${branches ? `
                     <span class="event-branches">
                         <i class="fas fa-code-branch"></i>
-                        ${escapeHtml(eventDetails.branches)}
+                        ${escapeHtml(branches)}
                     </span>
                 ` : ''}
             </div>
@@ -174,29 +283,40 @@ function createEventElement(event, isNew = false) {
     return eventItem;
 }
 
-function parseEventMessage(message) {
-    const details = {};
-    
-    // Extract repository name
-    const repoMatch = message.match(/in "([^"]+)"/);
-    if (repoMatch) {
-        details.repository = repoMatch[1];
+function getBranches(event) {
+    if (event.action === 'PUSH') {
+        return event.to_branch;
     }
-    
-    // Extract branch information
-    const pushMatch = message.match(/pushed to "([^"]+)"/);
-    const prMatch = message.match(/from "([^"]+)" to "([^"]+)"/);
-    const mergeMatch = message.match(/branch "([^"]+)" to "([^"]+)"/);
-    
-    if (pushMatch) {
-        details.branches = pushMatch[1];
-    } else if (prMatch) {
-        details.branches = `${prMatch[1]} → ${prMatch[2]}`;
-    } else if (mergeMatch) {
-        details.branches = `${mergeMatch[1]} → ${mergeMatch[2]}`;
+    if (event.from_branch && event.to_branch) {
+        return `${event.from_branch} → ${event.to_branch}`;
+    }
+    return event.to_branch || null;
+}
+
+function formatTimeAgo(timestamp) {
+    // Same wording as WebhookEvent._format_time_ago on the server
+    const totalSeconds = Math.floor((Date.now() - new Date(timestamp).getTime()) / 1000);
+    if (isNaN(totalSeconds)) {
+        return '';
     }
     
-    return details;
+    const plural = (value, unit) => `${value} ${unit}${value > 1 ? 's' : ''} ago`;
+    if (totalSeconds < 60) {
+        return 'just now';
+    } else if (totalSeconds < 3600) {
+        return plural(Math.floor(totalSeconds / 60), 'minute');
+    } else if (totalSeconds < 86400) {
+        return plural(Math.floor(totalSeconds / 3600), 'hour');
+    } else if (totalSeconds < 604800) {
+        return plural(Math.floor(totalSeconds / 86400), 'day');
+    }
+    return plural(Math.floor(totalSeconds / 604800), 'week');
+}
+
+function refreshRelativeTimes() {
+    document.querySelectorAll('.event-time').forEach(element => {
+        element.textContent = formatTimeAgo(element.dataset.timestamp);
+    });
 }
 
 function getIconClass(action) {
@@ -207,11 +327,36 @@ function getIconClass(action) {
             return 'fas fa-code-branch';
         case 'MERGE':
             return 'fas fa-code-merge';
+        case 'ISSUE':
+            return 'fas fa-circle-dot';
+        case 'RELEASE':
+            return 'fas fa-tag';
+        case 'WORKFLOW_RUN':
+            return 'fas fa-gears';
+        case 'CHECK_SUITE':
+            return 'fas fa-list-check';
         default:
             return 'fas fa-code';
     }
 }
 
+async function fetchStats() {
+    try {
+        const response = await fetch(STATS_URL);
+        const data = await response.json();
+        if (!data.success) {
+            return;
+        }
+        
+        const actions = data.breakdown.action || {};
+        last24hEl.textContent = data.total;
+        last24hBreakdownEl.textContent =
+            `Last 24 Hours: ${actions.PUSH || 0} pushes, ${actions.PULL_REQUEST || 0} PRs, ${actions.MERGE || 0} merges`;
+    } catch (error) {
+        console.error('Error fetching stats:', error);
+    }
+}
+
 function updateStats(count) {
     totalEventsEl.textContent = count;
     
@@ -391,6 +536,11 @@ function escapeHtml(text) {
 
 // Handle page visibility change to optimize polling
 document.addEventListener('visibilitychange', function() {
+    // The live stream costs nothing while idle, so leave it running
+    if (eventSource && eventSource.readyState === EventSource.OPEN) {
+        return;
+    }
+    
     if (document.hidden) {
         // Page is hidden, reduce polling frequency
         if (pollInterval) {
@@ -409,14 +559,16 @@ window.addEventListener('online', function() {
     updateStatus('online', 'Connected');
     showSuccessMessage('Connection restored!');
     fetchEvents();
-    startPolling();
+    startLiveUpdates();
 });
 
 window.addEventListener('offline', function() {
     updateStatus('offline', 'Offline');
     showErrorMessage('Connection lost. Will retry when back online.');
-    if (pollInterval) {
-        clearInterval(pollInterval);
+    stopPolling();
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
     }
 });
 
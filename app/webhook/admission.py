@@ -0,0 +1,374 @@
+# app/webhook/admission.py
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Shared counters besides the per-worker in-flight counts
+COUNTERS = ('limit', 'latency_ms', 'rate_limited', 'shed')
+
+# GitHub App hooks all carry the app as their target; the installation is
+# only in the body, usually near its end
+_INSTALLATION_ID = re.compile(rb'"installation"\s*:\s*\{\s*"id"\s*:\s*(\d+)')
+
+def _bucket_hash(key):
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+class LocalStore:
+    """Admission state of this process only"""
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._counters = dict.fromkeys(COUNTERS, 0.0)
+        self._in_flight = 0
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            yield self
+
+    def bucket(self, key):
+        """(ref, tokens, updated) of a bucket; tokens is None for a new one"""
+        tokens, updated = self._buckets.get(key, (None, 0.0))
+        return key, tokens, updated
+
+    def store_bucket(self, ref, tokens, updated):
+        self._buckets[ref] = (tokens, updated)
+
+    def get(self, name):
+        return self._counters[name]
+
+    def set(self, name, value):
+        self._counters[name] = value
+
+    def in_flight(self):
+        return self._in_flight
+
+    def add_in_flight(self, delta):
+        self._in_flight = max(0, self._in_flight + delta)
+
+class SharedStore:
+    """
+    Admission state in a memory-mapped file shared by the workers of a host
+
+    The file holds the counters, one in-flight count per worker process and
+    an open-addressed table of token buckets. Every read-modify-write holds
+    a flock on the file plus a thread lock, since flock does not exclude
+    threads of one process. Each process opens the file itself, so forked
+    workers do not share a lock, and on opening it clears the in-flight
+    counts of workers that are no longer running. A bucket that cannot be
+    placed within PROBES slots replaces the least recently used one it saw;
+    a bucket idle long enough to have refilled loses nothing by that.
+    """
+
+    shared = True
+    MAGIC = b'WHADM001'
+    HEADER = struct.Struct('<8sQQ')
+    SLOT = struct.Struct('<Qdd')
+    WORKERS = 256
+    PROBES = 8
+
+    def __init__(self, path, slots=4096):
+        self.path = path
+        self.slots = max(1, slots)
+        self._counters_at = self.HEADER.size
+        self._pids_at = self._counters_at + 8 * len(COUNTERS)
+        self._in_flight_at = self._pids_at + 8 * self.WORKERS
+        self._slots_at = self._in_flight_at + 8 * self.WORKERS
+        self.size = self._slots_at + self.SLOT.size * self.slots
+        self._all_in_flight = struct.Struct(f'<{self.WORKERS}d')
+        self._all_pids = struct.Struct(f'<{self.WORKERS}Q')
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._worker = None
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self.size)
+            state = mmap.mmap(fd, self.size)
+            magic, slots, workers = self.HEADER.unpack_from(state, 0)
+            if magic != self.MAGIC or slots != self.slots or workers != self.WORKERS:
+                state[:] = bytes(self.size)
+                self.HEADER.pack_into(state, 0, self.MAGIC, self.slots, self.WORKERS)
+            self._map = state
+            self._worker = self._claim_worker(os.getpid())
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        if self._fd is not None:
+            # Inherited from the parent process; its lock is the parent's
+            os.close(self._fd)
+        self._fd = fd
+        self._pid = os.getpid()
+
+    def _claim_worker(self, pid):
+        """Slot of this process's in-flight count; slots of exited processes are freed"""
+        pids = self._all_pids.unpack_from(self._map, self._pids_at)
+        claimed = None
+        for index, owner in enumerate(pids):
+            if owner and owner != pid and not _running(owner):
+                owner = 0
+                self._set_worker(index, 0, 0.0)
+            if claimed is None and owner in (0, pid):
+                claimed = index
+        if claimed is None:
+            # More workers than slots: the last slot is shared, which only
+            # makes the count approximate
+            logger.warning("More than %s workers share %s", self.WORKERS, self.path)
+            return self.WORKERS - 1
+        self._set_worker(claimed, pid, 0.0)
+        return claimed
+
+    def _set_worker(self, index, pid, in_flight):
+        struct.pack_into('<Q', self._map, self._pids_at + 8 * index, pid)
+        struct.pack_into('<d', self._map, self._in_flight_at + 8 * index, in_flight)
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def bucket(self, key):
+        """(ref, tokens, updated) of a bucket; tokens is None for a new one"""
+        key_hash = _bucket_hash(key)
+        oldest = None
+        for probe in range(self.PROBES):
+            position = (key_hash + probe) % self.slots
+            stored_hash, tokens, updated = self.SLOT.unpack_from(self._map, self._slots_at + self.SLOT.size * position)
+            if stored_hash == key_hash:
+                return (position, key_hash), tokens, updated
+            if stored_hash == 0:
+                return (position, key_hash), None, 0.0
+            if oldest is None or updated < oldest[1]:
+                oldest = (position, updated)
+        return (oldest[0], key_hash), None, 0.0
+
+    def store_bucket(self, ref, tokens, updated):
+        position, key_hash = ref
+        self.SLOT.pack_into(self._map, self._slots_at + self.SLOT.size * position, key_hash, tokens, updated)
+
+    def get(self, name):
+        return struct.unpack_from('<d', self._map, self._counters_at + 8 * COUNTERS.index(name))[0]
+
+    def set(self, name, value):
+        struct.pack_into('<d', self._map, self._counters_at + 8 * COUNTERS.index(name), value)
+
+    def in_flight(self):
+        return int(sum(self._all_in_flight.unpack_from(self._map, self._in_flight_at)))
+
+    def add_in_flight(self, delta):
+        offset = self._in_flight_at + 8 * self._worker
+        current = struct.unpack_from('<d', self._map, offset)[0]
+        struct.pack_into('<d', self._map, offset, max(0.0, current + delta))
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def default_state_file():
+    """A per-deployment file in /dev/shm (or the temp directory) that every worker of this app opens"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    deployment = hashlib.sha1(os.getcwd().encode('utf-8')).hexdigest()[:12]
+    return os.path.join(directory, f'webhook-admission-{deployment}')
+
+class AdmissionControl:
+    """
+    Per-source rate limiting and adaptive load shedding for the receiver
+
+    Rate limiting takes a token from two buckets, and deliveries finding
+    one empty get 429. Before the body is verified, the client address
+    pays from a bucket of RATE_LIMIT_ADDRESS_BURST refilled at
+    RATE_LIMIT_ADDRESS_PER_MINUTE, so an unauthenticated flood is turned
+    away cheaply. Only once the signature has been verified does the source
+    pay from its bucket of RATE_LIMIT_BURST refilled at
+    RATE_LIMIT_PER_MINUTE; so a sender that forges the hook headers cannot
+    drain another source's budget. A source is the repository,
+    organization or GitHub App installation the hook belongs to
+    (X-GitHub-Hook-Installation-Target-Type/-ID, the installation id being
+    read from the raw body for app hooks), else the hook id, else the
+    client address. Without a webhook secret nothing is verified, and the
+    headers are taken as sent.
+
+    Shedding bounds the receiver requests in flight across the workers.
+    The bound moves with the smoothed MongoDB write latency: it shrinks
+    toward SHED_MIN_IN_FLIGHT while writes take longer than
+    SHED_TARGET_LATENCY_MS and grows back toward SHED_MAX_IN_FLIGHT while
+    they do not. Requests over it get 503 with Retry-After at once instead
+    of queueing behind a slow database. The counters live in a
+    memory-mapped file every worker on the host opens (ADMISSION_STORE
+    'shared'), or per process ('local', and wherever flock is unavailable).
+    GitHub does not retry failed deliveries on its own, so rejected ones
+    have to be redelivered from the hook's delivery log.
+    """
+
+    # Weight of a new latency sample in the smoothed latency
+    SMOOTHING = 0.2
+
+    def __init__(self, app=None):
+        self.rate_limiting = False
+        self.shedding = False
+        self.rate = 10.0
+        self.burst = 120.0
+        self.address_rate = 100.0
+        self.address_burst = 1200.0
+        self.target_ms = 250.0
+        self.min_in_flight = 4
+        self.max_in_flight = 64
+        self.retry_after = 5
+        self.store = LocalStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure admission control from the app config"""
+        self.rate_limiting = app.config.get('RATE_LIMIT_ENABLED', False)
+        self.shedding = app.config.get('SHEDDING_ENABLED', False)
+        self.rate = max(app.config.get('RATE_LIMIT_PER_MINUTE', 600), 1) / 60.0
+        self.burst = float(max(app.config.get('RATE_LIMIT_BURST', 120), 1))
+        # 0 turns the per-address limit off
+        self.address_rate = max(app.config.get('RATE_LIMIT_ADDRESS_PER_MINUTE', 6000), 0) / 60.0
+        self.address_burst = float(max(app.config.get('RATE_LIMIT_ADDRESS_BURST', 1200), 1))
+        self.target_ms = float(app.config.get('SHED_TARGET_LATENCY_MS', 250))
+        self.max_in_flight = max(1, app.config.get('SHED_MAX_IN_FLIGHT', 64))
+        self.min_in_flight = min(max(1, app.config.get('SHED_MIN_IN_FLIGHT', 4)), self.max_in_flight)
+        self.retry_after = app.config.get('SHED_RETRY_AFTER', 5)
+        self.store = LocalStore()
+        if (self.rate_limiting or self.shedding) and app.config.get('ADMISSION_STORE', 'shared') == 'shared':
+            if fcntl is None:
+                logger.warning("flock is not available here, admission counters are kept per process")
+            else:
+                path = app.config.get('ADMISSION_STATE_FILE') or default_state_file()
+                self.store = SharedStore(path, app.config.get('ADMISSION_BUCKETS', 4096))
+
+    @property
+    def enabled(self):
+        return self.rate_limiting or self.shedding
+
+    @staticmethod
+    def source_key(headers, body, remote_addr=None):
+        """Rate limit key of a verified delivery from its (lower-case) headers"""
+        target_type = headers.get('x-github-hook-installation-target-type')
+        target_id = headers.get('x-github-hook-installation-target-id')
+        if target_type and target_id:
+            if target_type == 'integration':
+                match = _INSTALLATION_ID.search(body)
+                if match:
+                    return f'installation:{match.group(1).decode()}'
+            return f'{target_type}:{target_id}'
+        hook_id = headers.get('x-github-hook-id')
+        if hook_id:
+            return f'hook:{hook_id}'
+        return f'address:{remote_addr}'
+
+    def check_address(self, remote_addr):
+        """Take a token from the client address's bucket, before verification; as check_rate"""
+        if not self.address_rate:
+            return 0
+        return self._take(f'client:{remote_addr}', self.address_rate, self.address_burst)
+
+    def check_rate(self, key):
+        """Take a token from key's bucket; 0 when allowed, else seconds until one is available"""
+        return self._take(key, self.rate, self.burst)
+
+    def _take(self, key, rate, burst):
+        now = time.time()
+        with self.store.locked() as store:
+            ref, tokens, updated = store.bucket(key)
+            if tokens is None:
+                tokens = burst
+            else:
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            if tokens >= 1:
+                store.store_bucket(ref, tokens - 1, now)
+                return 0
+            store.store_bucket(ref, tokens, now)
+            store.set('rate_limited', store.get('rate_limited') + 1)
+        return max(1, math.ceil((1 - tokens) / rate))
+
+    def admit(self):
+        """Count a receiver request in flight, or return False to shed it"""
+        with self.store.locked() as store:
+            limit = min(store.get('limit') or self.max_in_flight, self.max_in_flight)
+            if store.in_flight() >= int(limit):
+                store.set('shed', store.get('shed') + 1)
+                return False
+            store.add_in_flight(1)
+        return True
+
+    def release(self, latency=None):
+        """End an admitted request, with the duration of its MongoDB write if it made one"""
+        with self.store.locked() as store:
+            store.add_in_flight(-1)
+            if latency is not None:
+                self._observe(store, latency)
+
+    def observe(self, latency):
+        """Feed a MongoDB write duration in seconds from outside the receiver"""
+        if not self.shedding:
+            return
+        with self.store.locked() as store:
+            self._observe(store, latency)
+
+    def _observe(self, store, latency):
+        latency_ms = latency * 1000.0
+        smoothed = store.get('latency_ms')
+        smoothed = latency_ms if not smoothed else smoothed + self.SMOOTHING * (latency_ms - smoothed)
+        limit = store.get('limit') or self.max_in_flight
+        # Scale the bound down by how far writes are over the target, or
+        # add some headroom while they are under it, and move a step toward that
+        gradient = min(1.0, max(0.5, self.target_ms / smoothed)) if smoothed > 0 else 1.0
+        goal = limit * gradient if gradient < 1.0 else limit + math.sqrt(limit)
+        limit = min(self.max_in_flight, max(self.min_in_flight, limit + self.SMOOTHING * (goal - limit)))
+        store.set('latency_ms', smoothed)
+        store.set('limit', limit)
+
+    def stats(self):
+        stats = {'rate_limiting': self.rate_limiting, 'shedding': self.shedding}
+        if not self.enabled:
+            return stats
+        with self.store.locked() as store:
+            stats.update({
+                'store': 'shared' if store.shared else 'local',
+                'in_flight': store.in_flight(),
+                'in_flight_limit': round(store.get('limit') or self.max_in_flight, 1),
+                'write_latency_ms': round(store.get('latency_ms'), 1),
+                'rate_limited': int(store.get('rate_limited')),
+                'shed': int(store.get('shed'))
+            })
+        return stats
+
+admission_control = AdmissionControl()
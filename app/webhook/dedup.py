@@ -0,0 +1,87 @@
+# app/webhook/dedup.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Receiver outcomes after which a claimed delivery stays in the seen-set; on
+# any other outcome the claim is dropped so a redelivery is processed again
+SETTLED_OUTCOMES = frozenset(('processed', 'duplicate', 'ignored', 'accepted', 'spooled'))
+
+class DeliveryDeduplicator:
+    """
+    In-memory seen-set of X-GitHub-Delivery ids
+
+    A TTL-bounded LRU that rejects most redeliveries without a database round
+    trip. It is per process, so the unique delivery_id index on
+    webhook_events stays the source of truth across workers and restarts.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.max_size = 100000
+        self.ttl = 86400
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the seen-set from the Flask app config"""
+        self.enabled = app.config.get('DEDUP_ENABLED', True)
+        self.max_size = max(1, app.config.get('DEDUP_CACHE_SIZE', 100000))
+        self.ttl = app.config.get('DEDUP_TTL', 86400)
+
+    def claim(self, delivery_id):
+        """
+        Mark a delivery as seen
+        Returns False when it was already seen within the TTL
+        """
+        if not self.enabled or not delivery_id:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._seen.get(delivery_id)
+            if expires_at is not None and expires_at > now:
+                self._seen.move_to_end(delivery_id)
+                self._hits += 1
+                return False
+            self._seen[delivery_id] = now + self.ttl
+            self._seen.move_to_end(delivery_id)
+            self._misses += 1
+            # Evict least recently seen ids beyond the size bound
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+        return True
+
+    def seen(self, delivery_id):
+        """Whether a delivery was seen within the TTL, without claiming it"""
+        if not self.enabled or not delivery_id:
+            return False
+        with self._lock:
+            expires_at = self._seen.get(delivery_id)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def forget(self, delivery_id):
+        """Drop a delivery so a redelivery is processed again (e.g. after a failed save)"""
+        if not delivery_id:
+            return
+        with self._lock:
+            self._seen.pop(delivery_id, None)
+
+    def stats(self):
+        """Seen-set size and hit counters"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'size': len(self._seen),
+                'capacity': self.max_size,
+                'duplicates_rejected': self._hits,
+                'deliveries_seen': self._misses
+            }
+
+delivery_deduplicator = DeliveryDeduplicator()
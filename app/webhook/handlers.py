@@ -0,0 +1,238 @@
+# app/webhook/handlers.py
+import logging
+from collections import namedtuple
+from app.models.push_commit import commit_store
+from app.models.webhook_event import WebhookEvent
+from app.webhook.parsing import peek
+
+logger = logging.getLogger(__name__)
+
+class IgnoreDelivery(Exception):
+    """Raised by a handler for a delivery it recognises but does not store"""
+
+# One registered handler. actions is None for event types without an
+# action field; build(payload) returns a WebhookEvent or raises
+# IgnoreDelivery; precheck(payload_body) may reject a raw body before parsing
+EventHandler = namedtuple('EventHandler', ['event_type', 'actions', 'fields', 'expanded_fields', 'build', 'precheck'])
+
+# Read for every event type, by the factories and repository_full_name()
+REPOSITORY_FIELDS = ['repository/name', 'repository/html_url', 'repository/owner/login']
+
+def ignored_action_message(event_type, action):
+    return f"Ignored {event_type.replace('_', ' ')} action: {action}"
+
+class HandlerRegistry:
+    """
+    Webhook handlers keyed by (X-GitHub-Event, payload action)
+
+    Handlers register the event type and actions they take and the payload
+    paths they read. compile() folds them into a dispatch dict, the field
+    list each event type is parsed with and the list of supported events,
+    so dispatch is one dict lookup. Deliveries no handler takes are
+    rejected by quick_ignore() from the header and a prefix scan of the
+    body, before any JSON parsing. WEBHOOK_EVENTS limits which of the
+    registered event types are handled.
+    """
+
+    def __init__(self, app=None):
+        self.enabled_events = None
+        self.supported_events = ['ping']
+        self._handlers = {}
+        self._dispatch = {}
+        self._by_action = frozenset()
+        self._fields = {}
+        self._prechecks = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Enable the configured event types and compile the dispatch table"""
+        self.enable(app.config.get('WEBHOOK_EVENTS'))
+
+    def enable(self, events):
+        """Handle only the given event types (None: every registered one)"""
+        self.enabled_events = frozenset(events) if events else None
+        self.compile()
+
+    def register(self, event_type, actions=None, fields=(), expanded_fields=(), precheck=None):
+        """Decorator registering build(payload) for an event type and its actions"""
+        def decorator(build):
+            handler = EventHandler(
+                event_type, tuple(actions) if actions else None, list(fields), list(expanded_fields), build, precheck
+            )
+            self._handlers.setdefault(event_type, []).append(handler)
+            self.compile()
+            return build
+        return decorator
+
+    def compile(self):
+        """Resolve the registered handlers into the lookup tables"""
+        dispatch = {}
+        by_action = set()
+        fields = {}
+        prechecks = {}
+        for event_type, handlers in self._handlers.items():
+            if self.enabled_events is not None and event_type not in self.enabled_events:
+                continue
+            paths = []
+            expanded = []
+            for handler in handlers:
+                if handler.actions is None:
+                    dispatch[(event_type, None)] = handler
+                else:
+                    by_action.add(event_type)
+                    for action in handler.actions:
+                        dispatch[(event_type, action)] = handler
+                paths += [path for path in handler.fields + REPOSITORY_FIELDS if path not in paths]
+                expanded += [path for path in handler.expanded_fields if path not in expanded]
+                if handler.precheck is not None:
+                    prechecks[event_type] = handler.precheck
+            if event_type in by_action and 'action' not in paths:
+                paths.insert(0, 'action')
+            fields[event_type] = (paths, paths + [path for path in expanded if path not in paths])
+        self._dispatch = dispatch
+        self._by_action = frozenset(by_action)
+        self._fields = fields
+        self._prechecks = prechecks
+        self.supported_events = list(fields) + ['ping']
+
+    def handles(self, event_type):
+        """Whether any enabled handler takes this event type"""
+        return event_type in self._fields
+
+    def resolve(self, event_type, action=None):
+        """The handler for an (event, action) pair, or None"""
+        if event_type in self._by_action:
+            return self._dispatch.get((event_type, action))
+        return self._dispatch.get((event_type, None))
+
+    def fields(self, event_type, expanded=False):
+        """Payload paths to decode for an event type"""
+        paths = self._fields.get(event_type)
+        if paths is None:
+            return []
+        return paths[1] if expanded else paths[0]
+
+    def quick_ignore(self, event_type, payload_body):
+        """
+        Ignore message for a delivery no handler takes, decided from the
+        event header and a prefix scan of the raw body; None when the body
+        has to be parsed
+        """
+        if event_type not in self._fields:
+            return f'Event type {event_type} not handled'
+        precheck = self._prechecks.get(event_type)
+        if precheck is not None:
+            message = precheck(payload_body)
+            if message:
+                return message
+        if event_type in self._by_action:
+            action = peek(payload_body, 'action')
+            if action is not None and (event_type, action) not in self._dispatch:
+                return ignored_action_message(event_type, action)
+        return None
+
+    def build(self, event_type, payload):
+        """(webhook_event, ignored_message) for a parsed payload"""
+        if event_type not in self._fields:
+            logger.debug("Ignoring event type: %s", event_type)
+            return None, f'Event type {event_type} not handled'
+        action = payload.get('action') if event_type in self._by_action else None
+        handler = self.resolve(event_type, action)
+        if handler is None:
+            logger.debug("Ignoring %s action: %s", event_type, action)
+            return None, ignored_action_message(event_type, action)
+        try:
+            return handler.build(payload), None
+        except IgnoreDelivery as e:
+            logger.debug("%s", e)
+            return None, str(e)
+
+handler_registry = HandlerRegistry()
+
+# Built-in handlers
+
+def _branch_pushes_only(payload_body):
+    ref = peek(payload_body, 'ref')
+    if ref is not None and not ref.startswith('refs/heads/'):
+        return f'Ignored push to {ref} (not a branch)'
+    return None
+
+@handler_registry.register(
+    'push',
+    fields=['ref', 'after', 'pusher/name', 'commits/0/message', 'commits/0/timestamp'],
+    # Read as well when every commit is stored
+    expanded_fields=['commits/*/id', 'commits/*/message', 'commits/*/timestamp', 'commits/*/author/name'],
+    precheck=_branch_pushes_only
+)
+def handle_push(payload):
+    ref = payload.get('ref', '')
+    # Skip tag pushes, only process branch pushes
+    if not ref.startswith('refs/heads/'):
+        raise IgnoreDelivery(f'Ignored push to {ref} (not a branch)')
+    webhook_event = WebhookEvent.from_github_push(payload, expand_commits=commit_store.enabled)
+    logger.debug("Push event processed: %s -> %s", webhook_event.author, webhook_event.to_branch)
+    return webhook_event
+
+PULL_REQUEST_FIELDS = [
+    'pull_request/id',
+    'pull_request/title',
+    'pull_request/user/login',
+    'pull_request/merged',
+    'pull_request/merged_by/login',
+    'pull_request/head/ref',
+    'pull_request/base/ref',
+    'pull_request/created_at',
+    'pull_request/merged_at'
+]
+
+@handler_registry.register('pull_request', actions=['opened'], fields=PULL_REQUEST_FIELDS)
+def handle_pull_request_opened(payload):
+    webhook_event = WebhookEvent.from_github_pull_request(payload)
+    logger.debug("PR opened: %s - %s -> %s", webhook_event.author, webhook_event.from_branch, webhook_event.to_branch)
+    return webhook_event
+
+@handler_registry.register('pull_request', actions=['closed'], fields=PULL_REQUEST_FIELDS)
+def handle_pull_request_closed(payload):
+    # Only merged pull requests are recorded
+    if not payload['pull_request'].get('merged'):
+        raise IgnoreDelivery(ignored_action_message('pull_request', 'closed'))
+    webhook_event = WebhookEvent.from_github_merge(payload)
+    logger.debug("PR merged: %s - %s -> %s", webhook_event.author, webhook_event.from_branch, webhook_event.to_branch)
+    return webhook_event
+
+@handler_registry.register(
+    'issues',
+    actions=['opened', 'closed', 'reopened'],
+    fields=['issue/id', 'issue/title', 'issue/user/login', 'issue/created_at', 'issue/closed_at',
+            'issue/updated_at', 'sender/login']
+)
+def handle_issue(payload):
+    return WebhookEvent.from_github_issue(payload)
+
+@handler_registry.register(
+    'release',
+    actions=['published'],
+    fields=['release/id', 'release/tag_name', 'release/target_commitish', 'release/published_at',
+            'release/author/login']
+)
+def handle_release(payload):
+    return WebhookEvent.from_github_release(payload)
+
+@handler_registry.register(
+    'workflow_run',
+    actions=['completed'],
+    fields=['workflow_run/id', 'workflow_run/name', 'workflow_run/head_branch', 'workflow_run/conclusion',
+            'workflow_run/updated_at', 'workflow_run/actor/login', 'sender/login']
+)
+def handle_workflow_run(payload):
+    return WebhookEvent.from_github_workflow_run(payload)
+
+@handler_registry.register(
+    'check_suite',
+    actions=['completed'],
+    fields=['check_suite/id', 'check_suite/head_branch', 'check_suite/conclusion', 'check_suite/updated_at',
+            'check_suite/app/name', 'sender/login']
+)
+def handle_check_suite(payload):
+    return WebhookEvent.from_github_check_suite(payload)
@@ -0,0 +1,264 @@
+# app/webhook/importer.py
+import gzip
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.extensions import get_collection
+from app.models.push_commit import commit_store
+from app.models.webhook_event import stats_rollups, tenant_router
+from app.webhook.dedup import DeliveryDeduplicator
+from app.webhook.offload import init_worker
+from app.webhook.parsing import payload_parser
+from app.webhook.handlers import handler_registry
+from app.webhook.processing import build_webhook_event, parse_payload, quick_ignore, verify_github_signature
+from app.webhook.signing import select_secret
+
+logger = logging.getLogger(__name__)
+
+# Outcome of one line of a delivery file; webhook_event is None unless
+# outcome is 'event'
+ImportedDelivery = namedtuple('ImportedDelivery', ['line', 'delivery_id', 'webhook_event', 'outcome', 'message'])
+
+def prepare_line(line_number, line, secrets=None):
+    """
+    Turn one recorded delivery into an ImportedDelivery
+
+    A line is a JSON object with the delivery's `headers` (X-GitHub-Event,
+    X-GitHub-Delivery and, for --verify, X-Hub-Signature-256) and its
+    `body`, either the raw body as a string or the payload object.
+    `event` and `delivery_id` keys may stand in for the headers. With
+    secrets, a WebhookSecrets.snapshot(), signatures are checked.
+    """
+    try:
+        record = payload_parser.loads(line)
+        headers = {name.lower(): value for name, value in (record.get('headers') or {}).items()}
+        event_type = headers.get('x-github-event') or record.get('event')
+        delivery_id = headers.get('x-github-delivery') or record.get('delivery_id')
+        body = record.get('body')
+        if not event_type or body is None:
+            return ImportedDelivery(line_number, delivery_id, None, 'invalid', 'Missing event type or body')
+
+        if isinstance(body, str):
+            payload_body = body.encode('utf-8')
+            if secrets:
+                secret = select_secret(secrets, payload_body)
+                if not secret:
+                    return ImportedDelivery(line_number, delivery_id, None, 'rejected', 'No secret for the repository')
+                if not verify_github_signature(payload_body, headers.get('x-hub-signature-256'), secret):
+                    return ImportedDelivery(line_number, delivery_id, None, 'rejected', 'Invalid signature')
+            ignored_message = quick_ignore(event_type, payload_body)
+            if ignored_message:
+                return ImportedDelivery(line_number, delivery_id, None, 'ignored', ignored_message)
+            payload = parse_payload(event_type, payload_body)
+        else:
+            # A re-encoded object no longer matches the signed bytes
+            if secrets:
+                return ImportedDelivery(line_number, delivery_id, None, 'rejected', 'Body is not the raw signed string')
+            if not handler_registry.handles(event_type):
+                return ImportedDelivery(line_number, delivery_id, None, 'ignored', f'Event type {event_type} not handled')
+            payload = body
+
+        webhook_event, ignored_message = build_webhook_event(event_type, payload, delivery_id)
+        if webhook_event is None:
+            return ImportedDelivery(line_number, delivery_id, None, 'ignored', ignored_message)
+        return ImportedDelivery(line_number, delivery_id, webhook_event, 'event', None)
+    except Exception as e:
+        return ImportedDelivery(line_number, None, None, 'invalid', str(e))
+
+def prepare_chunk(lines, secrets=None):
+    """prepare_line() over a chunk of (line number, line) pairs; runs in a pool process"""
+    return [prepare_line(line_number, line, secrets) for line_number, line in lines]
+
+def open_deliveries(path):
+    """Binary line stream of a delivery file; '-' is stdin and .gz is decompressed"""
+    if path == '-':
+        return sys.stdin.buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+class DeliveryImporter:
+    """
+    Bulk import of recorded deliveries from an NDJSON file
+
+    The file is read one line at a time and handed out in chunks of
+    chunk_lines to a pool of `workers` processes, which parse and build the
+    WebhookEvents with the same code as the receiver. At most two chunks per
+    worker are in flight, so memory stays flat whatever the file size.
+    Results are taken back in file order: delivery ids already seen in the
+    last dedup_window deliveries are skipped, and the rest are written with
+    unordered insert_many batches of batch_size. The unique delivery_id
+    index catches deliveries stored before the import or outside the
+    window, so running the same file twice stores nothing twice. Events
+    go to the collection of their repository owner, as the receiver's do.
+    """
+
+    COUNTERS = ('lines', 'stored', 'duplicates', 'ignored', 'rejected', 'invalid')
+
+    def __init__(self, workers=None, batch_size=1000, chunk_lines=500, dedup_window=1000000,
+                 secrets=None, start_method='forkserver', progress=None, progress_interval=2.0):
+        if workers is None:
+            # One CPU gains nothing from a pool but pays for the IPC
+            workers = os.cpu_count() or 1
+            workers = workers if workers > 1 else 0
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self.chunk_lines = max(1, chunk_lines)
+        self.secrets = secrets
+        self.start_method = start_method if start_method in multiprocessing.get_all_start_methods() else 'spawn'
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.deduplicator = DeliveryDeduplicator()
+        self.deduplicator.enabled = True
+        self.deduplicator.max_size = max(1, dedup_window)
+        self.deduplicator.ttl = float('inf')
+        self.stats = dict.fromkeys(self.COUNTERS, 0)
+        self.stats['bytes'] = 0
+        self._pending = []
+        self._started = None
+        self._reported_at = None
+
+    def run(self, path):
+        """Import every delivery in path; returns the counters"""
+        self._started = self._reported_at = time.monotonic()
+        total_bytes = os.path.getsize(path) if path != '-' and not path.endswith('.gz') else None
+        executor = None
+        if self.workers > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=init_worker,
+                initargs=(payload_parser.backend, commit_store.enabled, handler_registry.enabled_events)
+            )
+        in_flight = deque()
+        handle = open_deliveries(path)
+        try:
+            chunk = []
+            for line_number, line in enumerate(handle, 1):
+                self.stats['bytes'] += len(line)
+                if not line.strip():
+                    continue
+                chunk.append((line_number, line))
+                if len(chunk) < self.chunk_lines:
+                    continue
+                self._submit(executor, in_flight, chunk)
+                chunk = []
+                while in_flight and len(in_flight) >= self.workers * 2:
+                    self._handle(in_flight.popleft().result())
+                self._report(total_bytes)
+            if chunk:
+                self._submit(executor, in_flight, chunk)
+            while in_flight:
+                self._handle(in_flight.popleft().result())
+            self._flush()
+        finally:
+            if handle is not sys.stdin.buffer:
+                handle.close()
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        self._report(total_bytes, final=True)
+        return self.summary()
+
+    def _submit(self, executor, in_flight, chunk):
+        if executor is None:
+            self._handle(prepare_chunk(chunk, self.secrets))
+        else:
+            in_flight.append(executor.submit(prepare_chunk, chunk, self.secrets))
+
+    def _handle(self, results):
+        for result in results:
+            self.stats['lines'] += 1
+            if result.outcome != 'event':
+                self.stats[result.outcome] += 1
+                if result.outcome == 'invalid':
+                    logger.warning("Line %s: %s", result.line, result.message)
+                continue
+            if not self.deduplicator.claim(result.delivery_id):
+                self.stats['duplicates'] += 1
+                continue
+            self._pending.append(result.webhook_event)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        """Insert the pending events, then their commits, with one bulk write per collection"""
+        events, self._pending = self._pending, []
+        if not events:
+            return
+        by_collection = {}
+        for webhook_event in events:
+            document = webhook_event.to_dict()
+            document['_id'] = ObjectId()
+            name = tenant_router.collection_for(webhook_event.repository_owner)
+            by_collection.setdefault(name, []).append((webhook_event, document))
+
+        stored = []
+        duplicates = 0
+        for name, batch in by_collection.items():
+            rejected = set()
+            try:
+                get_collection(name).insert_many([document for _, document in batch], ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != 11000 for error in errors):
+                    raise
+                # Stored by the receiver or an earlier import
+                rejected = {error['index'] for error in errors}
+            stored += [(webhook_event, document, name) for index, (webhook_event, document) in enumerate(batch)
+                       if index not in rejected]
+            duplicates += len(rejected)
+
+        pushes = [(webhook_event, document, name) for webhook_event, document, name in stored if webhook_event.commits]
+        if pushes:
+            self._insert_commits(pushes)
+        for _, document, _ in stored:
+            stats_rollups.record(document)
+        self.stats['stored'] += len(stored)
+        self.stats['duplicates'] += duplicates
+
+    def _insert_commits(self, pushes):
+        records = [commit.to_dict(document['_id']) for webhook_event, document, _ in pushes for commit in webhook_event.commits]
+        try:
+            get_collection(commit_store.COLLECTION_NAME).insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            if commit_store.only_duplicates(e):
+                return
+            self._remove_pushes(pushes)
+            raise
+        except Exception:
+            self._remove_pushes(pushes)
+            raise
+
+    def _remove_pushes(self, pushes):
+        # Without this a re-run would skip them as duplicates and their
+        # commits would never be stored
+        by_collection = {}
+        for _, document, name in pushes:
+            by_collection.setdefault(name, []).append(document['_id'])
+        for name, push_ids in by_collection.items():
+            get_collection(name).delete_many({'_id': {'$in': push_ids}})
+        push_ids = [document['_id'] for _, document, _ in pushes]
+        get_collection(commit_store.COLLECTION_NAME).delete_many({'push_id': {'$in': push_ids}})
+
+    def _report(self, total_bytes, final=False):
+        now = time.monotonic()
+        if self.progress is None or not final and now - self._reported_at < self.progress_interval:
+            return
+        self._reported_at = now
+        summary = self.summary()
+        if total_bytes:
+            summary['percent'] = round(100.0 * self.stats['bytes'] / total_bytes, 1)
+        self.progress(summary, final)
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started if self._started else 0
+        summary = dict(self.stats)
+        summary['seconds'] = round(elapsed, 2)
+        summary['lines_per_sec'] = round(self.stats['lines'] / elapsed, 1) if elapsed else None
+        return summary
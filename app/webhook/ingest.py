@@ -0,0 +1,226 @@
+# app/webhook/ingest.py
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pymongo.errors import DuplicateKeyError
+from app.log import SAMPLED, bind_delivery, reset_delivery, update_delivery
+from app.metrics import INGEST_DELIVERIES, WEBHOOK_STAGE_SECONDS
+from app.webhook.admission import admission_control
+from app.webhook.dedup import delivery_deduplicator
+from app.webhook.offload import payload_offloader
+from app.webhook.spool import delivery_spool
+from app.webhook.processing import build_webhook_event, event_label, parse_payload
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling a worker thread to exit once the queue is drained
+_STOP = object()
+
+class IngestQueue:
+    """
+    Bounded in-process queue between the webhook receiver and MongoDB
+
+    In async ingest mode the receiver only verifies the signature and enqueues
+    the raw delivery; a pool of worker threads parses and persists it.
+    """
+
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.retry_after = 5
+        self.drain_timeout = 10.0
+        self._queue = None
+        self._workers = []
+        self._workers_pid = None
+        self._accepting = False
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'processed': 0,
+            'ignored': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'spooled': 0,
+            'rejected': 0
+        }
+        self._wait_latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._process_latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the queue from the Flask app config"""
+        self.app = app
+        self.enabled = app.config.get('INGEST_MODE', 'sync') == 'async'
+        self.retry_after = app.config.get('INGEST_RETRY_AFTER', 5)
+        self.drain_timeout = app.config.get('INGEST_DRAIN_TIMEOUT', 10.0)
+        self.worker_count = max(1, app.config.get('INGEST_WORKERS', 4))
+        self._queue = queue.Queue(maxsize=app.config.get('INGEST_QUEUE_SIZE', 1000))
+        if self.enabled:
+            self._accepting = True
+            atexit.register(self.shutdown)
+            logger.info("Async ingest enabled: queue size %s, %s workers", self._queue.maxsize, self.worker_count)
+
+    def _ensure_workers(self):
+        """Start worker threads in the current process (after any fork)"""
+        if self._workers_pid == os.getpid():
+            return
+        with self._lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers = []
+            for index in range(self.worker_count):
+                worker = threading.Thread(
+                    target=self._run_worker,
+                    name=f'ingest-worker-{index}',
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+            self._workers_pid = os.getpid()
+
+    def submit(self, event_type, delivery_id, payload_body):
+        """
+        Enqueue a verified raw delivery without blocking
+        Returns False when the queue is full or shutting down
+        """
+        if not self._accepting:
+            self._count('rejected')
+            return False
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((event_type, delivery_id, payload_body, time.monotonic()))
+        except queue.Full:
+            self._count('rejected')
+            logger.warning("Ingest queue full, rejecting delivery %s", delivery_id)
+            return False
+        self._count('enqueued')
+        return True
+
+    def _run_worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._process(*item)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, event_type, delivery_id, payload_body, enqueued_at):
+        started = time.monotonic()
+        self._wait_latencies.append(started - enqueued_at)
+        event = event_label(event_type)
+        context = bind_delivery(delivery_id=delivery_id, event=event_type)
+        try:
+            with self.app.app_context():
+                stage_started = time.perf_counter()
+                if payload_offloader.accepts(event_type, payload_body):
+                    # Parse and build large bodies in a worker process
+                    webhook_event = payload_offloader.prepare(event_type, payload_body, delivery_id).webhook_event
+                    WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'offload')
+                else:
+                    payload = parse_payload(event_type, payload_body)
+                    WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'parse')
+                    if not payload:
+                        logger.warning("Empty JSON payload in delivery %s", delivery_id)
+                        self._count('ignored', event)
+                        return
+                    stage_started = time.perf_counter()
+                    webhook_event, ignored_message = build_webhook_event(event_type, payload, delivery_id)
+                    WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'build')
+                if webhook_event is None:
+                    self._count('ignored', event)
+                    return
+                update_delivery(repository=webhook_event.repository_name)
+                if delivery_spool.diverting and delivery_spool.accepts(delivery_id):
+                    delivery_spool.append(event_type, delivery_id, payload_body)
+                    self._count('spooled', event)
+                    return
+                stage_started = time.perf_counter()
+                try:
+                    with delivery_spool.deadline():
+                        event_id = webhook_event.save()
+                except DuplicateKeyError:
+                    raise
+                except Exception as e:
+                    if not delivery_spool.accepts(delivery_id):
+                        raise
+                    logger.warning("Could not save queued delivery %s, spooling it: %s", delivery_id, e)
+                    delivery_spool.append(event_type, delivery_id, payload_body)
+                    self._count('spooled', event)
+                    return
+                write_seconds = time.perf_counter() - stage_started
+                WEBHOOK_STAGE_SECONDS.observe(write_seconds, event, 'insert')
+                admission_control.observe(write_seconds)
+                logger.info("Queued delivery %s saved with ID: %s", delivery_id, event_id, extra=SAMPLED)
+                self._count('processed', event)
+        except DuplicateKeyError:
+            self._count('duplicates', event)
+        except Exception as e:
+            self._count('failed', event)
+            # Let a redelivery of this delivery through again
+            delivery_deduplicator.forget(delivery_id)
+            logger.error("Failed to process queued delivery %s: %s", delivery_id, e)
+        finally:
+            self._process_latencies.append(time.monotonic() - started)
+            reset_delivery(context)
+
+    def _count(self, name, event=None):
+        with self._lock:
+            self._stats[name] += 1
+        if event is not None:
+            INGEST_DELIVERIES.inc(event, name)
+
+    def shutdown(self, timeout=None):
+        """Stop accepting deliveries and drain the queue before exiting"""
+        if not self._accepting:
+            return
+        self._accepting = False
+        timeout = self.drain_timeout if timeout is None else timeout
+        if self._workers_pid != os.getpid():
+            return
+        logger.info("Draining ingest queue (%s pending)", self._queue.qsize())
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            try:
+                self._queue.put(_STOP, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        remaining = self._queue.qsize()
+        if remaining:
+            logger.error("Ingest queue shutdown timed out with %s deliveries pending", remaining)
+
+    def metrics(self):
+        """Queue depth, counters and latency percentiles in milliseconds"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'mode': 'async' if self.enabled else 'sync',
+            'depth': self._queue.qsize() if self._queue else 0,
+            'capacity': self._queue.maxsize if self._queue else 0,
+            'workers': len([w for w in self._workers if w.is_alive()]),
+            'queue_wait_ms': _latency_summary(self._wait_latencies),
+            'processing_ms': _latency_summary(self._process_latencies)
+        })
+        return stats
+
+def _latency_summary(samples):
+    values = sorted(samples)
+    if not values:
+        return {'p50': None, 'p99': None, 'max': None}
+    return {
+        'p50': round(values[int(len(values) * 0.50)] * 1000, 2),
+        'p99': round(values[min(len(values) - 1, int(len(values) * 0.99))] * 1000, 2),
+        'max': round(values[-1] * 1000, 2)
+    }
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,142 @@
+# app/webhook/offload.py
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.models.push_commit import commit_store
+from app.webhook.parsing import payload_parser
+from app.webhook.handlers import handler_registry
+from app.webhook.processing import (
+    build_webhook_event, parse_payload, quick_ignore, repository_full_name,
+    verify_github_signature
+)
+
+logger = logging.getLogger(__name__)
+
+# Outcome of verifying, parsing and building one delivery
+PreparedDelivery = namedtuple('PreparedDelivery', ['verified', 'webhook_event', 'ignored_message', 'repository'])
+
+def init_worker(parser_backend, expand_commits, events=None):
+    """Give a pool process the same parsing settings and handlers as the web worker"""
+    payload_parser.backend = parser_backend
+    commit_store.enabled = expand_commits
+    handler_registry.enable(events)
+
+def prepare_delivery(event_type, payload_body, delivery_id, signature=None, secret=None):
+    """
+    Verify (when a secret is given), parse and build one delivery
+    Runs in a pool process; raises ValueError on a malformed body
+    """
+    if secret and not verify_github_signature(payload_body, signature, secret):
+        return PreparedDelivery(False, None, None, None)
+    ignored_message = quick_ignore(event_type, payload_body)
+    if ignored_message:
+        return PreparedDelivery(True, None, ignored_message, None)
+    payload = parse_payload(event_type, payload_body)
+    if not payload:
+        raise ValueError('No JSON payload')
+    webhook_event, ignored_message = build_webhook_event(event_type, payload, delivery_id)
+    return PreparedDelivery(True, webhook_event, ignored_message, repository_full_name(payload))
+
+class PayloadOffloader:
+    """
+    Process pool for the CPU work of large deliveries
+
+    Bodies of at least OFFLOAD_THRESHOLD_BYTES are verified, parsed and
+    turned into a WebhookEvent in one of OFFLOAD_WORKERS processes. The
+    calling thread waits without holding the GIL, so the other threads of
+    the web worker (gthread requests, ingest workers, event streams) keep
+    running. Smaller bodies stay inline, where IPC would cost more than it
+    saves.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 1024 * 1024
+        self.workers = 2
+        self.timeout = 30.0
+        self.start_method = 'forkserver'
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._stats = {'offloaded': 0, 'inline_fallbacks': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the pool from the Flask app config"""
+        self.enabled = app.config.get('OFFLOAD_ENABLED', False)
+        self.threshold = app.config.get('OFFLOAD_THRESHOLD_BYTES', 1024 * 1024)
+        self.workers = max(1, app.config.get('OFFLOAD_WORKERS', 2))
+        self.timeout = app.config.get('OFFLOAD_TIMEOUT', 30.0)
+        self.start_method = app.config.get('OFFLOAD_START_METHOD', 'forkserver')
+        if self.start_method not in multiprocessing.get_all_start_methods():
+            self.start_method = 'spawn'
+        if self.enabled:
+            atexit.register(self.shutdown)
+            logger.info("Offloading payloads of %s bytes or more to %s processes", self.threshold, self.workers)
+
+    def accepts(self, event_type, payload_body):
+        """Whether a delivery is large enough to be worth sending to the pool"""
+        return self.enabled and handler_registry.handles(event_type) and len(payload_body) >= self.threshold
+
+    def _ensure_executor(self):
+        """Create the pool in the current process (after any fork)"""
+        if self._executor_pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=init_worker,
+                    initargs=(payload_parser.backend, commit_store.enabled, handler_registry.enabled_events)
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def prepare(self, event_type, payload_body, delivery_id, signature=None, secret=None):
+        """
+        prepare_delivery() in a pool process, returning a PreparedDelivery
+        Falls back to running inline when the pool has broken
+        """
+        executor = self._ensure_executor()
+        try:
+            future = executor.submit(prepare_delivery, event_type, payload_body, delivery_id, signature, secret)
+            result = future.result(timeout=self.timeout)
+            self._count('offloaded')
+            return result
+        except BrokenProcessPool:
+            logger.error("Payload offload pool broke, recreating it and processing inline")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor_pid = None
+            self._count('inline_fallbacks')
+            return prepare_delivery(event_type, payload_body, delivery_id, signature, secret)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def shutdown(self):
+        """Stop the pool processes"""
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._executor_pid = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'enabled': self.enabled,
+            'threshold_bytes': self.threshold,
+            'workers': self.workers
+        })
+        return stats
+
+payload_offloader = PayloadOffloader()
@@ -0,0 +1,159 @@
+# app/webhook/parsing.py
+import json
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# How far into the body the prefix scan looks for top-level keys. GitHub
+# puts "ref" first in push payloads and "action" first in most others.
+PREFIX_SCAN_BYTES = 512
+
+_PREFIX_PATTERNS = {}
+
+def peek(payload_body, key):
+    """
+    Read a top-level string value from the start of a raw JSON body
+    Returns None when it cannot be found cheaply and unambiguously
+    """
+    pattern = _PREFIX_PATTERNS.get(key)
+    if pattern is None:
+        pattern = re.compile(rb'[{,]\s*"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*"([^"\\]*)"')
+        _PREFIX_PATTERNS[key] = pattern
+    head = payload_body[:PREFIX_SCAN_BYTES]
+    match = pattern.search(head)
+    if match is None:
+        return None
+    # Only trust a match at the top level of the document
+    prefix = head[:match.start() + 1]
+    if prefix.count(b'{') != 1 or b'[' in prefix:
+        return None
+    return match.group(1).decode('utf-8', 'replace')
+
+def _is_array(value):
+    return isinstance(value, list) or (simdjson is not None and isinstance(value, simdjson.Array))
+
+def _is_object(value):
+    return isinstance(value, dict) or (simdjson is not None and isinstance(value, simdjson.Object))
+
+def _plain(value):
+    """Turn simdjson proxies into regular Python objects"""
+    if simdjson is not None:
+        if isinstance(value, simdjson.Object):
+            return value.as_dict()
+        if isinstance(value, simdjson.Array):
+            return value.as_list()
+    return value
+
+def _copy_path(source, parts, target):
+    """Copy the value at parts in source to the same place in target"""
+    head, rest = parts[0], parts[1:]
+    if isinstance(target, list):
+        if not _is_array(source):
+            return
+        if head == '*':
+            # Iterate rather than index: simdjson arrays index in linear time
+            items = enumerate(source)
+        else:
+            index = int(head)
+            items = [(index, source[index])] if index < len(source) else []
+        for index, value in items:
+            while len(target) <= index:
+                target.append(None)
+            _copy_child(value, rest, target, index)
+    else:
+        if not _is_object(source) or head not in source:
+            return
+        _copy_child(source[head], rest, target, head)
+
+def _copy_child(value, rest, target, key):
+    if not rest or value is None:
+        target[key] = _plain(value)
+        return
+    existing = target[key] if isinstance(target, list) or key in target else None
+    if existing is None:
+        existing = [] if _is_array(value) else {}
+        target[key] = existing
+    _copy_path(value, rest, existing)
+
+class PayloadParser:
+    """
+    Pluggable JSON decoding for webhook bodies
+
+    Uses simdjson when installed (lazy, only the requested paths are turned
+    into Python objects), then orjson, then the stdlib json module.
+    JSON_PARSER can force one of 'simdjson', 'orjson' or 'json'.
+    """
+
+    def __init__(self, app=None):
+        self.backend = self._available('auto')
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Pick the parser backend from the Flask app config"""
+        self.backend = self._available(app.config.get('JSON_PARSER', 'auto'))
+        logger.info("Webhook payloads parsed with %s", self.backend)
+
+    @staticmethod
+    def _available(preferred):
+        if preferred in ('auto', 'simdjson') and simdjson is not None:
+            return 'simdjson'
+        if preferred in ('auto', 'simdjson', 'orjson') and orjson is not None:
+            return 'orjson'
+        return 'json'
+
+    def loads(self, payload_body):
+        """Fully decode a JSON body"""
+        if self.backend == 'json':
+            return json.loads(payload_body)
+        return orjson.loads(payload_body) if orjson is not None else json.loads(payload_body)
+
+    def extract(self, payload_body, paths):
+        """
+        Decode only the given 'a/b/0/c' paths ('*' matches every array item)
+        into a dict shaped like the original payload
+        Raises ValueError on malformed JSON
+        """
+        if self.backend == 'simdjson':
+            return self._extract_simdjson(payload_body, paths)
+        document = self.loads(payload_body)
+        if not isinstance(document, dict):
+            raise ValueError('Payload is not a JSON object')
+        payload = {}
+        for path in paths:
+            _copy_path(document, path.split('/'), payload)
+        return payload
+
+    def _extract_simdjson(self, payload_body, paths):
+        # A simdjson parser holds one document at a time, so keep one per thread
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = simdjson.Parser()
+        try:
+            document = parser.parse(payload_body)
+        except (RuntimeError, ValueError) as e:
+            raise ValueError(f'Malformed JSON payload: {str(e)}')
+        try:
+            if not isinstance(document, simdjson.Object):
+                raise ValueError('Payload is not a JSON object')
+            payload = {}
+            for path in paths:
+                _copy_path(document, path.split('/'), payload)
+            return payload
+        finally:
+            del document
+
+payload_parser = PayloadParser()
@@ -0,0 +1,65 @@
+# app/webhook/processing.py
+import hashlib
+import hmac
+import logging
+from functools import lru_cache
+from app.models.push_commit import commit_store
+from app.webhook.handlers import handler_registry
+from app.webhook.parsing import payload_parser
+
+logger = logging.getLogger(__name__)
+
+def event_label(event_type):
+    """Metrics label for an X-GitHub-Event value, from a fixed set"""
+    return event_type if event_type in handler_registry.supported_events else 'other'
+
+@lru_cache(maxsize=1024)
+def signing_key(secret):
+    """HMAC-SHA256 state keyed with a secret; copied per delivery so the key is only set up once"""
+    return hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+
+def verify_github_signature(payload_body, signature, secret):
+    """Verify GitHub webhook signature"""
+    if not secret:
+        logger.warning("No webhook secret configured, skipping signature verification")
+        return True
+    
+    if not signature:
+        logger.warning("No signature provided in webhook")
+        return False
+    
+    mac = signing_key(secret).copy()
+    mac.update(payload_body)
+    expected_signature = 'sha256=' + mac.hexdigest()
+    
+    return hmac.compare_digest(signature, expected_signature)
+
+def quick_ignore(event_type, payload_body):
+    """
+    Decide from the event header and a prefix scan of the raw body whether a
+    delivery will be ignored, before any JSON parsing
+    Returns the ignore message, or None when the body has to be parsed
+    """
+    return handler_registry.quick_ignore(event_type, payload_body)
+
+def parse_payload(event_type, payload_body):
+    """Decode just the fields the event type's handlers need; raises ValueError on bad JSON"""
+    return payload_parser.extract(payload_body, handler_registry.fields(event_type, expanded=commit_store.enabled))
+
+def build_webhook_event(event_type, payload, delivery_id=None):
+    """
+    Build a WebhookEvent from a parsed GitHub payload
+    Returns (webhook_event, ignored_message); webhook_event is None when the
+    delivery is intentionally ignored
+    """
+    webhook_event, ignored_message = handler_registry.build(event_type, payload)
+    if webhook_event is not None:
+        webhook_event.delivery_id = delivery_id
+    return webhook_event, ignored_message
+
+def repository_full_name(payload):
+    """Get owner/name of the repository a payload belongs to"""
+    repository = payload.get('repository') or {}
+    repo_name = repository.get('name', 'Unknown')
+    repo_owner = (repository.get('owner') or {}).get('login', 'Unknown')
+    return f"{repo_owner}/{repo_name}"
@@ -1,34 +1,60 @@
 # app/webhook/routes.py 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 import json
 import logging
-import hmac
-import hashlib
-from app.models.webhook_event import WebhookEvent
+import time
+from app.broadcast import event_broadcaster
+from app.extensions import mongo
+from app.log import SAMPLED, bind_delivery, reset_delivery, update_delivery
+from app.metrics import WEBHOOK_DELIVERIES, WEBHOOK_REQUEST_SECONDS, WEBHOOK_STAGE_SECONDS
+from app.models.webhook_event import (
+    WebhookEvent, event_retention, recent_events_cache, stats_rollups, tenant_router
+)
+from pymongo.errors import DuplicateKeyError
+from app.webhook.admission import admission_control
+from app.webhook.dedup import SETTLED_OUTCOMES, delivery_deduplicator
+from app.webhook.handlers import handler_registry
+from app.webhook.ingest import ingest_queue
+from app.webhook.offload import payload_offloader
+from app.webhook.signing import webhook_secrets
+from app.webhook.spool import delivery_spool
+from app.webhook.processing import (
+    build_webhook_event, event_label, parse_payload, quick_ignore, repository_full_name,
+    verify_github_signature
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 webhook = Blueprint('webhook', __name__, url_prefix='/webhook')
 
-def verify_github_signature(payload_body, signature, secret):
-    """Verify GitHub webhook signature"""
-    if not secret:
-        logger.warning("No webhook secret configured, skipping signature verification")
-        return True
-    
-    if not signature:
-        logger.warning("No signature provided in webhook")
-        return False
-    
-    expected_signature = 'sha256=' + hmac.new(
-        secret.encode('utf-8'),
-        payload_body,
-        hashlib.sha256
-    ).hexdigest()
-    
-    return hmac.compare_digest(signature, expected_signature)
+def duplicate_delivery_response(delivery_id):
+    """Cheap response for a delivery that was already processed"""
+    return jsonify({
+        'message': 'Delivery already processed',
+        'delivery_id': delivery_id,
+        'duplicate': True
+    }), 200
+
+def admission_response(message, delivery_id, retry_after, status):
+    """Cheap rejection of a delivery the receiver will not take now"""
+    response = jsonify({
+        'error': message,
+        'delivery_id': delivery_id
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status
+
+def spool_delivery(event_type, delivery_id, payload_body, event):
+    """Keep a delivery in the local spool and acknowledge it for later replay"""
+    stage_started = time.perf_counter()
+    delivery_spool.append(event_type, delivery_id, payload_body)
+    WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'spool')
+    return jsonify({
+        'message': 'Webhook accepted for processing',
+        'event_type': event_type,
+        'delivery_id': delivery_id,
+        'spooled': True
+    }), 202
 
 @webhook.route('/receiver', methods=['POST'])
 def receiver():
@@ -36,133 +62,238 @@ def receiver():
     GitHub webhook receiver endpoint
     Handles Push, Pull Request, and Merge events
     """
+    started = time.perf_counter()
+    event = 'other'
+    outcome = 'failed'
+    admitted = False
+    # Whether this request holds the delivery's seen-set entry
+    claimed = False
+    # Duration of the MongoDB write, fed back to load shedding
+    write_seconds = None
+    # Get the GitHub event type from headers; both are attached to every
+    # record logged while this delivery is handled
+    event_type = request.headers.get('X-GitHub-Event')
+    delivery_id = request.headers.get('X-GitHub-Delivery')
+    context = bind_delivery(delivery_id=delivery_id, event=event_type)
     try:
-        # Get the GitHub event type from headers
-        event_type = request.headers.get('X-GitHub-Event')
-        delivery_id = request.headers.get('X-GitHub-Delivery')
         signature = request.headers.get('X-Hub-Signature-256')
         user_agent = request.headers.get('User-Agent', '')
+        event = event_label(event_type)
         
-        logger.info(f"Received webhook - Event: {event_type}, Delivery ID: {delivery_id}")
+        logger.debug("Received webhook - Event: %s, Delivery ID: %s", event_type, delivery_id)
         
         if not event_type:
             logger.warning("No X-GitHub-Event header found")
+            outcome = 'invalid'
             return jsonify({'error': 'Missing event type header'}), 400
         
+        # Turn away floods from one address and work beyond what MongoDB
+        # keeps up with, before the body is verified or parsed
+        if admission_control.rate_limiting:
+            retry_after = admission_control.check_address(request.remote_addr)
+            if retry_after:
+                logger.warning("Rate limit exceeded for address %s", request.remote_addr, extra=SAMPLED)
+                outcome = 'rate_limited'
+                return admission_response('Rate limit exceeded, retry later', delivery_id, retry_after, 429)
+        if admission_control.shedding:
+            if not admission_control.admit():
+                logger.warning("Shedding load, too many deliveries in flight", extra=SAMPLED)
+                outcome = 'shed'
+                return admission_response('Server overloaded, retry later', delivery_id,
+                                          admission_control.retry_after, 503)
+            admitted = True
+        
         # Get raw payload for signature verification
         payload_body = request.get_data()
         
-        # Verify signature if webhook secret is configured
-        webhook_secret = current_app.config.get('GITHUB_WEBHOOK_SECRET')
-        if webhook_secret and not verify_github_signature(payload_body, signature, webhook_secret):
+        # Verify signature if webhook secrets are configured, with the secret
+        # of the repository or organization the delivery is for. Large bodies
+        # are verified, parsed and built in a worker process instead, so that
+        # CPU work does not hold this process's GIL. Redeliveries already in
+        # the seen-set are only verified, and rejected by the claim below
+        webhook_secret = webhook_secrets.secret_for(payload_body)
+        if webhook_secret is None and webhook_secrets.configured:
+            logger.error("No webhook secret configured for this delivery's repository")
+            outcome = 'unauthorized'
+            return jsonify({'error': 'Invalid signature'}), 401
+        prepared = None
+        stage_started = time.perf_counter()
+        if (not ingest_queue.enabled and payload_offloader.accepts(event_type, payload_body)
+                and not delivery_deduplicator.seen(delivery_id)):
+            prepared = payload_offloader.prepare(event_type, payload_body, delivery_id, signature, webhook_secret)
+            verified = prepared.verified
+            WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'offload')
+        else:
+            verified = not webhook_secret or verify_github_signature(payload_body, signature, webhook_secret)
+            WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'verify')
+        if not verified:
             logger.error("Invalid webhook signature")
+            outcome = 'unauthorized'
             return jsonify({'error': 'Invalid signature'}), 401
         
+        # Charge the source only now, so forged hook headers cannot spend
+        # another source's budget
+        if admission_control.rate_limiting:
+            key = admission_control.source_key(request.headers, payload_body, request.remote_addr)
+            retry_after = admission_control.check_rate(key)
+            if retry_after:
+                logger.warning("Rate limit exceeded for %s", key, extra=SAMPLED)
+                outcome = 'rate_limited'
+                return admission_response('Rate limit exceeded, retry later', delivery_id, retry_after, 429)
+        
         # Handle ping event from GitHub
         if event_type == 'ping':
             logger.info("Received GitHub webhook ping - webhook is configured correctly")
+            outcome = 'ping'
             return jsonify({
                 'message': 'Webhook ping received successfully',
                 'delivery_id': delivery_id
             }), 200
         
-        # Get JSON payload
-        payload = request.get_json()
-        if not payload:
-            logger.warning("No JSON payload received")
-            return jsonify({'error': 'No JSON payload'}), 400
+        # Drop deliveries we would ignore anyway, decided from the headers and
+        # a prefix scan of the body before any JSON parsing
+        ignored_message = quick_ignore(event_type, payload_body)
+        if ignored_message:
+            logger.info(ignored_message, extra=SAMPLED)
+            outcome = 'ignored'
+            response = {
+                'message': ignored_message,
+                'delivery_id': delivery_id
+            }
+            if event_type not in handler_registry.supported_events:
+                response['supported_events'] = handler_registry.supported_events
+            return jsonify(response), 200
         
-        # Log the repository information
-        repository = payload.get('repository', {})
-        repo_name = repository.get('name', 'Unknown')
-        repo_owner = repository.get('owner', {}).get('login', 'Unknown')
-        repo_full_name = f"{repo_owner}/{repo_name}"
-        
-        logger.info(f"Processing {event_type} event for repository: {repo_full_name}")
-        
-        # Process different event types
-        webhook_event = None
-        
-        if event_type == 'push':
-            # Handle push events
-            ref = payload.get('ref', '')
-            # Skip tag pushes, only process branch pushes
-            if not ref.startswith('refs/heads/'):
-                logger.info(f"Ignoring push to {ref} (not a branch)")
-                return jsonify({
-                    'message': f'Ignored push to {ref} (not a branch)',
-                    'repository': repo_full_name,
+        # Reject redeliveries we have already seen without touching MongoDB;
+        # this runs after signature verification so forged requests cannot
+        # poison the seen-set
+        if not delivery_deduplicator.claim(delivery_id):
+            logger.info("Duplicate delivery %s, already processed", delivery_id, extra=SAMPLED)
+            outcome = 'duplicate'
+            return duplicate_delivery_response(delivery_id)
+        claimed = True
+        
+        # Hand the verified delivery to the background workers in async mode
+        if ingest_queue.enabled:
+            if not ingest_queue.submit(event_type, delivery_id, payload_body):
+                outcome = 'rejected'
+                response = jsonify({
+                    'error': 'Ingest queue is full, retry later',
                     'delivery_id': delivery_id
-                }), 200
+                })
+                response.headers['Retry-After'] = str(ingest_queue.retry_after)
+                return response, 503
             
-            webhook_event = WebhookEvent.from_github_push(payload)
-            logger.info(f"Push event processed: {webhook_event.author} -> {webhook_event.to_branch}")
+            outcome = 'accepted'
+            return jsonify({
+                'message': 'Webhook accepted for processing',
+                'event_type': event_type,
+                'delivery_id': delivery_id
+            }), 202
+        
+        # Decode only the fields the event handlers read
+        if not request.is_json or not payload_body:
+            logger.warning("No JSON payload received")
+            outcome = 'invalid'
+            return jsonify({'error': 'No JSON payload'}), 400
+        if prepared is not None:
+            webhook_event, ignored_message, repo_full_name = (
+                prepared.webhook_event, prepared.ignored_message, prepared.repository
+            )
+        else:
+            stage_started = time.perf_counter()
+            payload = parse_payload(event_type, payload_body)
+            WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'parse')
+            if not payload:
+                logger.warning("No JSON payload received")
+                outcome = 'invalid'
+                return jsonify({'error': 'No JSON payload'}), 400
             
-        elif event_type == 'pull_request':
-            # Handle pull request events
-            action = payload.get('action')
-            logger.info(f"Pull request action: {action}")
+            # Log the repository information
+            repo_full_name = repository_full_name(payload)
             
-            if action == 'opened':
-                # Pull request opened
-                webhook_event = WebhookEvent.from_github_pull_request(payload)
-                logger.info(f"PR opened: {webhook_event.author} - {webhook_event.from_branch} -> {webhook_event.to_branch}")
-                
-            elif action == 'closed' and payload['pull_request'].get('merged'):
-                # Pull request merged
-                webhook_event = WebhookEvent.from_github_merge(payload)
-                logger.info(f"PR merged: {webhook_event.author} - {webhook_event.from_branch} -> {webhook_event.to_branch}")
+            logger.debug("Processing %s event for repository: %s", event_type, repo_full_name)
             
-            else:
-                logger.info(f"Ignoring pull request action: {action}")
-                return jsonify({
-                    'message': f'Ignored pull request action: {action}',
-                    'repository': repo_full_name,
-                    'delivery_id': delivery_id
-                }), 200
+            # Process different event types
+            stage_started = time.perf_counter()
+            webhook_event, ignored_message = build_webhook_event(event_type, payload, delivery_id)
+            WEBHOOK_STAGE_SECONDS.observe(time.perf_counter() - stage_started, event, 'build')
+        update_delivery(repository=repo_full_name)
         
-        else:
-            logger.info(f"Ignoring event type: {event_type}")
-            return jsonify({
-                'message': f'Event type {event_type} not handled',
+        if webhook_event is None:
+            outcome = 'ignored'
+            response = {
+                'message': ignored_message,
                 'repository': repo_full_name,
-                'delivery_id': delivery_id,
-                'supported_events': ['push', 'pull_request', 'ping']
-            }), 200
+                'delivery_id': delivery_id
+            }
+            if event_type not in handler_registry.supported_events:
+                response['supported_events'] = handler_registry.supported_events
+            return jsonify(response), 200
+        
+        # While MongoDB is failing, deliveries go straight to the spool until
+        # it has been replayed
+        if delivery_spool.diverting and delivery_spool.accepts(delivery_id):
+            response = spool_delivery(event_type, delivery_id, payload_body, event)
+            outcome = 'spooled'
+            return response
         
         # Save the webhook event to MongoDB
-        if webhook_event:
-            event_id = webhook_event.save()
-            logger.info(f"Event saved successfully with ID: {event_id}")
-            
-            return jsonify({
-                'message': 'Webhook processed successfully',
-                'event_id': str(event_id),
-                'event_type': event_type,
-                'action': webhook_event.action,
-                'repository': repo_full_name,
-                'author': webhook_event.author,
-                'delivery_id': delivery_id,
-                'timestamp': webhook_event.timestamp.isoformat()
-            }), 200
+        stage_started = time.perf_counter()
+        try:
+            with delivery_spool.deadline():
+                event_id = webhook_event.save()
+        except DuplicateKeyError:
+            # Another worker or an earlier run already stored this delivery
+            outcome = 'duplicate'
+            return duplicate_delivery_response(delivery_id)
+        except Exception as e:
+            write_seconds = time.perf_counter() - stage_started
+            if not delivery_spool.accepts(delivery_id):
+                raise
+            logger.warning("Could not save delivery, spooling it: %s", e)
+            response = spool_delivery(event_type, delivery_id, payload_body, event)
+            outcome = 'spooled'
+            return response
+        write_seconds = time.perf_counter() - stage_started
+        WEBHOOK_STAGE_SECONDS.observe(write_seconds, event, 'insert')
         
+        # One routine line per stored delivery, thinned by LOG_SAMPLE_RATE
+        outcome = 'processed'
+        logger.info("Webhook processed: %s %s by %s, event ID %s", event_type, webhook_event.action,
+                    webhook_event.author, event_id, extra=SAMPLED)
         return jsonify({
-            'message': 'No event processed',
+            'message': 'Webhook processed successfully',
+            'event_id': str(event_id),
+            'event_type': event_type,
+            'action': webhook_event.action,
             'repository': repo_full_name,
-            'delivery_id': delivery_id
+            'author': webhook_event.author,
+            'delivery_id': delivery_id,
+            'timestamp': webhook_event.timestamp.isoformat()
         }), 200
         
     except ValueError as e:
-        logger.error(f"Validation error: {str(e)}")
+        logger.error("Validation error: %s", e)
+        outcome = 'invalid'
         return jsonify({'error': f'Validation error: {str(e)}'}), 400
     
     except Exception as e:
-        logger.error(f"Unexpected error processing webhook: {str(e)}")
+        logger.error("Unexpected error processing webhook: %s", e)
         logger.exception("Full exception details:")
         return jsonify({
             'error': 'Internal server error',
-            'delivery_id': delivery_id if 'delivery_id' in locals() else None
+            'delivery_id': delivery_id
         }), 500
+    
+    finally:
+        if admitted:
+            admission_control.release(write_seconds)
+        if claimed and outcome not in SETTLED_OUTCOMES:
+            delivery_deduplicator.forget(delivery_id)
+        WEBHOOK_DELIVERIES.inc(event, outcome)
+        WEBHOOK_REQUEST_SECONDS.observe(time.perf_counter() - started, event)
+        reset_delivery(context)
 
 @webhook.route('/status', methods=['GET'])
 def webhook_status():
@@ -170,11 +301,8 @@ def webhook_status():
     Status endpoint to check webhook configuration and connectivity
     """
     try:
-        from app.extensions import get_collection
-        
         # Check MongoDB connectivity
-        collection = get_collection(WebhookEvent.COLLECTION_NAME)
-        event_count = collection.count_documents({})
+        event_count = WebhookEvent.count_events()
         
         # Get latest event
         latest_events = WebhookEvent.get_recent_events(limit=1)
@@ -184,23 +312,36 @@ def webhook_status():
             'webhook_endpoint': f"{request.host_url}webhook/receiver",
             'database_connected': True,
             'total_events': event_count,
-            'webhook_secret_configured': current_app.config.get('GITHUB_WEBHOOK_SECRET') is not None,
+            'webhook_secret_configured': webhook_secrets.configured,
+            'webhook_secrets': webhook_secrets.stats(),
             'latest_event': {
                 'id': str(latest_event['_id']) if latest_event else None,
                 'action': latest_event.get('action') if latest_event else None,
                 'author': latest_event.get('author') if latest_event else None,
                 'timestamp': latest_event['timestamp'].isoformat() if latest_event else None
             } if latest_event else None,
-            'supported_events': ['push', 'pull_request', 'ping'],
+            'supported_events': handler_registry.supported_events,
+            'ingest_queue': ingest_queue.metrics(),
+            'deduplication': delivery_deduplicator.stats(),
+            'event_stream': event_broadcaster.stats(),
+            'recent_cache': recent_events_cache.stats(),
+            'offload': payload_offloader.stats(),
+            'stats_rollups': stats_rollups.stats(),
+            'mongo_pool': mongo.stats(),
+            'spool': delivery_spool.stats(),
+            'retention': event_retention.stats(),
+            'tenants': tenant_router.stats(),
+            'admission': admission_control.stats(),
             'status': 'healthy'
         }
         
         return jsonify(status_info), 200
         
     except Exception as e:
-        logger.error(f"Error in status endpoint: {str(e)}")
+        logger.error("Error in status endpoint: %s", e)
         return jsonify({
             'status': 'error',
             'error': str(e),
-            'database_connected': False
+            'database_connected': False,
+            'spool': delivery_spool.stats()
         }), 500
\ No newline at end of file
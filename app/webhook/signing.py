@@ -0,0 +1,202 @@
+# app/webhook/signing.py
+import logging
+import re
+import threading
+import time
+from app.extensions import get_collection
+
+logger = logging.getLogger(__name__)
+
+# The scope is read before verification, so it comes from a scan of the
+# raw body rather than a parse. GitHub's repository object has full_name
+# among its first fields and its organization object starts with login,
+# so each is looked for within SCOPE_WINDOW_BYTES of the object's start
+SCOPE_WINDOW_BYTES = 1024
+_OBJECT_START = re.compile(rb'\s*:\s*\{')
+_FULL_NAME = re.compile(rb'"full_name"\s*:\s*"([^"\\/]+)/([^"\\]+)"')
+_LOGIN = re.compile(rb'\s*"login"\s*:\s*"([^"\\]+)"')
+
+def _object_start(payload_body, key):
+    """Offset just past the opening brace of the first object value of key, or None"""
+    needle = b'"' + key + b'"'
+    position = payload_body.find(needle)
+    while position != -1:
+        match = _OBJECT_START.match(payload_body, position + len(needle))
+        if match is not None:
+            return match.end()
+        position = payload_body.find(needle, position + 1)
+    return None
+
+def _decode(value):
+    return value.decode('utf-8', 'replace')
+
+def delivery_scope(payload_body):
+    """(owner, repository) a raw delivery claims to be for, or (None, None)"""
+    start = _object_start(payload_body, b'repository')
+    if start is not None:
+        match = _FULL_NAME.search(payload_body, start, start + SCOPE_WINDOW_BYTES)
+        if match is not None:
+            return _decode(match.group(1)), _decode(match.group(2))
+    start = _object_start(payload_body, b'organization')
+    if start is not None:
+        match = _LOGIN.match(payload_body, start)
+        if match is not None:
+            return _decode(match.group(1)), None
+    return None, None
+
+def scopes(owner, repository):
+    """Secret table keys from the most to the least specific: owner/repository, owner, default"""
+    if owner:
+        owner = owner.lower()
+        if repository:
+            yield f'{owner}/{repository.lower()}'
+        yield owner
+    yield ''
+
+def resolve_secret(secrets, owner=None, repository=None):
+    """Secret of the most specific scope present in secrets, or None"""
+    for scope in scopes(owner, repository):
+        secret = secrets.get(scope)
+        if secret:
+            return secret
+    return None
+
+def select_secret(secrets, payload_body):
+    """
+    Secret a raw delivery must be signed with, from a scope -> secret dict
+    The body is only read when secrets has entries besides the default
+    """
+    if not any(secrets):
+        return secrets.get('')
+    return resolve_secret(secrets, *delivery_scope(payload_body))
+
+class WebhookSecrets:
+    """
+    Webhook secrets per repository and per organization
+
+    A delivery must be signed with the secret of 'owner/repository', else
+    of 'owner', else GITHUB_WEBHOOK_SECRET. Entries come from
+    GITHUB_WEBHOOK_SECRETS and, with WEBHOOK_SECRETS_STORE 'mongo', from the
+    webhook_secrets collection (`flask secrets set`), which is re-read into
+    the in-memory table every WEBHOOK_SECRETS_REFRESH seconds by one
+    request thread while the others keep using the old table. The owner
+    and repository are read from the body before verification, and only
+    when scoped entries exist; a delivery naming another tenant still has
+    to carry that tenant's signature.
+    """
+
+    COLLECTION_NAME = 'webhook_secrets'
+
+    def __init__(self, app=None):
+        self.store = 'config'
+        self.refresh_interval = 60.0
+        self._configured = {}
+        self._table = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the secret table from the Flask app config"""
+        self.store = app.config.get('WEBHOOK_SECRETS_STORE', 'config')
+        if self.store not in ('config', 'mongo'):
+            logger.warning("Unknown WEBHOOK_SECRETS_STORE %r, using the configured secrets only", self.store)
+            self.store = 'config'
+        self.refresh_interval = app.config.get('WEBHOOK_SECRETS_REFRESH', 60.0)
+        configured = {
+            scope.lower(): secret for scope, secret in (app.config.get('GITHUB_WEBHOOK_SECRETS') or {}).items() if secret
+        }
+        if app.config.get('GITHUB_WEBHOOK_SECRET'):
+            configured[''] = app.config['GITHUB_WEBHOOK_SECRET']
+        self._configured = configured
+        self.load([])
+        if self.store == 'mongo':
+            # Read the collection on first use
+            self._loaded_at = None
+
+    def load(self, documents):
+        """Rebuild the table from the configured secrets plus webhook_secrets documents"""
+        table = dict(self._configured)
+        for document in documents:
+            if document.get('secret'):
+                table[document['_id'].lower()] = document['secret']
+        with self._lock:
+            self._table = table
+            self._loaded_at = time.monotonic()
+
+    def defer(self, error):
+        """Keep the current table after a failed read and retry after the interval"""
+        logger.error("Could not load webhook secrets: %s", error)
+        with self._lock:
+            self._loaded_at = time.monotonic()
+
+    def stale(self):
+        """Whether webhook_secrets is due to be re-read"""
+        if self.store != 'mongo':
+            return False
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval
+
+    def refresh(self):
+        """Re-read webhook_secrets when stale; a thread already reading is not waited for"""
+        if not self.stale() or not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            self.load(list(get_collection(self.COLLECTION_NAME).find({}, {'secret': 1})))
+        except Exception as e:
+            self.defer(e)
+        finally:
+            self._refreshing.release()
+
+    @property
+    def configured(self):
+        """Whether any secret is set"""
+        return bool(self._table)
+
+    def secret_for(self, payload_body):
+        """Secret a raw delivery must be signed with, or None when none is configured"""
+        self.refresh()
+        return select_secret(self._table, payload_body)
+
+    def lookup(self, owner=None, repository=None):
+        """Secret for a repository, falling back to its owner and then the default"""
+        self.refresh()
+        return resolve_secret(self._table, owner, repository)
+
+    def snapshot(self):
+        """The scope -> secret table as a plain dict, for worker processes"""
+        self.refresh()
+        return dict(self._table)
+
+    # Managing the webhook_secrets collection
+
+    def set(self, scope, secret):
+        get_collection(self.COLLECTION_NAME).update_one(
+            {'_id': scope.lower()}, {'$set': {'secret': secret}}, upsert=True
+        )
+        with self._lock:
+            self._loaded_at = None
+
+    def delete(self, scope):
+        """Remove a stored secret; returns False when there was none"""
+        deleted = get_collection(self.COLLECTION_NAME).delete_one({'_id': scope.lower()}).deleted_count
+        with self._lock:
+            self._loaded_at = None
+        return bool(deleted)
+
+    def stored_scopes(self):
+        return sorted(document['_id'] for document in get_collection(self.COLLECTION_NAME).find({}, {'_id': 1}))
+
+    def stats(self):
+        table = self._table
+        loaded_at = self._loaded_at
+        return {
+            'store': self.store,
+            'default': '' in table,
+            'scopes': len(table) - ('' in table),
+            'loaded_seconds_ago': round(time.monotonic() - loaded_at, 1) if loaded_at is not None else None
+        }
+
+webhook_secrets = WebhookSecrets()
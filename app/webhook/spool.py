@@ -0,0 +1,400 @@
+# app/webhook/spool.py
+import atexit
+import contextlib
+import fcntl
+import glob
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+import pymongo
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.extensions import get_collection
+from app.models.batcher import write_batcher
+from app.log import bind_delivery, reset_delivery
+from app.webhook.processing import build_webhook_event, parse_payload
+
+logger = logging.getLogger(__name__)
+
+# Record: magic, payload length, CRC-32 of the payload, then the payload
+# (event type and delivery id lengths, both strings, the raw body)
+MAGIC = b'WSP1'
+HEADER = struct.Struct('>4sII')
+FIELDS = struct.Struct('>HH')
+
+def encode_record(event_type, delivery_id, payload_body):
+    event = event_type.encode('utf-8')
+    delivery = delivery_id.encode('utf-8')
+    payload = FIELDS.pack(len(event), len(delivery)) + event + delivery + payload_body
+    return HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+def _decode_payload(payload):
+    event_length, delivery_length = FIELDS.unpack_from(payload)
+    start = FIELDS.size
+    event_type = payload[start:start + event_length].decode('utf-8')
+    start += event_length
+    delivery_id = payload[start:start + delivery_length].decode('utf-8')
+    return event_type, delivery_id, payload[start + delivery_length:]
+
+def read_segment(data):
+    """
+    (records, skipped bytes) for the contents of a segment file
+
+    A record cut short by a crash, or one that fails its CRC, is skipped by
+    scanning ahead for the next magic number that starts a valid record.
+    """
+    records = []
+    skipped = 0
+    offset = 0
+    while offset < len(data):
+        if offset + HEADER.size <= len(data):
+            magic, length, crc = HEADER.unpack_from(data, offset)
+            end = offset + HEADER.size + length
+            if magic == MAGIC and end <= len(data):
+                payload = data[offset + HEADER.size:end]
+                if zlib.crc32(payload) == crc:
+                    records.append(_decode_payload(payload))
+                    offset = end
+                    continue
+        following = data.find(MAGIC, offset + 1)
+        following = len(data) if following < 0 else following
+        skipped += following - offset
+        offset = following
+    return records, skipped
+
+class DeliverySpool:
+    """
+    Local append-only spool for deliveries MongoDB could not take
+
+    When a save fails or runs past SPOOL_SAVE_TIMEOUT_MS, the verified raw
+    delivery is appended to a segment file in SPOOL_DIR and acknowledged
+    once it is on disk. Concurrent appends share fsync calls: whoever finds
+    no sync running syncs everything written so far, the rest wait for it.
+    After a failure new deliveries go straight to the spool, so the
+    receiver does not wait on the database during an incident, until a
+    background replayer has drained the spool back into MongoDB with
+    unordered bulk inserts.
+
+    Each process writes its own segments and holds an exclusive flock on
+    the one it is appending to. Replayers in any process take whichever
+    segments they can lock, which includes those left by a crashed worker.
+    Replay is idempotent because delivery ids are unique in webhook_events.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.directory = 'spool'
+        self.segment_bytes = 64 * 1024 * 1024
+        self.fsync = True
+        self.save_timeout = 2.0
+        self.replay_interval = 2.0
+        self.replay_batch = 500
+        # True while deliveries bypass MongoDB and go straight to the spool
+        self.diverting = False
+        self._fd = None
+        self._segment_size = 0
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+        self._pid = None
+        self._condition = threading.Condition()
+        self._replayer = None
+        self._replayer_pid = None
+        self._running = False
+        self._wake = threading.Event()
+        self._stats = {
+            'spooled': 0,
+            'fsyncs': 0,
+            'replayed': 0,
+            'replay_duplicates': 0,
+            'replay_failures': 0,
+            'corrupt_bytes': 0
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the spool from the Flask app config"""
+        self.app = app
+        self.enabled = app.config.get('SPOOL_ENABLED', False)
+        self.directory = app.config.get('SPOOL_DIR', 'spool')
+        self.segment_bytes = app.config.get('SPOOL_SEGMENT_BYTES', 64 * 1024 * 1024)
+        self.fsync = app.config.get('SPOOL_FSYNC', True)
+        self.save_timeout = app.config.get('SPOOL_SAVE_TIMEOUT_MS', 2000) / 1000.0
+        self.replay_interval = app.config.get('SPOOL_REPLAY_INTERVAL', 2.0)
+        self.replay_batch = max(1, app.config.get('SPOOL_REPLAY_BATCH', 500))
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._running = True
+            atexit.register(self.shutdown)
+            logger.info("Delivery spool enabled in %s", os.path.abspath(self.directory))
+
+    def accepts(self, delivery_id):
+        """Whether a delivery can be spooled (replay relies on its unique id)"""
+        return self.enabled and bool(delivery_id)
+
+    @contextlib.contextmanager
+    def deadline(self):
+        """Context limiting how long a save may take before it is spooled"""
+        if not self.enabled or not self.save_timeout:
+            yield
+            return
+        # The batcher waits on its flush thread, which pymongo's deadline
+        # does not reach, so it is given the same bound
+        with pymongo.timeout(self.save_timeout), write_batcher.timeout(self.save_timeout):
+            yield
+
+    def append(self, event_type, delivery_id, payload_body):
+        """Write a delivery to the spool, returning once it is durable"""
+        record = encode_record(event_type, delivery_id, payload_body)
+        with self._condition:
+            self._prepare_segment(len(record))
+            view = memoryview(record)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._written += len(record)
+            self._segment_size += len(record)
+            position = self._written
+            while self.fsync and self._synced < position:
+                if self._syncing:
+                    self._condition.wait()
+                    continue
+                # Sync everything written so far on behalf of all waiters
+                self._syncing = True
+                fd, target = self._fd, self._written
+                self._condition.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._condition.acquire()
+                    self._syncing = False
+                    self._condition.notify_all()
+                self._synced = max(self._synced, target)
+                self._stats['fsyncs'] += 1
+            self._stats['spooled'] += 1
+            self.diverting = True
+        self._ensure_replayer()
+
+    def _prepare_segment(self, incoming):
+        """Open a segment for this process, rolling over a full one"""
+        if self._pid != os.getpid():
+            # A segment inherited across fork belongs to the parent
+            self._fd = None
+            self._segment_size = self._written = self._synced = 0
+            self._syncing = False
+            self._pid = os.getpid()
+        if self._fd is not None and self._segment_size + incoming > self.segment_bytes and self._segment_size:
+            self._seal()
+        if self._fd is None:
+            path = os.path.join(self.directory, f'segment-{time.time_ns():020d}-{os.getpid()}.log')
+            # Lock the segment before replayers can see it, or one could take
+            # the empty file and unlink it under this writer
+            fd = os.open(path + '.new', os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.rename(path + '.new', path)
+            self._fd = fd
+            self._segment_size = 0
+
+    def _seal(self):
+        """Close the active segment so a replayer can take it (lock held)"""
+        while self._syncing:
+            self._condition.wait()
+        if self.fsync:
+            os.fsync(self._fd)
+        self._synced = self._written
+        os.close(self._fd)
+        self._fd = None
+        self._segment_size = 0
+
+    def _ensure_replayer(self):
+        """Start the replay thread in the current process (after any fork)"""
+        if self._replayer_pid == os.getpid() or not self._running:
+            return
+        with self._condition:
+            if self._replayer_pid == os.getpid():
+                return
+            self._replayer = threading.Thread(target=self._run_replayer, name='spool-replayer', daemon=True)
+            self._replayer.start()
+            self._replayer_pid = os.getpid()
+
+    def start(self):
+        """Start replaying segments left by earlier or crashed processes"""
+        if self.enabled and self.segments():
+            self._ensure_replayer()
+
+    def segments(self):
+        """Segment files in the spool directory, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, 'segment-*.log')))
+
+    def _run_replayer(self):
+        while self._running:
+            self._wake.wait(self.replay_interval)
+            self._wake.clear()
+            try:
+                self.replay()
+            except Exception as e:
+                logger.error("Spool replay failed: %s", e)
+
+    def replay(self):
+        """
+        Drain every segment that can be locked into MongoDB
+
+        The active segment is sealed only once the older ones are gone, so
+        an outage grows one segment instead of many small ones. Returns
+        True when the spool was empty at the end.
+        """
+        drained = self._replay_sealed()
+        if drained:
+            with self._condition:
+                if self._fd is not None and self._pid == os.getpid() and self._segment_size:
+                    self._seal()
+            drained = self._replay_sealed()
+        if drained:
+            with self._condition:
+                empty = self._fd is None or not self._segment_size
+            if empty and self.diverting:
+                self.diverting = False
+                logger.info("Spool drained, saving deliveries to MongoDB again")
+            return empty
+        return False
+
+    def _replay_sealed(self):
+        for path in self.segments():
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                # Another process replayed it meanwhile
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Being written, or replayed by another process
+                    continue
+                if not os.path.exists(path):
+                    continue
+                with os.fdopen(os.dup(fd), 'rb') as handle:
+                    data = handle.read()
+                records, skipped = read_segment(data)
+                if skipped:
+                    logger.warning("Skipped %s corrupt bytes in spool segment %s", skipped, path)
+                for start in range(0, len(records), self.replay_batch):
+                    if not self._store(records[start:start + self.replay_batch]):
+                        return False
+                os.unlink(path)
+                with self._condition:
+                    self._stats['corrupt_bytes'] += skipped
+                logger.info("Replayed %s spooled deliveries from %s", len(records), os.path.basename(path))
+            finally:
+                os.close(fd)
+        return True
+
+    def _store(self, records):
+        """Insert a batch of spooled deliveries; False if MongoDB refused it"""
+        from app.models.webhook_event import WebhookEvent, tenant_router
+
+        events = []
+        with self.app.app_context():
+            for event_type, delivery_id, payload_body in records:
+                context = bind_delivery(delivery_id=delivery_id, event=event_type)
+                try:
+                    payload = parse_payload(event_type, payload_body)
+                    webhook_event = build_webhook_event(event_type, payload, delivery_id)[0] if payload else None
+                except Exception as e:
+                    logger.error("Dropping unreadable spooled delivery %s: %s", delivery_id, e)
+                    webhook_event = None
+                finally:
+                    reset_delivery(context)
+                if webhook_event is not None:
+                    events.append(webhook_event)
+            if not events:
+                return True
+
+            by_collection = {}
+            for webhook_event in events:
+                document = webhook_event.to_dict()
+                document['_id'] = ObjectId()
+                try:
+                    name = tenant_router.collection_for(webhook_event.repository_owner)
+                except Exception as e:
+                    return self._replay_failed(e)
+                by_collection.setdefault(name, []).append((webhook_event, document))
+            duplicates = 0
+            for name, batch in by_collection.items():
+                rejected = set()
+                try:
+                    get_collection(name).insert_many([document for _, document in batch], ordered=False)
+                except BulkWriteError as e:
+                    errors = e.details.get('writeErrors', [])
+                    if any(error.get('code') != 11000 for error in errors):
+                        return self._replay_failed(e)
+                    # Stored before the outage ended, or replayed already
+                    rejected = {error['index'] for error in errors}
+                except Exception as e:
+                    return self._replay_failed(e)
+                duplicates += len(rejected)
+
+                for index, (webhook_event, document) in enumerate(batch):
+                    if index in rejected:
+                        if webhook_event.commits:
+                            try:
+                                webhook_event._complete_commits(name)
+                            except Exception as e:
+                                return self._replay_failed(e)
+                        continue
+                    if webhook_event.commits:
+                        try:
+                            webhook_event._save_commits(document['_id'], name)
+                        except Exception as e:
+                            return self._replay_failed(e)
+                    WebhookEvent.after_insert(document)
+        with self._condition:
+            self._stats['replayed'] += len(events) - duplicates
+            self._stats['replay_duplicates'] += duplicates
+        return True
+
+    def _replay_failed(self, error):
+        with self._condition:
+            self._stats['replay_failures'] += 1
+        logger.warning("MongoDB unavailable for spool replay, retrying in %ss: %s", self.replay_interval, error)
+        return False
+
+    def shutdown(self):
+        """Seal the active segment and stop the replayer"""
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        with self._condition:
+            if self._fd is not None and self._pid == os.getpid():
+                self._seal()
+        if self._replayer is not None and self._replayer_pid == os.getpid():
+            self._replayer.join(self.replay_interval)
+
+    def pending_bytes(self):
+        """Bytes of spooled deliveries waiting for replay"""
+        total = 0
+        for path in self.segments():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def stats(self):
+        """Spool counters for /webhook/status"""
+        with self._condition:
+            stats = dict(self._stats)
+        stats.update({
+            'enabled': self.enabled,
+            'diverting': self.diverting,
+            'segments': len(self.segments()) if self.enabled else 0,
+            'pending_bytes': self.pending_bytes() if self.enabled else 0
+        })
+        return stats
+
+delivery_spool = DeliverySpool()
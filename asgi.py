@@ -0,0 +1,5 @@
+import os
+from app.asgi import create_asgi_app
+
+# ASGI entry point for the receiver and event API: uvicorn asgi:app
+app = create_asgi_app(os.environ.get('FLASK_CONFIG', 'production'))
@@ -0,0 +1,48 @@
+# benchmarks/__main__.py
+"""
+Run the in-process benchmark suite
+
+    python -m benchmarks [--output results.jsonl] [--corpus DIR]
+
+Runs each benchmark below in its own interpreter (so one run's caches,
+threads and connections do not leak into the next) and appends every
+result record to the output file. Compare two such files with
+python -m benchmarks.compare. bench_servers and check_query_plans need a
+real mongod and server binaries, so they are not part of the suite.
+"""
+import subprocess
+import sys
+
+SUITE = (
+    'bench_micro',
+    'bench_parsing',
+    'bench_encoding',
+    'bench_receiver',
+    'bench_admission',
+    'bench_batch_writes',
+    'bench_push_expansion',
+    'bench_metrics',
+    'bench_logging',
+    'bench_spool',
+    'bench_retention',
+    'bench_import'
+)
+
+# Options passed through to the benchmarks that understand them
+PASSTHROUGH = ('--output', '--corpus')
+
+def main():
+    options = []
+    for name in PASSTHROUGH:
+        if name in sys.argv:
+            options += [name, sys.argv[sys.argv.index(name) + 1]]
+    failed = []
+    for module in SUITE:
+        print(f'# {module}', file=sys.stderr, flush=True)
+        if subprocess.run([sys.executable, '-m', f'benchmarks.{module}'] + options).returncode:
+            failed.append(module)
+    if failed:
+        sys.exit(f'Failed: {", ".join(failed)}')
+
+if __name__ == '__main__':
+    main()
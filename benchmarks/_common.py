@@ -0,0 +1,136 @@
+# benchmarks/_common.py
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    values = sorted(samples)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def latency_summary(samples):
+    """Latency percentiles in milliseconds for a list of durations in seconds"""
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3) if samples else None,
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3) if samples else None,
+        'max_ms': round(max(samples) * 1000, 3) if samples else None
+    }
+
+def timeit(func, iterations):
+    """Run func iterations times and return per-call durations in seconds"""
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+def mongomock_db(name='webhook_bench'):
+    """In-memory MongoDB stand-in used by the benchmarks"""
+    import mongomock
+    return mongomock.MongoClient()[name]
+
+def use_mongomock():
+    """
+    Make the app's lazily created MongoClient an in-memory mongomock one
+
+    Pool, timeout and write concern options only mean something to a real
+    server, so they are dropped.
+    """
+    import mongomock
+    from app import extensions
+
+    class MockClient(mongomock.MongoClient):
+        def __init__(self, uri, event_listeners=None, **options):
+            super().__init__(uri)
+
+    extensions.MongoClient = MockClient
+
+class LatencyCollection:
+    """
+    Collection proxy that models a remote server for write calls
+
+    Every write holds one of pool_size connections for a fixed round trip,
+    so concurrency beyond the pool queues the way it does in MongoClient.
+    """
+
+    def __init__(self, collection, round_trip, pool):
+        self._collection = collection
+        self._round_trip = round_trip
+        self._pool = pool
+
+    def _call(self, method, *args, **kwargs):
+        with self._pool:
+            time.sleep(self._round_trip)
+            return getattr(self._collection, method)(*args, **kwargs)
+
+    def insert_one(self, *args, **kwargs):
+        return self._call('insert_one', *args, **kwargs)
+
+    def insert_many(self, *args, **kwargs):
+        return self._call('insert_many', *args, **kwargs)
+
+    def bulk_write(self, *args, **kwargs):
+        return self._call('bulk_write', *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+class LatencyDatabase:
+    """Database proxy handing out LatencyCollection wrappers"""
+
+    def __init__(self, db, round_trip, pool_size=8):
+        self._db = db
+        self._round_trip = round_trip
+        self._pool = threading.BoundedSemaphore(pool_size)
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = LatencyCollection(self._db[name], self._round_trip, self._pool)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def git_revision():
+    """Short commit hash of the tree being measured, if it is a git checkout"""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return revision or None
+
+def write_results(name, results, output=None):
+    """Print machine-readable benchmark results, optionally appending to a file"""
+    record = {
+        'benchmark': name,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'results': results
+    }
+    line = json.dumps(record)
+    print(line)
+    if output:
+        with open(output, 'a') as handle:
+            handle.write(line + '\n')
+    return record
+
+def output_path():
+    """Optional results file given as --output PATH"""
+    if '--output' in sys.argv:
+        return sys.argv[sys.argv.index('--output') + 1]
+    return None
@@ -0,0 +1,144 @@
+# benchmarks/bench_admission.py
+"""
+Cost of admission control and its effect on an overloaded receiver
+
+    python -m benchmarks.bench_admission [--output results.jsonl]
+
+Times a rate limit check and an admit/release pair with the per-process
+and the shared (memory-mapped) store, and the aggregate rate limit checks
+per second of PROCESSES processes sharing one state file. Then it offers
+ARRIVALS_PER_SEC deliveries a second, open loop, to a simulated receiver
+whose MongoDB takes DB_CAPACITY writes at a time of SERVICE_MS each (a
+1.5x overload), with and without load shedding, and reports how many
+deliveries were answered within TIMEOUT_SECONDS, how many timed out and
+how many were shed, with the latency of the served ones.
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from app.webhook.admission import AdmissionControl
+from benchmarks._common import latency_summary, output_path, timeit, write_results
+
+ITERATIONS = 20000
+PROCESSES = 4
+SIMULATION_SECONDS = 3.0
+ARRIVALS_PER_SEC = 300
+DB_CAPACITY = 4
+SERVICE_MS = 20
+TIMEOUT_SECONDS = 1.0
+TARGET_LATENCY_MS = 100
+
+def _control(state_file=None, **config):
+    control = AdmissionControl()
+    config.setdefault('ADMISSION_STORE', 'shared' if state_file else 'local')
+    control.init_app(SimpleNamespace(config=dict(config, ADMISSION_STATE_FILE=state_file)))
+    return control
+
+def _overhead(state_file):
+    results = []
+    for store, path in (('local', None), ('shared', state_file)):
+        control = _control(path, RATE_LIMIT_ENABLED=True, RATE_LIMIT_PER_MINUTE=10 ** 9, SHEDDING_ENABLED=True)
+        keys = [f'repository:{index}' for index in range(1000)]
+        position = iter(range(10 ** 9))
+        check = latency_summary(timeit(lambda: control.check_rate(keys[next(position) % 1000]), ITERATIONS))
+        admit = latency_summary(timeit(lambda: (control.admit(), control.release(0.005)), ITERATIONS))
+        results.append({'store': store, 'check_rate': check, 'admit_release': admit})
+    return results
+
+def _hammer(state_file, count, started, results):
+    control = _control(state_file, RATE_LIMIT_ENABLED=True, RATE_LIMIT_PER_MINUTE=10 ** 9)
+    control.check_rate('warm-up')
+    started.wait()
+    began = time.perf_counter()
+    for index in range(count):
+        control.check_rate(f'repository:{index % 100}')
+    results.put(time.perf_counter() - began)
+
+def _contention(state_file):
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+    started = context.Event()
+    results = context.Queue()
+    count = ITERATIONS // 2
+    workers = [context.Process(target=_hammer, args=(state_file, count, started, results)) for _ in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    time.sleep(0.5)
+    began = time.perf_counter()
+    started.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    return {
+        'processes': PROCESSES,
+        'checks': count * PROCESSES,
+        'checks_per_sec': round(count * PROCESSES / elapsed),
+        'slowest_process_seconds': round(max(results.get() for _ in workers), 3)
+    }
+
+def _simulate(shedding):
+    control = _control(SHEDDING_ENABLED=shedding, SHED_TARGET_LATENCY_MS=TARGET_LATENCY_MS, SHED_MIN_IN_FLIGHT=2,
+                       SHED_MAX_IN_FLIGHT=64)
+    database = threading.BoundedSemaphore(DB_CAPACITY)
+    lock = threading.Lock()
+    outcomes = {'served': 0, 'timed_out': 0, 'shed': 0}
+    served = []
+
+    def request():
+        started = time.perf_counter()
+        if shedding and not control.admit():
+            with lock:
+                outcomes['shed'] += 1
+            return
+        write_started = time.perf_counter()
+        try:
+            with database:
+                time.sleep(SERVICE_MS / 1000.0)
+        finally:
+            if shedding:
+                control.release(time.perf_counter() - write_started)
+        elapsed = time.perf_counter() - started
+        with lock:
+            if elapsed <= TIMEOUT_SECONDS:
+                outcomes['served'] += 1
+                served.append(elapsed)
+            else:
+                outcomes['timed_out'] += 1
+
+    offered = int(SIMULATION_SECONDS * ARRIVALS_PER_SEC)
+    executor = ThreadPoolExecutor(max_workers=offered)
+    began = time.perf_counter()
+    for index in range(offered):
+        delay = began + index / ARRIVALS_PER_SEC - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        executor.submit(request)
+    executor.shutdown(wait=True)
+    return dict(shedding=shedding, offered=offered, latency=latency_summary(served), **outcomes)
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        overhead = _overhead(os.path.join(directory, 'overhead.state'))
+        contention = _contention(os.path.join(directory, 'contention.state'))
+    simulations = [_simulate(False), _simulate(True)]
+
+    write_results('admission', {
+        'iterations': ITERATIONS,
+        'overhead': overhead,
+        'contention': contention,
+        'overload': {
+            'arrivals_per_sec': ARRIVALS_PER_SEC,
+            'capacity_per_sec': DB_CAPACITY * 1000 // SERVICE_MS,
+            'timeout_seconds': TIMEOUT_SECONDS,
+            'runs': simulations
+        }
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
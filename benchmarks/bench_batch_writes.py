@@ -0,0 +1,85 @@
+# benchmarks/bench_batch_writes.py
+"""
+Compare per-event insert_one against the write-behind batcher
+
+    python -m benchmarks.bench_batch_writes [--output results.jsonl]
+
+Each run saves EVENTS WebhookEvents from CONCURRENCY threads against an
+in-memory collection where every write call holds one of POOL_SIZE
+connections for ROUND_TRIP seconds.
+"""
+import threading
+import time
+from flask import Flask
+from app.extensions import mongo
+from app.models.batcher import write_batcher
+from app.models.webhook_event import WebhookEvent
+from benchmarks._common import LatencyDatabase, latency_summary, mongomock_db, output_path, write_results
+
+EVENTS = 2000
+CONCURRENCY = 64
+ROUND_TRIP = 0.002
+POOL_SIZE = 8
+
+def _make_event(index):
+    return WebhookEvent(
+        request_id=f'{index:012x}',
+        author='octocat',
+        action='PUSH',
+        to_branch='main',
+        repository_name='bench-repo',
+        repository_url='https://github.com/octo/bench-repo',
+        commit_message=f'Commit {index}'
+    )
+
+def _run(label):
+    latencies = []
+    lock = threading.Lock()
+    per_thread = EVENTS // CONCURRENCY
+
+    def worker(offset):
+        local = []
+        for index in range(offset, offset + per_thread):
+            event = _make_event(index)
+            started = time.perf_counter()
+            event.save()
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(CONCURRENCY)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    result = {'mode': label, 'events_per_sec': round(len(latencies) / elapsed, 1)}
+    result.update(latency_summary(latencies))
+    return result
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    results = []
+
+    mongo.db = LatencyDatabase(mongomock_db(), ROUND_TRIP, POOL_SIZE)
+    results.append(_run('insert_one'))
+
+    mongo.db = LatencyDatabase(mongomock_db(), ROUND_TRIP, POOL_SIZE)
+    app = Flask(__name__)
+    app.config.update(MONGO_BATCH_WRITES=True, MONGO_BATCH_SIZE=100, MONGO_BATCH_MAX_LATENCY_MS=5)
+    write_batcher.init_app(app)
+    results.append(_run('batched'))
+    write_batcher.shutdown()
+
+    write_results('batch_writes', {
+        'events': EVENTS,
+        'concurrency': CONCURRENCY,
+        'round_trip_ms': ROUND_TRIP * 1000,
+        'pool_size': POOL_SIZE,
+        'runs': results
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# benchmarks/bench_encoding.py
+"""
+Bytes and CPU of /api/events responses per layout, encoder and coding
+
+    python -m benchmarks.bench_encoding [--output results.jsonl]
+
+Builds realistic event pages (a few repositories and owners, a dozen
+authors, pushes, pull requests, merges, issues and releases) and, for
+both response versions and page sizes, reports the body size and the time
+to build and encode it for each layout (json, columnar) and JSON encoder
+(stdlib, orjson), followed by the compressed size and compression time
+per coding. Then it times whole GET /api/events requests through the
+Flask app, served from the recent events cache, for each combination of
+encoder, layout and Accept-Encoding.
+"""
+import gzip
+import random
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from app import encoding
+from app.api.routes import events_body
+from app.encoding import response_encoding
+from app.models.webhook_event import WebhookEvent
+from benchmarks._common import latency_summary, output_path, timeit, use_mongomock, write_results
+
+ITERATIONS = 200
+PAGE_SIZES = (50, 200)
+REPOSITORIES = [('octo-org', 'monorepo'), ('octo-org', 'api'), ('octo-org', 'web-frontend'),
+                ('acme', 'payments-service'), ('acme', 'infrastructure'), ('jdoe', 'dotfiles')]
+AUTHORS = ['alice', 'bob', 'carol', 'dan', 'erin', 'fay', 'gus', 'hana', 'ivan', 'june', 'kai', 'lena']
+BRANCHES = ['main', 'develop', 'feature/login-form', 'fix/null-timestamps', 'release/2.4']
+
+def _events(count, seed=11):
+    """Stored event documents, newest first"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    documents = []
+    for index in range(count):
+        owner, repository = rng.choice(REPOSITORIES)
+        common = dict(
+            author=rng.choice(AUTHORS), repository_name=repository, repository_owner=owner,
+            repository_url=f'https://github.com/{owner}/{repository}',
+            timestamp=now - timedelta(seconds=index * rng.randint(20, 400)),
+            delivery_id=f'encoding-{index}'
+        )
+        kind = rng.random()
+        if kind < 0.55:
+            event = WebhookEvent(f'{rng.getrandbits(160):040x}', action='PUSH', to_branch=rng.choice(BRANCHES),
+                                 commit_message=f'Update module {rng.randint(1, 40)}: handle edge cases', **common)
+        elif kind < 0.8:
+            action = rng.choice(('PULL_REQUEST', 'MERGE'))
+            event = WebhookEvent(str(rng.randint(10 ** 8, 10 ** 9)), action=action,
+                                 from_branch=rng.choice(BRANCHES[2:]), to_branch='main',
+                                 pull_request_title=f'Feature {index}: improve error handling', **common)
+        elif kind < 0.95:
+            event = WebhookEvent(str(rng.randint(10 ** 8, 10 ** 9)), action='ISSUE',
+                                 title=f'Bug {index}: page crashes', status=rng.choice(('opened', 'closed')), **common)
+        else:
+            event = WebhookEvent(str(rng.randint(10 ** 8, 10 ** 9)), action='RELEASE', to_branch='main',
+                                 title=f'v2.{index}.0', **common)
+        document = event.to_dict()
+        document['_id'] = ObjectId()
+        documents.append(document)
+    return documents
+
+def _encoders():
+    return ['json', 'orjson'] if encoding.orjson is not None else ['json']
+
+def _codings():
+    codings = [('gzip', 1), ('gzip', 6)]
+    if encoding.brotli is not None:
+        codings += [('br', 4), ('br', 11)]
+    return codings
+
+def _compress(body, coding, level):
+    if coding == 'br':
+        return encoding.brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+def _bodies(documents):
+    """Per version, layout and encoder: the encoded size and build + encode time"""
+    results = []
+    for version in (1, 2):
+        for layout in ('json', 'columnar'):
+            for encoder in _encoders():
+                response_encoding.encoder = encoder
+
+                def build():
+                    return response_encoding.dumps(events_body(documents, version, layout, None, None))
+
+                body = build()
+                result = dict(response=f'v{version}, {len(documents)} events', layout=layout, encoder=encoder,
+                              bytes=len(body), encode=latency_summary(timeit(build, ITERATIONS)))
+                # The coding does not depend on the encoder, so measure it once
+                if encoder == 'json':
+                    for coding, level in _codings():
+                        compressed = _compress(body, coding, level)
+                        result[f'{coding}_{level}'] = dict(
+                            bytes=len(compressed), ratio=round(len(body) / len(compressed), 1),
+                            compress=latency_summary(timeit(lambda: _compress(body, coding, level), ITERATIONS))
+                        )
+                results.append(result)
+    return results
+
+def _create_app():
+    from app import create_app
+    from config import ProductionConfig, config
+
+    use_mongomock()
+    config['bench'] = type('BenchConfig', (ProductionConfig,), {
+        'MONGO_URI': 'mongodb://localhost:27017/webhook_bench',
+        'LOG_LEVEL': 'WARNING',
+        'LOG_QUEUE': False,
+        'RECENT_CACHE_SYNC': 'none',
+        'STATS_ENABLED': False
+    })
+    return create_app('bench')
+
+def _requests(documents):
+    """Whole GET /api/events?v=2 requests per encoder, layout and Accept-Encoding"""
+    from flask_pymongo import BSONProvider
+    from app.extensions import get_collection
+    from app.models.webhook_event import events_version, recent_events_cache
+
+    app = _create_app()
+    get_collection(WebhookEvent.COLLECTION_NAME).insert_many([dict(document) for document in documents])
+    events_version.invalidate()
+    recent_events_cache.seed()
+    client = app.test_client()
+    results = []
+    for encoder in _encoders():
+        response_encoding.encoder = encoder
+        app.json = encoding.OrjsonProvider(app) if encoder == 'orjson' else BSONProvider(app)
+        for layout in ('json', 'columnar'):
+            path = f'/api/events?v=2&limit={len(documents)}&format={layout}'
+            for accept in [None] + response_encoding.codings:
+                headers = {'Accept-Encoding': accept} if accept else {}
+                response = client.get(path, headers=headers)
+                results.append(dict(
+                    encoder=encoder, layout=layout, accept_encoding=accept, events=len(documents),
+                    status=response.status_code, bytes=len(response.data),
+                    latency=latency_summary(timeit(lambda: client.get(path, headers=headers), ITERATIONS))
+                ))
+    return results
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+
+    bodies = []
+    for page_size in PAGE_SIZES:
+        bodies += _bodies(_events(page_size))
+    requests = _requests(_events(max(PAGE_SIZES)))
+
+    write_results('encoding', {
+        'iterations': ITERATIONS,
+        'encoders': _encoders(),
+        'codings': [f'{coding}_{level}' for coding, level in _codings()],
+        'bodies': bodies,
+        'requests': requests
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_import.py
+"""
+Bulk delivery import throughput
+
+    python -m benchmarks.bench_import [--corpus DIR] [--output results.jsonl]
+
+Writes DELIVERIES recorded deliveries (the payload corpus repeated, plus a
+redelivery of every tenth one) to an NDJSON file and imports it with
+DeliveryImporter using 0 (inline), 1 and 2 parser processes and one per
+CPU. Reports deliveries/sec for each and checks that every distinct
+delivery was stored exactly once. The in-memory MongoDB has no indexes
+here, so the in-file deduplication is what keeps redeliveries out.
+"""
+import os
+import sys
+import tempfile
+from app.extensions import get_collection, mongo
+from app.models.webhook_event import WebhookEvent
+from app.webhook.importer import DeliveryImporter, prepare_line
+from benchmarks._common import mongomock_db, output_path, write_results
+from benchmarks.payloads import corpus_from_argv, write_deliveries
+
+DELIVERIES = 3000
+
+def _with_redeliveries(path):
+    """Append a copy of every tenth line, as a redelivered webhook would be recorded"""
+    with open(path) as handle:
+        lines = handle.readlines()
+    with open(path, 'a') as handle:
+        handle.writelines(lines[::10])
+    return len(lines[::10])
+
+def _run(path, workers, expected):
+    mongo.db = mongomock_db(f'import_bench_{workers}')
+    importer = DeliveryImporter(workers=workers, batch_size=1000)
+    summary = importer.run(path)
+    stored = get_collection(WebhookEvent.COLLECTION_NAME).count_documents({})
+    return {
+        'workers': workers,
+        'deliveries_per_sec': summary['lines_per_sec'],
+        'seconds': summary['seconds'],
+        'stored': stored,
+        'duplicates': summary['duplicates'],
+        'ignored': summary['ignored'],
+        'ok': stored == expected and summary['invalid'] == 0
+    }
+
+def main():
+    import logging
+    logging.disable(logging.WARNING)
+    payloads = corpus_from_argv()
+    directory = tempfile.mkdtemp(prefix='import-bench-')
+    path = write_deliveries(os.path.join(directory, 'deliveries.ndjson'), DELIVERIES, payloads)
+    # Tag pushes, pings and other pull request actions are ignored, not stored
+    with open(path, 'rb') as handle:
+        stored_shapes = {
+            index for index, line in zip(range(len(payloads)), handle)
+            if prepare_line(index, line).webhook_event is not None
+        }
+    expected = sum(1 for index in range(DELIVERIES) if index % len(payloads) in stored_shapes)
+    redelivered = _with_redeliveries(path)
+    file_bytes = os.path.getsize(path)
+    runs = [_run(path, workers, expected) for workers in sorted({0, 1, 2, os.cpu_count() or 1})]
+    os.unlink(path)
+    os.rmdir(directory)
+    write_results('import', {
+        'deliveries': DELIVERIES,
+        'redeliveries': redelivered,
+        'file_bytes': file_bytes,
+        'runs': runs
+    }, output_path())
+    if not all(run['ok'] for run in runs):
+        sys.exit('Import stored the wrong number of events')
+
+if __name__ == '__main__':
+    main()
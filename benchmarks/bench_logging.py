@@ -0,0 +1,157 @@
+# benchmarks/bench_logging.py
+"""
+Cost of logging on the webhook hot path
+
+    python -m benchmarks.bench_logging [--output results.jsonl]
+
+Compares, per delivery and measured in the calling thread, the old pattern
+(seven eagerly formatted f-string INFO lines written synchronously by a
+StreamHandler) with the current one (lazy %-style arguments, per-step lines
+at DEBUG, one sampled INFO line, JSON records written by the queue
+listener) at several sample rates. Then runs the receiver end to end
+(Flask test client, in-memory MongoDB) alternating request by request
+between a synchronous text handler and the queued JSON handler with
+sampling, and compares the medians. All output goes to os.devnull.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+from flask import Flask
+from app.extensions import mongo
+from app.log import SAMPLED, LogSetup, bind_delivery, reset_delivery, update_delivery
+from benchmarks._common import mongomock_db, output_path, write_results
+from benchmarks.payloads import encode, push_payload
+
+DELIVERIES = 20000
+RECEIVER_DELIVERIES = 2000
+SAMPLE_RATES = (1.0, 0.1, 0.01)
+SECRET = 'bench-secret'
+
+logger = logging.getLogger('benchmarks.bench_logging.receiver')
+
+def _old_delivery(delivery_id):
+    # What the receiver logged per stored push before: every step at INFO,
+    # each message built with an f-string whether or not it is emitted
+    event_type, repository, author, branch = 'push', 'octo/hello-world', 'octocat', 'main'
+    logger.info(f"Received webhook - Event: {event_type}, Delivery ID: {delivery_id}")
+    logger.info(f"Processing {event_type} event for repository: {repository}")
+    logger.info(f"Push event processed: {author} -> {branch}")
+    logger.info(f"Using GitHub commit timestamp: {'2024-01-01T00:00:00Z'}")
+    logger.info(f"Webhook event saved with ID: {delivery_id}")
+    logger.info(f"Event saved successfully with ID: {delivery_id}")
+    logger.info(f"Returning response for delivery: {delivery_id}")
+
+def _new_delivery(delivery_id):
+    # The same delivery as the receiver logs it now
+    event_type, repository, author, branch = 'push', 'octo/hello-world', 'octocat', 'main'
+    context = bind_delivery(delivery_id=delivery_id, event=event_type)
+    try:
+        logger.debug("Received webhook - Event: %s, Delivery ID: %s", event_type, delivery_id)
+        logger.debug("Processing %s event for repository: %s", event_type, repository)
+        update_delivery(repository=repository)
+        logger.debug("Push event processed: %s -> %s", author, branch)
+        logger.debug("Using GitHub commit timestamp: %s", '2024-01-01T00:00:00Z')
+        logger.debug("Webhook event saved with ID: %s", delivery_id)
+        logger.info("Webhook processed: %s %s by %s, event ID %s", event_type, 'PUSH', author, delivery_id,
+                    extra=SAMPLED)
+    finally:
+        reset_delivery(context)
+
+def _old_handler(stream):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return handler
+
+def _new_handler(stream, rate, log_format='json', use_queue=True):
+    setup = LogSetup()
+    holder = SimpleNamespace(config={'LOG_FORMAT': log_format, 'LOG_QUEUE': use_queue,
+                                     'LOG_SAMPLE_RATE': rate, 'LOG_LEVEL': 'INFO'})
+    setup.init_app(holder, stream=stream)
+    root = logging.getLogger()
+    root.removeHandler(setup.handler)
+    return setup.handler
+
+def _run(handler, func):
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    ids = [str(uuid.uuid4()) for _ in range(DELIVERIES)]
+    started = time.perf_counter()
+    for delivery_id in ids:
+        func(delivery_id)
+    caller = time.perf_counter() - started
+    # Include the time for the listener to write out what was queued
+    stop = getattr(handler, 'stop', None)
+    if stop is not None:
+        stop()
+    total = time.perf_counter() - started
+    return {
+        'us_per_delivery_caller': round(caller / DELIVERIES * 1e6, 2),
+        'us_per_delivery_total': round(total / DELIVERIES * 1e6, 2)
+    }
+
+def _micro(stream):
+    results = [dict(pattern='eager_fstring_sync_text', sample_rate=1.0, **_run(_old_handler(stream), _old_delivery))]
+    for rate in SAMPLE_RATES:
+        results.append(dict(pattern='lazy_sampled_sync_text', sample_rate=rate,
+                            **_run(_new_handler(stream, rate, 'text', False), _new_delivery)))
+        results.append(dict(pattern='lazy_sampled_queue_json', sample_rate=rate,
+                            **_run(_new_handler(stream, rate), _new_delivery)))
+    return results
+
+def _receiver(stream):
+    from app.webhook.routes import webhook
+    app = Flask(__name__)
+    app.config.update(GITHUB_WEBHOOK_SECRET=SECRET)
+    app.register_blueprint(webhook)
+    mongo.db = mongomock_db()
+    client = app.test_client()
+    body = encode(push_payload(3))
+    signature = 'sha256=' + hmac.new(SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+    handlers = {'sync_text': _old_handler(stream), 'queue_json_sampled': _new_handler(stream, 0.01)}
+    durations = {name: [] for name in handlers}
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    names = list(handlers)
+    for index in range(RECEIVER_DELIVERIES * 2):
+        # Alternate per request so drift lands on both settings equally
+        name = names[index % 2]
+        root.handlers = [handlers[name]]
+        headers = {
+            'X-GitHub-Event': 'push',
+            'X-GitHub-Delivery': str(uuid.uuid4()),
+            'X-Hub-Signature-256': signature,
+            'Content-Type': 'application/json'
+        }
+        started = time.perf_counter()
+        response = client.post('/webhook/receiver', data=body, headers=headers)
+        durations[name].append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_json()
+    handlers['queue_json_sampled'].stop()
+    baseline = statistics.median(durations['sync_text'])
+    current = statistics.median(durations['queue_json_sampled'])
+    return {
+        'deliveries': RECEIVER_DELIVERIES,
+        'median_request_us_sync_text': round(baseline * 1e6, 1),
+        'median_request_us_queue_json_sampled': round(current * 1e6, 1),
+        'saving_us': round((baseline - current) * 1e6, 1)
+    }
+
+def main():
+    with open(os.devnull, 'w') as stream:
+        results = {
+            'deliveries': DELIVERIES,
+            'micro': _micro(stream),
+            'receiver': _receiver(stream)
+        }
+    logging.getLogger().handlers = []
+    write_results('logging', results, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_metrics.py
+"""
+Cost of the /metrics instrumentation
+
+    python -m benchmarks.bench_metrics [--output results.jsonl]
+
+Measures Counter.inc() and Histogram.observe() from 1 and THREADS threads
+against a histogram guarded by one shared lock, then the receiver end to
+end (Flask test client, in-memory MongoDB), alternating metrics on and
+off request by request and comparing the medians.
+"""
+import bisect
+import hashlib
+import hmac
+import statistics
+import threading
+import time
+import uuid
+from flask import Flask
+from app.extensions import mongo
+from app.metrics import DEFAULT_BUCKETS, MetricsRegistry, metrics
+from benchmarks._common import mongomock_db, output_path, write_results
+from benchmarks.payloads import encode, push_payload
+
+OPERATIONS = 200000
+THREADS = 8
+DELIVERIES = 2000
+SECRET = 'bench-secret'
+
+class LockedHistogram:
+    """The straightforward alternative: one shared histogram behind a lock"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.cells = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            cells = self.cells.get(label_values)
+            if cells is None:
+                cells = self.cells[label_values] = [0] * (len(self.buckets) + 2)
+            cells[bisect.bisect_left(self.buckets, value)] += 1
+            cells[-1] += value
+
+def _per_op_ns(func, threads):
+    per_thread = OPERATIONS // threads
+
+    def worker():
+        for _ in range(per_thread):
+            func()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return round((time.perf_counter() - started) / (per_thread * threads) * 1e9, 1)
+
+def _micro():
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_total', 'bench', ('event', 'outcome'))
+    histogram = registry.histogram('bench_seconds', 'bench', ('event', 'stage'))
+    locked = LockedHistogram()
+    operations = {
+        'counter_inc': lambda: counter.inc('push', 'processed'),
+        'histogram_observe': lambda: histogram.observe(0.0012, 'push', 'insert'),
+        'locked_histogram_observe': lambda: locked.observe(0.0012, 'push', 'insert'),
+        'perf_counter_pair': lambda: time.perf_counter() - time.perf_counter()
+    }
+    results = []
+    for name, func in operations.items():
+        for threads in (1, THREADS):
+            results.append({'operation': name, 'threads': threads, 'ns_per_op': _per_op_ns(func, threads)})
+    registry.enabled = False
+    results.append({'operation': 'histogram_observe_disabled', 'threads': 1,
+                    'ns_per_op': _per_op_ns(lambda: histogram.observe(0.0012, 'push', 'insert'), 1)})
+    started = time.perf_counter()
+    registry.render()
+    results.append({'operation': 'render', 'threads': 1,
+                    'ns_per_op': round((time.perf_counter() - started) * 1e9, 1)})
+    return results
+
+def _receiver_app():
+    from app.webhook.routes import webhook
+    app = Flask(__name__)
+    app.config.update(GITHUB_WEBHOOK_SECRET=SECRET)
+    app.register_blueprint(webhook)
+    mongo.db = mongomock_db()
+    return app
+
+def _receiver():
+    app = _receiver_app()
+    client = app.test_client()
+    body = encode(push_payload(3))
+    signature = 'sha256=' + hmac.new(SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    durations = {True: [], False: []}
+    for index in range(DELIVERIES * 2):
+        # Alternate per request so drift (collection growth, GC, noisy
+        # neighbours) lands on both settings equally
+        enabled = metrics.enabled = index % 2 == 0
+        headers = {
+            'X-GitHub-Event': 'push',
+            'X-GitHub-Delivery': str(uuid.uuid4()),
+            'X-Hub-Signature-256': signature,
+            'Content-Type': 'application/json'
+        }
+        started = time.perf_counter()
+        response = client.post('/webhook/receiver', data=body, headers=headers)
+        durations[enabled].append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_json()
+    metrics.enabled = True
+    enabled = statistics.median(durations[True])
+    disabled = statistics.median(durations[False])
+    return {
+        'deliveries': DELIVERIES,
+        'median_request_us_enabled': round(enabled * 1e6, 1),
+        'median_request_us_disabled': round(disabled * 1e6, 1),
+        'overhead_us': round((enabled - disabled) * 1e6, 1),
+        'overhead_pct': round((enabled - disabled) / disabled * 100, 2)
+    }
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    write_results('metrics', {
+        'operations': OPERATIONS,
+        'micro': _micro(),
+        'receiver': _receiver()
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_micro.py
+"""
+Micro benchmarks for the per-delivery and per-event functions
+
+    python -m benchmarks.bench_micro [--corpus DIR] [--output results.jsonl]
+
+Times verify_github_signature() per body size (valid and forged
+signatures), the WebhookEvent.from_github_* factories on fully decoded
+payloads, and the read-side formatting (format_message(), serialize())
+on stored documents. Each operation is calibrated to run for about
+TARGET_SECONDS per repeat; the median and best of REPEATS are reported
+in nanoseconds per call.
+"""
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from app.models.webhook_event import WebhookEvent
+from app.webhook.processing import verify_github_signature
+from benchmarks._common import output_path, write_results
+from benchmarks.payloads import corpus_from_argv, encode, sign
+
+REPEATS = 5
+TARGET_SECONDS = 0.1
+SECRET = 'bench-secret'
+
+def _measure(func):
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= TARGET_SECONDS / 10:
+            break
+        loops *= 10
+    loops = max(1, int(loops * TARGET_SECONDS / elapsed))
+    samples = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+    return {
+        'loops': loops,
+        'ns_per_op': round(statistics.median(samples) * 1e9, 1),
+        'best_ns_per_op': round(min(samples) * 1e9, 1)
+    }
+
+def _signatures(payloads):
+    results = []
+    for name, event_type, payload in payloads:
+        body = encode(payload)
+        valid = sign(body, SECRET)
+        forged = 'sha256=' + '0' * 64
+        results.append(dict(operation='verify_github_signature', payload=name, bytes=len(body), valid=True,
+                            **_measure(lambda: verify_github_signature(body, valid, SECRET))))
+        results.append(dict(operation='verify_github_signature', payload=name, bytes=len(body), valid=False,
+                            **_measure(lambda: verify_github_signature(body, forged, SECRET))))
+    return results
+
+def _factory(event_type, payload):
+    """The factory the receiver would call for this payload, or None"""
+    if event_type == 'push' and payload.get('ref', '').startswith('refs/heads/'):
+        return 'from_github_push', WebhookEvent.from_github_push
+    if event_type == 'pull_request':
+        pull_request = payload.get('pull_request') or {}
+        if payload.get('action') == 'opened':
+            return 'from_github_pull_request', WebhookEvent.from_github_pull_request
+        if payload.get('action') == 'closed' and pull_request.get('merged'):
+            return 'from_github_merge', WebhookEvent.from_github_merge
+    return None
+
+def _factories(payloads):
+    results = []
+    for name, event_type, payload in payloads:
+        factory = _factory(event_type, payload)
+        if factory is None:
+            continue
+        operation, func = factory
+        results.append(dict(operation=operation, payload=name, **_measure(lambda: func(payload))))
+        if operation == 'from_github_push':
+            results.append(dict(operation='from_github_push_expanded', payload=name,
+                                **_measure(lambda: WebhookEvent.from_github_push(payload, expand_commits=True))))
+            event = func(payload)
+            results.append(dict(operation='to_dict', payload=name, **_measure(event.to_dict)))
+    return results
+
+def _stored_documents():
+    """Stored event shapes: current, with a string timestamp, and pre-summary"""
+    now = datetime.now(timezone.utc)
+    current = WebhookEvent(
+        request_id='a1b2c3d4e5f6', author='alice', action='PUSH', to_branch='main',
+        repository_name='monorepo', repository_url='https://github.com/octo-org/monorepo',
+        commit_message='Change 1: update module 1', timestamp=now - timedelta(minutes=5)
+    ).to_dict()
+    current['_id'] = ObjectId()
+    string_timestamp = dict(current, timestamp=(now - timedelta(hours=3)).isoformat())
+    legacy = {key: value for key, value in current.items() if key != 'summary'}
+    merge = WebhookEvent(
+        request_id='900000001', author='carol', action='MERGE', from_branch='feature-1', to_branch='main',
+        repository_name='monorepo', pull_request_title='Feature 1', timestamp=now - timedelta(days=2)
+    ).to_dict()
+    merge['_id'] = ObjectId()
+    return [('push', current), ('push_string_timestamp', string_timestamp),
+            ('push_without_summary', legacy), ('merge', merge)]
+
+def _formatting():
+    results = []
+    for name, document in _stored_documents():
+        results.append(dict(operation='format_message', document=name,
+                            **_measure(lambda: WebhookEvent.format_message(document))))
+        for version in (1, 2):
+            results.append(dict(operation=f'serialize_v{version}', document=name,
+                                **_measure(lambda: WebhookEvent.serialize(document, version=version))))
+    return results
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    payloads = corpus_from_argv()
+    write_results('micro', {
+        'repeats': REPEATS,
+        'signatures': _signatures(payloads),
+        'factories': _factories(payloads),
+        'formatting': _formatting()
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_offload.py
+"""
+Throughput of inline versus process-pool payload handling
+
+    python -m benchmarks.bench_offload [--output results.jsonl]
+
+THREADS request threads (a gthread worker) verify, parse and build a
+stream of signed deliveries drawn from three size distributions: all
+small, mostly small with some multi-megabyte pushes, and all large. Each
+distribution runs inline and with the offload pool, for the stdlib parser
+and the default one. The p99 latency of small deliveries shows how much
+large ones starve them.
+"""
+import hashlib
+import hmac
+import os
+import random
+import threading
+import time
+from flask import Flask
+from app.models.push_commit import commit_store
+from app.webhook.offload import payload_offloader, prepare_delivery
+from app.webhook.parsing import payload_parser
+from benchmarks._common import latency_summary, output_path, write_results
+from benchmarks.payloads import encode, push_payload
+
+THREADS = 8
+DELIVERIES = 200
+WORKERS = 4
+SECRET = 'bench-secret'
+LARGE_COMMITS = 2000
+
+DISTRIBUTIONS = {
+    'small': 0.0,
+    'mixed_5pct_large': 0.05,
+    'large': 1.0
+}
+
+def _sign(body):
+    return 'sha256=' + hmac.new(SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+def _deliveries(large_fraction, small, large):
+    rng = random.Random(42)
+    return [large if rng.random() < large_fraction else small for _ in range(DELIVERIES)]
+
+def _run(deliveries, offload):
+    latencies = {'small': [], 'large': []}
+    lock = threading.Lock()
+    position = iter(range(len(deliveries)))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                return
+            body, signature, size = deliveries[index]
+            started = time.perf_counter()
+            if offload and payload_offloader.accepts('push', body):
+                result = payload_offloader.prepare('push', body, str(index), signature, SECRET)
+            else:
+                result = prepare_delivery('push', body, str(index), signature, SECRET)
+            assert result.verified and result.webhook_event is not None
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[size].append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'deliveries_per_sec': round(len(deliveries) / elapsed, 1),
+        'small_latency': latency_summary(latencies['small']),
+        'large_latency': latency_summary(latencies['large'])
+    }
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+
+    small_body = encode(push_payload(3))
+    large_body = encode(push_payload(LARGE_COMMITS))
+    small = (small_body, _sign(small_body), 'small')
+    large = (large_body, _sign(large_body), 'large')
+
+    default_backend = payload_parser.backend
+    results = []
+    for backend in sorted({'json', default_backend}):
+        for expand in (False, True):
+            app = Flask(__name__)
+            app.config.update(
+                OFFLOAD_ENABLED=True,
+                OFFLOAD_THRESHOLD_BYTES=256 * 1024,
+                OFFLOAD_WORKERS=WORKERS,
+                PUSH_EXPANSION_ENABLED=expand
+            )
+            payload_parser.backend = backend
+            commit_store.init_app(app)
+            payload_offloader.init_app(app)
+            # Start the pool processes outside the timed runs
+            payload_offloader.prepare('push', large_body, 'warmup', large[1], SECRET)
+            for name, fraction in DISTRIBUTIONS.items():
+                deliveries = _deliveries(fraction, small, large)
+                for offload in (False, True):
+                    result = {
+                        'parser': backend,
+                        'push_expansion': expand,
+                        'distribution': name,
+                        'mode': 'offload' if offload else 'inline'
+                    }
+                    result.update(_run(deliveries, offload))
+                    results.append(result)
+            payload_offloader.shutdown()
+
+    write_results('offload', {
+        'cpus': os.cpu_count(),
+        'threads': THREADS,
+        'pool_workers': WORKERS,
+        'deliveries': DELIVERIES,
+        'small_bytes': len(small_body),
+        'large_bytes': len(large_body),
+        'runs': results
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_parsing.py
+"""
+Compare full json.loads decoding against field extraction per parser backend
+
+    python -m benchmarks.bench_parsing [--corpus DIR] [--output results.jsonl]
+
+For every payload the baseline is what the receiver used to do: json.loads
+of the whole body followed by the WebhookEvent factory. Each available
+backend then runs parse_payload() + build_webhook_event(). Ignored
+deliveries (tag pushes, unhandled pull request actions) are also timed
+through quick_ignore(), which answers without parsing at all.
+"""
+import json
+from app.webhook import parsing
+from app.webhook.parsing import payload_parser
+from app.webhook.handlers import handler_registry
+from app.webhook.processing import build_webhook_event, parse_payload, quick_ignore
+from benchmarks._common import latency_summary, output_path, timeit, write_results
+from benchmarks.payloads import corpus_from_argv, encode
+
+ITERATIONS = 300
+
+def _backends():
+    backends = ['json']
+    if parsing.orjson is not None:
+        backends.append('orjson')
+    if parsing.simdjson is not None:
+        backends.append('simdjson')
+    return backends
+
+def _run_payload(name, event_type, body):
+    result = {'payload': name, 'event': event_type, 'bytes': len(body)}
+
+    def baseline():
+        build_webhook_event(event_type, json.loads(body))
+
+    samples = timeit(baseline, ITERATIONS)
+    result['json_full'] = latency_summary(samples)
+    baseline_p50 = result['json_full']['p50_ms']
+
+    for backend in _backends():
+        payload_parser.backend = backend
+
+        def extract():
+            build_webhook_event(event_type, parse_payload(event_type, body))
+
+        summary = latency_summary(timeit(extract, ITERATIONS))
+        summary['speedup_p50'] = round(baseline_p50 / summary['p50_ms'], 2) if summary['p50_ms'] else None
+        result[f'{backend}_extract'] = summary
+
+    if quick_ignore(event_type, body) is not None:
+        summary = latency_summary(timeit(lambda: quick_ignore(event_type, body), ITERATIONS))
+        summary['speedup_p50'] = round(baseline_p50 / summary['p50_ms'], 2) if summary['p50_ms'] else None
+        result['quick_ignore'] = summary
+    return result
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+
+    payloads = corpus_from_argv()
+    default_backend = payload_parser.backend
+    results = []
+    for name, event_type, payload in payloads:
+        if not handler_registry.handles(event_type):
+            continue
+        results.append(_run_payload(name, event_type, encode(payload)))
+    payload_parser.backend = default_backend
+
+    write_results('parsing', {
+        'iterations': ITERATIONS,
+        'backends': _backends(),
+        'runs': results
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
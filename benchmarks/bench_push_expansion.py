@@ -0,0 +1,59 @@
+# benchmarks/bench_push_expansion.py
+"""
+Cost of storing every commit of a large push
+
+    python -m benchmarks.bench_push_expansion [--output results.jsonl]
+
+Compares a naive expansion (one insert_one per commit) with the
+PushCommit records written by one insert_many, for pushes of COMMITS
+commits against an in-memory collection where every write call takes
+ROUND_TRIP seconds. Timings cover parsing the body, building the records
+and writing them.
+"""
+from flask import Flask
+from app.extensions import mongo
+from app.models.push_commit import commit_store
+from app.webhook.processing import build_webhook_event, parse_payload
+from benchmarks._common import LatencyDatabase, latency_summary, mongomock_db, output_path, timeit, write_results
+from benchmarks.payloads import encode, push_payload
+
+COMMITS = 200
+ITERATIONS = 20
+ROUND_TRIP = 0.002
+
+def _naive(body):
+    event, _ = build_webhook_event('push', parse_payload('push', body))
+    event.commits, commits = None, event.commits
+    push_id = event.save()
+    collection = mongo.db[commit_store.COLLECTION_NAME]
+    for commit in commits:
+        collection.insert_one(commit.to_dict(push_id))
+
+def _expanded(body):
+    event, _ = build_webhook_event('push', parse_payload('push', body))
+    event.save()
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    app = Flask(__name__)
+    app.config.update(PUSH_EXPANSION_ENABLED=True)
+    commit_store.init_app(app)
+    body = encode(push_payload(COMMITS))
+
+    results = []
+    for label, func in (('insert_one_per_commit', _naive), ('bulk_insert', _expanded)):
+        mongo.db = LatencyDatabase(mongomock_db(), ROUND_TRIP)
+        result = {'mode': label, 'round_trips': COMMITS + 1 if func is _naive else 2}
+        result.update(latency_summary(timeit(lambda: func(body), ITERATIONS)))
+        results.append(result)
+
+    write_results('push_expansion', {
+        'commits': COMMITS,
+        'payload_bytes': len(body),
+        'round_trip_ms': ROUND_TRIP * 1000,
+        'runs': results
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
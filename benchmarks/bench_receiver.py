@@ -0,0 +1,133 @@
+# benchmarks/bench_receiver.py
+"""
+In-process load test of the full Flask app
+
+    python -m benchmarks.bench_receiver [--mongo-uri URI] [--threads 8] [--requests 4000]
+                                        [--corpus DIR] [--output results.jsonl]
+
+Builds the app with create_app() (every component the production app
+starts) against an in-memory MongoDB, or a real mongod with --mongo-uri
+(use a throwaway database: events are added, nothing is removed). Then,
+from THREADS threads with one test client each:
+
+1. sends REQUESTS signed deliveries, cycling through the corpus with a
+   fresh X-GitHub-Delivery id each time
+2. redelivers a sample of those ids (the duplicate path)
+3. reads the dashboard endpoints
+
+and reports throughput plus latency and status codes per payload and per
+endpoint. No HTTP server is involved; benchmarks.loadgen covers that.
+"""
+import itertools
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from benchmarks._common import latency_summary, output_path, use_mongomock, write_results
+from benchmarks.loadgen import _option
+from benchmarks.payloads import corpus_from_argv, delivery_headers, signed_corpus
+
+SECRET = 'bench-secret'
+MOCK_URI = 'mongodb://localhost:27017/webhook_bench'
+READS = ('/api/events?v=2&limit=50', '/api/events?limit=50', '/api/events/latest', '/webhook/status')
+
+def _create_app(mongo_uri):
+    from app import create_app
+    from config import ProductionConfig, config
+
+    overrides = {
+        'MONGO_URI': mongo_uri or MOCK_URI,
+        'GITHUB_WEBHOOK_SECRET': SECRET,
+        'LOG_LEVEL': 'WARNING',
+        'LOG_QUEUE': False,
+        # One process, so there is nobody to sync the recent cache with
+        'RECENT_CACHE_SYNC': 'none'
+    }
+    if not mongo_uri:
+        use_mongomock()
+        # mongomock cannot apply the rollups' bulk upserts
+        overrides['STATS_ENABLED'] = False
+    config['bench'] = type('BenchConfig', (ProductionConfig,), overrides)
+    return create_app('bench')
+
+def _drive(app, requests, threads):
+    """Send (label, method, path, body, headers) tuples from threads test clients"""
+    pending = iter(requests)
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+
+    def worker():
+        client = app.test_client()
+        local_latencies = defaultdict(list)
+        local_statuses = defaultdict(Counter)
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                break
+            label, method, path, body, headers = request
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=body, headers=headers)
+            local_latencies[label].append(time.perf_counter() - started)
+            local_statuses[label][response.status_code] += 1
+        with lock:
+            for label, samples in local_latencies.items():
+                latencies[label].extend(samples)
+                statuses[label].update(local_statuses[label])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in latencies.values())
+    per_label = []
+    for label in sorted(latencies):
+        summary = {'name': label}
+        summary.update(latency_summary(latencies[label]))
+        summary['statuses'] = {str(status): count for status, count in sorted(statuses[label].items())}
+        per_label.append(summary)
+    return {
+        'requests': total,
+        'requests_per_sec': round(total / elapsed, 1),
+        'latency': latency_summary([sample for samples in latencies.values() for sample in samples]),
+        'by_name': per_label
+    }
+
+def main():
+    import logging
+    logging.disable(logging.INFO)
+    mongo_uri = _option('--mongo-uri')
+    threads = _option('--threads', 8, int)
+    count = _option('--requests', 4000, int)
+
+    app = _create_app(mongo_uri)
+    corpus = signed_corpus(corpus_from_argv(), SECRET)
+
+    deliveries = []
+    for name, event_type, body, signature in itertools.islice(itertools.cycle(corpus), count):
+        headers = delivery_headers(event_type, body, delivery_id=str(uuid.uuid4()))
+        headers['X-Hub-Signature-256'] = signature
+        deliveries.append((name, 'POST', '/webhook/receiver', body, headers))
+    redeliveries = [
+        (f'{name}_redelivery', method, path, body, headers)
+        for name, method, path, body, headers in deliveries[:max(1, count // 10)]
+    ]
+    reads = [(path, 'GET', path, None, {}) for path in itertools.islice(itertools.cycle(READS), count // 2)]
+
+    results = {
+        'database': 'mongod' if mongo_uri else 'mongomock',
+        'threads': threads,
+        'payloads': [name for name, _, _, _ in corpus],
+        'deliveries': _drive(app, deliveries, threads),
+        'redeliveries': _drive(app, redeliveries, threads),
+        'reads': _drive(app, reads, threads)
+    }
+    write_results('receiver', results, output_path())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_retention.py
+"""
+Archive moves and listings across archive partitions
+
+    python -m benchmarks.bench_retention [--output results.jsonl]
+
+Seeds EVENTS events stored over the last year (each at its timestamp),
+archives everything stored more than RETENTION_DAYS ago into monthly partitions and reports the move rate.
+Then it times the first /api/events page (live only), a page that
+straddles the live/archive boundary and a page deep in the archive, and
+walks every page to check that no event is lost or repeated.
+"""
+import random
+import struct
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from bson import ObjectId
+from app.extensions import get_collection, mongo
+from app.models.webhook_event import WebhookEvent, event_retention, recent_events_cache
+from benchmarks._common import latency_summary, mongomock_db, output_path, timeit, write_results
+
+EVENTS = 2000
+RETENTION_DAYS = 30
+PAGE = 50
+
+def _seed():
+    now = datetime.now(timezone.utc)
+    rng = random.Random(7)
+    documents = []
+    for index in range(EVENTS):
+        timestamp = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        document = WebhookEvent(
+            'bench', rng.choice(('alice', 'bob', 'carol')), rng.choice(('PUSH', 'PULL_REQUEST', 'MERGE')),
+            to_branch='main', repository_name='bench', timestamp=timestamp, delivery_id=f'retention-{index}'
+        ).to_dict()
+        # Stored when it happened, as retention goes by the time of storage
+        document['_id'] = ObjectId(struct.pack('>I', int(timestamp.timestamp())) + rng.randbytes(8))
+        document['received_at'] = timestamp
+        documents.append(document)
+    get_collection(WebhookEvent.COLLECTION_NAME).insert_many(documents)
+    # In listing order: newest first, ties broken by _id
+    return sorted(documents, key=lambda document: (document['timestamp'], document['_id']), reverse=True)
+
+def _walk():
+    """Every event, page by page, newest first"""
+    seen = []
+    before = None
+    while True:
+        events, has_more = WebhookEvent.find_events(limit=PAGE, before=before)
+        seen += events
+        if not has_more:
+            return seen
+        before = WebhookEvent.encode_cursor(events[-1])
+
+def main():
+    import logging
+    logging.disable(logging.WARNING)
+    database = mongomock_db('retention_bench')
+    # mongomock does not take storage engine options
+    create_collection = database.create_collection
+    database.create_collection = lambda name, **options: create_collection(name)
+    mongo.db = database
+    WebhookEvent.ensure_indexes()
+    recent_events_cache.enabled = False
+    event_retention.init_app(SimpleNamespace(config={
+        'RETENTION_MODE': 'archive', 'RETENTION_DAYS': RETENTION_DAYS, 'RETENTION_INTERVAL': 0
+    }))
+    documents = _seed()
+
+    started = time.perf_counter()
+    moved = event_retention.run()
+    elapsed = time.perf_counter() - started
+    live = get_collection(WebhookEvent.COLLECTION_NAME).count_documents({})
+
+    boundary = WebhookEvent.encode_cursor(documents[live - PAGE // 2])
+    deep = WebhookEvent.encode_cursor(documents[EVENTS * 3 // 4])
+    pages = {
+        'first_page': latency_summary(timeit(lambda: WebhookEvent.find_events(limit=PAGE), 20)),
+        'boundary_page': latency_summary(timeit(lambda: WebhookEvent.find_events(limit=PAGE, before=boundary), 20)),
+        'archive_page': latency_summary(timeit(lambda: WebhookEvent.find_events(limit=PAGE, before=deep), 20))
+    }
+    walked = _walk()
+    ok = [event['_id'] for event in walked] == [document['_id'] for document in documents]
+
+    write_results('retention', {
+        'events': EVENTS,
+        'live': live,
+        'archived': moved,
+        'partitions': len(event_retention.partitions(refresh=True)),
+        'archive_events_per_sec': round(moved / elapsed, 1) if elapsed else None,
+        'pages': pages,
+        'walk_complete': ok
+    }, output_path())
+    if not ok:
+        sys.exit('Paging across the archive lost or repeated events')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_servers.py
+"""
+Compare the Flask app under gunicorn with the ASGI app under uvicorn
+
+    MONGO_URI=mongodb://localhost:27017/webhook_bench python -m benchmarks.bench_servers [--output results.jsonl]
+
+Needs a real mongod plus gunicorn and uvicorn. Each server runs WORKERS
+worker processes (gunicorn with the gthread worker and THREADS threads).
+For every connection count the load generator sends REQUESTS signed push
+deliveries and then REQUESTS event listings, while the resident memory of
+the server's process tree is sampled. Memory per connection is the peak
+above the idle footprint divided by the number of connections.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from benchmarks._common import output_path, write_results
+from benchmarks.loadgen import run_load
+
+WORKERS = 2
+THREADS = 32
+REQUESTS = 2000
+CONNECTIONS = [1, 16, 64, 256]
+SECRET = 'bench-secret'
+
+SERVERS = {
+    'gunicorn_gthread': ['gunicorn', '--workers', str(WORKERS), '--worker-class', 'gthread',
+                         '--threads', str(THREADS), '--bind', '127.0.0.1:{port}', 'wsgi:app'],
+    'uvicorn_asgi': ['uvicorn', '--workers', str(WORKERS), '--no-access-log',
+                     '--host', '127.0.0.1', '--port', '{port}', 'asgi:app']
+}
+
+def _tree(pid):
+    """pid and every descendant pid"""
+    pids = [pid]
+    for current in pids:
+        for task in os.listdir(f'/proc/{current}/task'):
+            try:
+                with open(f'/proc/{current}/task/{task}/children') as handle:
+                    pids.extend(int(child) for child in handle.read().split())
+            except OSError:
+                pass
+    return pids
+
+def tree_rss(pid):
+    """Resident memory of a process tree in bytes"""
+    total = 0
+    for member in _tree(pid):
+        try:
+            with open(f'/proc/{member}/status') as handle:
+                for line in handle:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+class RssSampler(threading.Thread):
+    """Track the peak resident memory of a process tree"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, tree_rss(self.pid))
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.peak
+
+def _wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{url}/health', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not become ready')
+
+def _bench_server(name, command, port):
+    env = dict(os.environ, FLASK_CONFIG='production', GITHUB_WEBHOOK_SECRET=SECRET)
+    url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen([part.format(port=port) for part in command], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(url)
+        # Warm every worker before taking the idle footprint
+        asyncio.run(run_load(url, 'events', connections=WORKERS * 2, requests=200))
+        idle_rss = tree_rss(process.pid)
+        runs = []
+        for connections in CONNECTIONS:
+            for target in ('receiver', 'events'):
+                sampler = RssSampler(process.pid)
+                sampler.start()
+                result = asyncio.run(run_load(url, target, connections, REQUESTS, SECRET))
+                peak_rss = sampler.stop()
+                result.update({
+                    'server': name,
+                    'peak_rss_mb': round(peak_rss / 2 ** 20, 1),
+                    'rss_per_connection_kb': round(max(0, peak_rss - idle_rss) / connections / 1024, 1)
+                })
+                runs.append(result)
+        return {'server': name, 'idle_rss_mb': round(idle_rss / 2 ** 20, 1), 'runs': runs}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def main():
+    if not os.environ.get('MONGO_URI'):
+        sys.exit('Set MONGO_URI to a MongoDB database the benchmark may write to')
+    servers = []
+    for offset, (name, command) in enumerate(SERVERS.items()):
+        servers.append(_bench_server(name, command, 8701 + offset))
+    write_results('servers', {
+        'cpus': os.cpu_count(),
+        'workers': WORKERS,
+        'gthread_threads': THREADS,
+        'requests': REQUESTS,
+        'servers': servers
+    }, output_path())
+
+if __name__ == '__main__':
+    main()
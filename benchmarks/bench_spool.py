@@ -0,0 +1,186 @@
+# benchmarks/bench_spool.py
+"""
+Delivery spool throughput and crash recovery
+
+    python -m benchmarks.bench_spool [--dir DIR] [--output results.jsonl]
+
+Append: APPENDS spooled deliveries from 1, 8 and 32 threads with fsync on
+and off, reporting appends/sec, latency and how many appends each fsync
+covered.
+
+Crash recovery: a child process appends deliveries and prints each id
+once append() returns (the point the receiver answers 202), and is
+killed with SIGKILL after CRASH_AFTER of them. A torn record, as left by a crash during a
+write, is added to the end of its segment and one acknowledged record in
+the middle is corrupted. The segments are then replayed into an
+in-memory MongoDB twice: every acknowledged delivery except the
+corrupted one must be stored, and only once.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from flask import Flask
+from app.extensions import get_collection, mongo
+from app.models.webhook_event import WebhookEvent
+from app.webhook.spool import HEADER, DeliverySpool, encode_record, read_segment
+from benchmarks._common import latency_summary, mongomock_db, output_path, write_results
+from benchmarks.loadgen import _option
+from benchmarks.payloads import encode, push_payload
+
+APPENDS = 4000
+# The child is killed once this many appends were acknowledged
+CRASH_AFTER = 500
+
+def _spool(directory, fsync=True):
+    spool = DeliverySpool()
+    spool.init_app(SimpleNamespace(config={'SPOOL_ENABLED': True, 'SPOOL_DIR': directory, 'SPOOL_FSYNC': fsync}))
+    # Only appends are measured here
+    spool._running = False
+    return spool
+
+def _append_run(directory, threads, fsync, body):
+    spool = _spool(directory, fsync)
+    per_thread = APPENDS // threads
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        local = []
+        for index in range(offset, offset + per_thread):
+            started = time.perf_counter()
+            spool.append('push', f'bench-{index}', body)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stats = spool.stats()
+    result = {
+        'threads': threads,
+        'fsync': fsync,
+        'appends_per_sec': round(len(latencies) / elapsed, 1),
+        'appends_per_fsync': round(stats['spooled'] / stats['fsyncs'], 1) if stats['fsyncs'] else None
+    }
+    result.update(latency_summary(latencies))
+    with spool._condition:
+        spool._seal()
+    for path in spool.segments():
+        os.unlink(path)
+    return result
+
+def _crash_child(directory):
+    """Append until killed, printing each acknowledged delivery id"""
+    spool = _spool(directory)
+    body = encode(push_payload(1))
+    index = 0
+    while True:
+        delivery_id = f'crash-{index}'
+        spool.append('push', delivery_id, body)
+        print(delivery_id, flush=True)
+        index += 1
+
+def _crash_recovery(directory):
+    child = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_spool', '--crash-child', directory],
+        stdout=subprocess.PIPE, text=True
+    )
+    acknowledged = []
+    while len(acknowledged) < CRASH_AFTER:
+        acknowledged.append(child.stdout.readline().strip())
+    child.send_signal(signal.SIGKILL)
+    # Appends acknowledged before the kill landed are still in the pipe
+    acknowledged += child.communicate()[0].split()
+
+    segments = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    last = segments[-1]
+    # What a crash in the middle of write() leaves behind
+    with open(last, 'ab') as handle:
+        handle.write(encode_record('push', 'torn', encode(push_payload(1)))[:HEADER.size + 40])
+    # Flip a byte inside an acknowledged record from the middle of the log
+    with open(last, 'rb') as handle:
+        data = handle.read()
+    records, _ = read_segment(data)
+    middle = len(records) // 2
+    offset = sum(len(encode_record(*record)) for record in records[:middle])
+    corrupted_id = records[middle][1]
+    with open(last, 'r+b') as handle:
+        handle.seek(offset + HEADER.size + 10)
+        byte = handle.read(1)
+        handle.seek(offset + HEADER.size + 10)
+        handle.write(bytes([byte[0] ^ 0xFF]))
+
+    app = Flask(__name__)
+    mongo.db = mongomock_db('spool_recovery')
+    WebhookEvent.ensure_indexes()
+    backup = directory + '-copy'
+    shutil.copytree(directory, backup)
+    spool = _spool(directory)
+    spool.app = app
+    started = time.perf_counter()
+    drained = spool.replay()
+    elapsed = time.perf_counter() - started
+    collection = get_collection(WebhookEvent.COLLECTION_NAME)
+    stored = {document['delivery_id'] for document in collection.find({}, {'delivery_id': 1})}
+
+    # Replaying the same segments again must not store anything twice
+    for name in os.listdir(backup):
+        shutil.move(os.path.join(backup, name), os.path.join(directory, name))
+    spool.replay()
+    stored_twice = collection.count_documents({})
+
+    expected = set(acknowledged) - {corrupted_id}
+    stats = spool.stats()
+    return {
+        'acknowledged': len(acknowledged),
+        'stored': len(stored),
+        'missing_acknowledged': len(expected - stored),
+        'corrupted_record_dropped': corrupted_id not in stored,
+        'corrupt_bytes_skipped': stats['corrupt_bytes'],
+        'drained': drained,
+        'replay_seconds': round(elapsed, 3),
+        'second_replay_duplicates': stats['replay_duplicates'],
+        # Appends the kill cut off before their acknowledgement may be stored too
+        'ok': drained and not (expected - stored) and corrupted_id not in stored and len(stored) == stored_twice
+    }
+
+def main():
+    import logging
+    logging.disable(logging.WARNING)
+    if '--crash-child' in sys.argv:
+        _crash_child(sys.argv[sys.argv.index('--crash-child') + 1])
+        return
+    base = _option('--dir') or tempfile.mkdtemp(prefix='spool-bench-')
+    body = encode(push_payload(3))
+    appends = []
+    for fsync in (True, False):
+        for threads in (1, 8, 32):
+            directory = os.path.join(base, f'append-{threads}-{fsync}')
+            os.makedirs(directory, exist_ok=True)
+            appends.append(_append_run(directory, threads, fsync, body))
+    crash_directory = os.path.join(base, 'crash')
+    os.makedirs(crash_directory, exist_ok=True)
+    recovery = _crash_recovery(crash_directory)
+    shutil.rmtree(base, ignore_errors=True)
+    write_results('spool', {
+        'appends': APPENDS,
+        'body_bytes': len(body),
+        'append': appends,
+        'crash_recovery': recovery
+    }, output_path())
+    if not recovery['ok']:
+        sys.exit('Crash recovery check failed')
+
+if __name__ == '__main__':
+    main()
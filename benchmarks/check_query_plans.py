@@ -0,0 +1,79 @@
+# benchmarks/check_query_plans.py
+"""
+Check that the app's read queries are served by indexes
+
+    MONGO_URI=mongodb://localhost:27017/webhook_plans python -m benchmarks.check_query_plans
+
+Needs a real mongod (mongomock has no query planner). Seeds the database
+named in MONGO_URI, creates the app indexes and fails when a winning plan
+contains a collection scan or a blocking in-memory sort.
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pymongo import MongoClient
+from app.extensions import mongo
+from app.models.webhook_event import WebhookEvent
+from benchmarks._common import output_path, write_results
+
+SEED_EVENTS = 5000
+
+def _stages(plan):
+    """Yield every stage name in an explain plan tree"""
+    yield plan.get('stage')
+    for child in ('inputStage', 'queryPlan'):
+        if child in plan:
+            yield from _stages(plan[child])
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+def _seed(collection):
+    collection.delete_many({})
+    now = datetime.now(timezone.utc)
+    collection.insert_many([{
+        'request_id': f'{index:012x}',
+        'author': f'user{index % 50}',
+        'action': ('PUSH', 'PULL_REQUEST', 'MERGE')[index % 3],
+        'to_branch': 'main',
+        'repository_name': f'repo{index % 20}',
+        'timestamp': now - timedelta(minutes=index),
+        'delivery_id': f'delivery-{index}'
+    } for index in range(SEED_EVENTS)])
+
+def main():
+    uri = os.environ.get('MONGO_URI')
+    if not uri:
+        sys.exit('Set MONGO_URI to a local mongod database to check query plans')
+    client = MongoClient(uri)
+    mongo.db = client.get_default_database()
+    collection = mongo.db[WebhookEvent.COLLECTION_NAME]
+    _seed(collection)
+    WebhookEvent.ensure_indexes()
+
+    sort = [('timestamp', -1), ('_id', -1)]
+    queries = {
+        'recent_events': ({}, sort),
+        'by_repository': ({'repository_name': 'repo3'}, sort),
+        'by_author': ({'author': 'user7'}, sort),
+        'by_action': ({'action': 'MERGE'}, sort),
+        'by_delivery_id': ({'delivery_id': 'delivery-42'}, None)
+    }
+
+    results = {}
+    failed = False
+    for name, (query, query_sort) in queries.items():
+        cursor = collection.find(query, WebhookEvent.LIST_PROJECTION).limit(50)
+        if query_sort:
+            cursor = cursor.sort(query_sort)
+        plan = cursor.explain()['queryPlanner']['winningPlan']
+        stages = [stage for stage in _stages(plan) if stage]
+        ok = 'COLLSCAN' not in stages and 'SORT' not in stages
+        failed = failed or not ok
+        results[name] = {'stages': stages, 'ok': ok}
+
+    write_results('query_plans', results, output_path())
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
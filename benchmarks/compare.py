@@ -0,0 +1,103 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark result files and flag regressions
+
+    python -m benchmarks.compare BASELINE.jsonl CURRENT.jsonl [--threshold 10]
+
+Takes the last record of each benchmark in both files, matches the
+timings and throughputs inside them by path, and prints every metric that
+moved by more than THRESHOLD percent. Latencies (*_ms, *_us,
+*ns_per_op) are better when lower, throughputs (*per_sec*) and speedups
+when higher; counts, sizes and maxima are ignored. Exits with status 1 when
+anything regressed, so it can gate CI.
+"""
+import json
+import sys
+from benchmarks.loadgen import _option
+
+LOWER_IS_BETTER = ('_ms', '_us', 'ns_per_op')
+# Single worst samples are too noisy to compare between runs
+IGNORED = ('max_ms',)
+
+def _direction(key):
+    if key in IGNORED:
+        return 0
+    if 'per_sec' in key or key.startswith('speedup'):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def _label(item):
+    """Stable name for a list entry from its non-numeric fields"""
+    parts = [f'{key}={value}' for key, value in item.items()
+             if isinstance(value, (str, bool)) or value is None]
+    return ','.join(parts)
+
+def flatten(value, prefix=''):
+    """{path: number} for every timing or throughput in a results tree"""
+    metrics = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            path = f'{prefix}.{key}' if prefix else key
+            if isinstance(child, (int, float)) and not isinstance(child, bool):
+                if _direction(key):
+                    metrics[path] = child
+            else:
+                metrics.update(flatten(child, path))
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            name = _label(child) if isinstance(child, dict) else ''
+            metrics.update(flatten(child, f'{prefix}[{name or index}]'))
+    return metrics
+
+def load(path):
+    """Last record per benchmark name in a results file"""
+    records = {}
+    with open(path) as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                records[record['benchmark']] = record
+    return records
+
+def compare(baseline, current, threshold):
+    """(benchmark, metric, before, after, change %, regressed) for changes over threshold"""
+    changes = []
+    for name in sorted(set(baseline) & set(current)):
+        before = flatten(baseline[name]['results'])
+        after = flatten(current[name]['results'])
+        for path in sorted(set(before) & set(after)):
+            old, new = before[path], after[path]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            if abs(change) < threshold:
+                continue
+            direction = _direction(path.rsplit('.', 1)[-1])
+            changes.append((name, path, old, new, round(change, 1), change * direction < 0))
+    return changes
+
+def main():
+    arguments = []
+    values = iter(sys.argv[1:])
+    for argument in values:
+        if argument.startswith('--'):
+            next(values, None)
+        else:
+            arguments.append(argument)
+    if len(arguments) < 2:
+        sys.exit('usage: python -m benchmarks.compare BASELINE.jsonl CURRENT.jsonl [--threshold 10]')
+    threshold = _option('--threshold', 10.0, float)
+    baseline, current = load(arguments[0]), load(arguments[1])
+    changes = compare(baseline, current, threshold)
+    for name, path, old, new, change, regressed in changes:
+        marker = 'REGRESSION' if regressed else 'improved'
+        print(f'{marker:10} {name} {path}: {old} -> {new} ({change:+}%)')
+    regressions = sum(1 for change in changes if change[-1])
+    print(f'{regressions} regressions, {len(changes) - regressions} improvements beyond {threshold}%')
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
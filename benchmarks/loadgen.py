@@ -0,0 +1,134 @@
+# benchmarks/loadgen.py
+"""
+HTTP load generator for a running receiver
+
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 [--target receiver|events]
+                                 [--connections 50] [--requests 5000] [--secret SECRET]
+
+Holds CONNECTIONS keep-alive HTTP/1.1 connections open and sends REQUESTS
+requests across them: signed push deliveries to /webhook/receiver, each
+with a fresh delivery id, or GET /api/events?v=2. Reports requests/sec,
+latency percentiles and status codes.
+"""
+import asyncio
+import hashlib
+import hmac
+import sys
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+from benchmarks._common import latency_summary, output_path, write_results
+from benchmarks.payloads import encode, push_payload
+
+def _receiver_request(host, body, secret):
+    headers = [
+        'POST /webhook/receiver HTTP/1.1',
+        f'Host: {host}',
+        'Content-Type: application/json',
+        'X-GitHub-Event: push',
+        f'X-GitHub-Delivery: {uuid.uuid4()}',
+        f'Content-Length: {len(body)}'
+    ]
+    if secret:
+        signature = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        headers.append(f'X-Hub-Signature-256: sha256={signature}')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body
+
+def _events_request(host):
+    return f'GET /api/events?v=2&limit=50 HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1')
+
+async def _read_response(reader):
+    """Read one response; returns (status code, whether the connection stays open)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Server closed the connection')
+    status = int(status_line.split()[1])
+    length = 0
+    chunked = False
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+        elif name == 'connection' and 'close' in value.lower():
+            keep_alive = False
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+async def run_load(url, target='receiver', connections=50, requests=5000, secret=None, commits=3):
+    """Drive a running server and return throughput, latency and status counts"""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    host_header = f'{host}:{port}'
+    body = encode(push_payload(commits))
+    remaining = iter(range(requests))
+    latencies = []
+    statuses = Counter()
+
+    async def client():
+        writer = None
+        try:
+            for _ in remaining:
+                if target == 'receiver':
+                    request = _receiver_request(host_header, body, secret)
+                else:
+                    request = _events_request(host_header)
+                started = time.perf_counter()
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await _read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+                if not keep_alive:
+                    # Servers without keep-alive pay for a new connection per request
+                    writer.close()
+                    writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        'target': target,
+        'connections': connections,
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'latency': latency_summary(latencies),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+def _option(name, default=None, cast=str):
+    if name in sys.argv:
+        return cast(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+def main():
+    result = asyncio.run(run_load(
+        _option('--url', 'http://127.0.0.1:8000'),
+        target=_option('--target', 'receiver'),
+        connections=_option('--connections', 50, int),
+        requests=_option('--requests', 5000, int),
+        secret=_option('--secret')
+    ))
+    write_results('loadgen', result, output_path())
+
+if __name__ == '__main__':
+    main()
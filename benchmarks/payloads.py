@@ -0,0 +1,312 @@
+# benchmarks/payloads.py
+"""
+Realistic GitHub webhook payloads for the benchmarks
+
+The generators follow the shape and key order of real deliveries (large
+repository/user objects, full commit lists). Captured deliveries can be
+used instead by pointing load_corpus() at a directory of JSON files named
+after their event type, e.g. push-1.json or pull_request-merged.json.
+
+    python -m benchmarks.payloads --write DIR
+
+writes the generated corpus in that layout, so a run can be pinned to a
+fixed set of bodies or extended with captured ones.
+
+    python -m benchmarks.payloads --ndjson FILE [--count N]
+
+writes N recorded deliveries in the format import_deliveries.py reads.
+"""
+import glob
+import hashlib
+import hmac
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+OWNER = 'octo-org'
+REPO = 'monorepo'
+
+def _user(login, user_id=1):
+    base = f'https://api.github.com/users/{login}'
+    return {
+        'login': login,
+        'id': user_id,
+        'node_id': f'MDQ6VXNlcj{user_id:08d}',
+        'avatar_url': f'https://avatars.githubusercontent.com/u/{user_id}?v=4',
+        'gravatar_id': '',
+        'url': base,
+        'html_url': f'https://github.com/{login}',
+        'followers_url': f'{base}/followers',
+        'following_url': f'{base}/following{{/other_user}}',
+        'gists_url': f'{base}/gists{{/gist_id}}',
+        'starred_url': f'{base}/starred{{/owner}}{{/repo}}',
+        'subscriptions_url': f'{base}/subscriptions',
+        'organizations_url': f'{base}/orgs',
+        'repos_url': f'{base}/repos',
+        'events_url': f'{base}/events{{/privacy}}',
+        'received_events_url': f'{base}/received_events',
+        'type': 'User',
+        'site_admin': False
+    }
+
+def _repository(owner=OWNER, name=REPO):
+    base = f'https://api.github.com/repos/{owner}/{name}'
+    repository = {
+        'id': 123456789,
+        'node_id': 'R_kgDOHdO0XQ',
+        'name': name,
+        'full_name': f'{owner}/{name}',
+        'private': False,
+        'owner': _user(owner, 9919),
+        'html_url': f'https://github.com/{owner}/{name}',
+        'description': 'A large repository used for webhook benchmarks',
+        'fork': False,
+        'url': base
+    }
+    for resource in ('forks', 'keys', 'collaborators', 'teams', 'hooks', 'issue_events', 'events',
+                     'assignees', 'branches', 'tags', 'blobs', 'git_tags', 'git_refs', 'trees',
+                     'statuses', 'languages', 'stargazers', 'contributors', 'subscribers',
+                     'subscription', 'commits', 'git_commits', 'comments', 'issue_comment',
+                     'contents', 'compare', 'merges', 'archive', 'downloads', 'issues', 'pulls',
+                     'milestones', 'notifications', 'labels', 'releases', 'deployments'):
+        repository[f'{resource}_url'] = f'{base}/{resource}'
+    repository.update({
+        'created_at': '2021-03-01T10:00:00Z',
+        'updated_at': '2026-10-01T10:00:00Z',
+        'pushed_at': '2026-10-17T10:00:00Z',
+        'git_url': f'git://github.com/{owner}/{name}.git',
+        'ssh_url': f'git@github.com:{owner}/{name}.git',
+        'clone_url': f'https://github.com/{owner}/{name}.git',
+        'homepage': None,
+        'size': 204800,
+        'stargazers_count': 1200,
+        'watchers_count': 1200,
+        'language': 'Python',
+        'has_issues': True,
+        'has_projects': True,
+        'has_downloads': True,
+        'has_wiki': False,
+        'has_pages': False,
+        'forks_count': 80,
+        'archived': False,
+        'disabled': False,
+        'open_issues_count': 42,
+        'license': {'key': 'mit', 'name': 'MIT License', 'spdx_id': 'MIT'},
+        'topics': ['ci', 'monorepo', 'webhooks'],
+        'visibility': 'public',
+        'forks': 80,
+        'open_issues': 42,
+        'watchers': 1200,
+        'default_branch': 'main'
+    })
+    return repository
+
+def _commit(index, author='alice', when=None):
+    when = when or datetime(2026, 10, 17, 10, 0, tzinfo=timezone.utc)
+    sha = f'{index:040x}'
+    return {
+        'id': sha,
+        'tree_id': f'{index + 1:040x}',
+        'distinct': True,
+        'message': f'Change {index}: update module {index % 17}\n\nLonger description of the change.',
+        'timestamp': (when - timedelta(minutes=index)).isoformat(),
+        'url': f'https://github.com/{OWNER}/{REPO}/commit/{sha}',
+        'author': {'name': author, 'email': f'{author}@example.com', 'username': author},
+        'committer': {'name': 'GitHub', 'email': 'noreply@github.com', 'username': 'web-flow'},
+        'added': [f'src/module_{index}/new_{n}.py' for n in range(2)],
+        'removed': [],
+        'modified': [f'src/module_{index % 17}/file_{n}.py' for n in range(5)]
+    }
+
+def push_payload(commits=1, ref='refs/heads/main', author='alice'):
+    """Push delivery with the given number of commits"""
+    commit_list = [_commit(index, author) for index in range(commits)]
+    return {
+        'ref': ref,
+        'before': '0' * 40,
+        'after': commit_list[0]['id'] if commit_list else 'f' * 40,
+        'repository': _repository(),
+        'pusher': {'name': author, 'email': f'{author}@example.com'},
+        'organization': _user(OWNER, 9919),
+        'sender': _user(author, 1001),
+        'created': False,
+        'deleted': False,
+        'forced': False,
+        'base_ref': None,
+        'compare': f'https://github.com/{OWNER}/{REPO}/compare/abc...def',
+        'commits': commit_list,
+        'head_commit': commit_list[0] if commit_list else None
+    }
+
+def pull_request_payload(action='opened', merged=False, number=1):
+    """pull_request delivery; closed + merged=True is a merge"""
+    repository = _repository()
+    base = f'https://api.github.com/repos/{OWNER}/{REPO}'
+    pull_request = {
+        'url': f'{base}/pulls/{number}',
+        'id': 900000000 + number,
+        'node_id': 'PR_kwDOHdO0Xc5',
+        'html_url': f'https://github.com/{OWNER}/{REPO}/pull/{number}',
+        'number': number,
+        'state': 'closed' if action == 'closed' else 'open',
+        'locked': False,
+        'title': f'Feature {number}: improve webhook throughput',
+        'user': _user('bob', 1002),
+        'body': 'This pull request changes things.\n' * 20,
+        'created_at': '2026-10-17T09:00:00Z',
+        'updated_at': '2026-10-17T10:30:00Z',
+        'closed_at': '2026-10-17T11:00:00Z' if action == 'closed' else None,
+        'merged_at': '2026-10-17T11:00:00Z' if merged else None,
+        'merge_commit_sha': 'a' * 40,
+        'assignees': [_user('carol', 1003)],
+        'requested_reviewers': [_user('dave', 1004), _user('erin', 1005)],
+        'labels': [{'id': n, 'name': f'label-{n}', 'color': 'ededed', 'default': False} for n in range(3)],
+        'head': {
+            'label': f'{OWNER}:feature-{number}',
+            'ref': f'feature-{number}',
+            'sha': 'b' * 40,
+            'user': _user(OWNER, 9919),
+            'repo': _repository()
+        },
+        'base': {
+            'label': f'{OWNER}:main',
+            'ref': 'main',
+            'sha': 'c' * 40,
+            'user': _user(OWNER, 9919),
+            'repo': _repository()
+        },
+        '_links': {name: {'href': f'{base}/pulls/{number}/{name}'} for name in
+                   ('self', 'html', 'issue', 'comments', 'review_comments', 'commits', 'statuses')},
+        'author_association': 'MEMBER',
+        'draft': False,
+        'merged': merged,
+        'mergeable': None,
+        'merged_by': _user('carol', 1003) if merged else None,
+        'comments': 4,
+        'review_comments': 12,
+        'commits': 7,
+        'additions': 420,
+        'deletions': 69,
+        'changed_files': 11
+    }
+    return {
+        'action': action,
+        'number': number,
+        'pull_request': pull_request,
+        'repository': repository,
+        'organization': _user(OWNER, 9919),
+        'sender': _user('bob', 1002)
+    }
+
+def ping_payload():
+    return {
+        'zen': 'Keep it logically awesome.',
+        'hook_id': 4242,
+        'hook': {'type': 'Repository', 'id': 4242, 'active': True, 'events': ['push', 'pull_request']},
+        'repository': _repository(),
+        'sender': _user('alice', 1001)
+    }
+
+def standard_payloads():
+    """(name, event_type, payload) tuples covering the common delivery shapes"""
+    return [
+        ('push_1_commit', 'push', push_payload(1)),
+        ('push_20_commits', 'push', push_payload(20)),
+        ('push_200_commits', 'push', push_payload(200)),
+        ('push_tag', 'push', push_payload(1, ref='refs/tags/v1.0.0')),
+        ('pull_request_opened', 'pull_request', pull_request_payload('opened')),
+        ('pull_request_merged', 'pull_request', pull_request_payload('closed', merged=True)),
+        ('pull_request_closed', 'pull_request', pull_request_payload('closed')),
+        ('pull_request_labeled', 'pull_request', pull_request_payload('labeled')),
+        ('ping', 'ping', ping_payload())
+    ]
+
+def load_corpus(directory):
+    """(name, event_type, payload) tuples from captured *.json deliveries"""
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        event_type = name.split('-')[0]
+        with open(path) as handle:
+            payloads.append((name, event_type, json.load(handle)))
+    return payloads
+
+def corpus_from_argv():
+    """load_corpus(DIR) when run with --corpus DIR, else standard_payloads()"""
+    if '--corpus' in sys.argv:
+        return load_corpus(sys.argv[sys.argv.index('--corpus') + 1])
+    return standard_payloads()
+
+def encode(payload):
+    """Serialize a payload the way GitHub sends it"""
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def sign(body, secret):
+    """X-Hub-Signature-256 value for a body"""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+def delivery_headers(event_type, body, secret=None, delivery_id=None):
+    """Headers GitHub sends with a delivery, signed when a secret is given"""
+    headers = {
+        'X-GitHub-Event': event_type,
+        'X-GitHub-Delivery': delivery_id or str(uuid.uuid4()),
+        'X-GitHub-Hook-ID': '4242',
+        'User-Agent': 'GitHub-Hookshot/bench',
+        'Content-Type': 'application/json'
+    }
+    if secret:
+        headers['X-Hub-Signature-256'] = sign(body, secret)
+    return headers
+
+def signed_corpus(payloads, secret):
+    """
+    (name, event_type, body, signature) for each payload
+
+    Bodies are encoded and signed once; only the delivery id changes
+    between requests, and it is not covered by the signature.
+    """
+    signed = []
+    for name, event_type, payload in payloads:
+        body = encode(payload)
+        signed.append((name, event_type, body, sign(body, secret) if secret else None))
+    return signed
+
+def write_corpus(directory, payloads=None):
+    """Write payloads as event-name.json files readable by load_corpus()"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, event_type, payload in payloads or standard_payloads():
+        if name == event_type:
+            filename = f'{event_type}.json'
+        else:
+            filename = f"{event_type}-{name[len(event_type) + 1:] if name.startswith(event_type + '_') else name}.json"
+        path = os.path.join(directory, filename)
+        with open(path, 'wb') as handle:
+            handle.write(encode(payload))
+        paths.append(path)
+    return paths
+
+def write_deliveries(path, count, payloads=None, secret=None):
+    """
+    Write count recorded deliveries, cycling through payloads, as the NDJSON
+    file import_deliveries.py reads: {"headers": ..., "body": "<raw body>"}
+    """
+    signed = signed_corpus(payloads or standard_payloads(), secret)
+    with open(path, 'w') as handle:
+        for index in range(count):
+            _, event_type, body, _ = signed[index % len(signed)]
+            headers = delivery_headers(event_type, body, secret, f'recorded-{index}')
+            handle.write(json.dumps({'headers': headers, 'body': body.decode('utf-8')}) + '\n')
+    return path
+
+if __name__ == '__main__':
+    if '--write' in sys.argv:
+        for path in write_corpus(sys.argv[sys.argv.index('--write') + 1]):
+            print(path)
+    elif '--ndjson' in sys.argv:
+        count = int(sys.argv[sys.argv.index('--count') + 1]) if '--count' in sys.argv else 1000
+        print(write_deliveries(sys.argv[sys.argv.index('--ndjson') + 1], count, corpus_from_argv()))
+    else:
+        sys.exit('usage: python -m benchmarks.payloads --write DIR | --ndjson FILE [--count N]')
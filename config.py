@@ -1,4 +1,5 @@
 # config.py
+import json
 import os
 from dotenv import load_dotenv
 
@@ -14,10 +15,216 @@ class Config:
     
     # GitHub Webhook Configuration
     GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET')
+    # Secrets per repository or organization as a JSON object, e.g.
+    # {"octo-org/monorepo": "...", "octo-org": "..."}; the most specific
+    # entry wins and GITHUB_WEBHOOK_SECRET covers the rest
+    GITHUB_WEBHOOK_SECRETS = json.loads(os.environ.get('GITHUB_WEBHOOK_SECRETS') or '{}')
+    # 'config', or 'mongo' to also read the webhook_secrets collection
+    # (`flask secrets set`), re-read every WEBHOOK_SECRETS_REFRESH seconds
+    WEBHOOK_SECRETS_STORE = os.environ.get('WEBHOOK_SECRETS_STORE', 'config').lower()
+    WEBHOOK_SECRETS_REFRESH = float(os.environ.get('WEBHOOK_SECRETS_REFRESH', 60))
     
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
     
+    # MongoDB Client Configuration
+    # Each worker process creates its own client on first use (after
+    # gunicorn forks), so these apply per worker
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 0)) or None
+    # How long a request may wait for a free connection (unset: no limit)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)) or None
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 10000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 0)) or None
+    # GitHub gives up on a delivery after 10 seconds, so fail well before that
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_RETRY_WRITES = os.environ.get('MONGO_RETRY_WRITES', 'True').lower() == 'true'
+    # Write concern: unset keeps the server default; '1', 'majority', ...
+    MONGO_WRITE_CONCERN = os.environ.get('MONGO_WRITE_CONCERN') or None
+    MONGO_JOURNAL = {'true': True, 'false': False}.get(os.environ.get('MONGO_JOURNAL', '').lower())
+    MONGO_WRITE_TIMEOUT_MS = int(os.environ.get('MONGO_WRITE_TIMEOUT_MS', 0)) or None
+    # Wire compression, e.g. 'zstd,snappy,zlib' (zstd and snappy need the
+    # zstandard / python-snappy packages)
+    MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS') or None
+    
+    # Create collection indexes when the app starts
+    MONGO_CREATE_INDEXES = os.environ.get('MONGO_CREATE_INDEXES', 'True').lower() == 'true'
+    
+    # Webhook payload JSON parser: 'auto' (simdjson, then orjson, then the
+    # stdlib), 'simdjson', 'orjson' or 'json'
+    JSON_PARSER = os.environ.get('JSON_PARSER', 'auto').lower()
+    
+    # Event types the receiver handles, comma separated (unset: every
+    # built-in handler: push, pull_request, issues, release, workflow_run,
+    # check_suite); other events are dropped before their body is parsed
+    WEBHOOK_EVENTS = [name.strip() for name in os.environ.get('WEBHOOK_EVENTS', '').split(',') if name.strip()] or None
+    
+    # Store every commit of a push in webhook_commits, not just the first
+    PUSH_EXPANSION_ENABLED = os.environ.get('PUSH_EXPANSION_ENABLED', 'False').lower() == 'true'
+    
+    # Statistics Rollup Configuration
+    # Per-minute/hour/day counts by action, repository and author, flushed
+    # as batched $inc upserts every STATS_FLUSH_INTERVAL seconds
+    STATS_ENABLED = os.environ.get('STATS_ENABLED', 'True').lower() == 'true'
+    STATS_FLUSH_INTERVAL = float(os.environ.get('STATS_FLUSH_INTERVAL', 1))
+    # Most buckets one /api/stats request may span
+    STATS_MAX_BUCKETS = int(os.environ.get('STATS_MAX_BUCKETS', 1500))
+    
+    # Payload Offload Configuration
+    # Verify, parse and build bodies of at least OFFLOAD_THRESHOLD_BYTES in a
+    # process pool so the CPU work does not hold the web worker's GIL
+    OFFLOAD_ENABLED = os.environ.get('OFFLOAD_ENABLED', 'False').lower() == 'true'
+    OFFLOAD_THRESHOLD_BYTES = int(os.environ.get('OFFLOAD_THRESHOLD_BYTES', 1048576))
+    OFFLOAD_WORKERS = int(os.environ.get('OFFLOAD_WORKERS', 2))
+    OFFLOAD_TIMEOUT = float(os.environ.get('OFFLOAD_TIMEOUT', 30))
+    # 'forkserver', 'spawn' or 'fork'
+    OFFLOAD_START_METHOD = os.environ.get('OFFLOAD_START_METHOD', 'forkserver').lower()
+    
+    # Delivery Deduplication Configuration
+    # In-memory seen-set of X-GitHub-Delivery ids in front of the unique index
+    DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', 'True').lower() == 'true'
+    DEDUP_CACHE_SIZE = int(os.environ.get('DEDUP_CACHE_SIZE', 100000))
+    DEDUP_TTL = int(os.environ.get('DEDUP_TTL', 86400))
+    
+    # Batched Write Configuration
+    # Group inserts into unordered insert_many batches, flushed at a size
+    # threshold or a max-latency deadline, whichever comes first
+    MONGO_BATCH_WRITES = os.environ.get('MONGO_BATCH_WRITES', 'False').lower() == 'true'
+    MONGO_BATCH_SIZE = int(os.environ.get('MONGO_BATCH_SIZE', 100))
+    MONGO_BATCH_MAX_LATENCY_MS = int(os.environ.get('MONGO_BATCH_MAX_LATENCY_MS', 20))
+    MONGO_BATCH_RESULT_TIMEOUT = float(os.environ.get('MONGO_BATCH_RESULT_TIMEOUT', 30))
+    
+    # Ingest Configuration
+    # 'sync' saves each delivery inside the request, 'async' acknowledges with
+    # 202 and lets a background worker pool parse and persist it
+    INGEST_MODE = os.environ.get('INGEST_MODE', 'sync').lower()
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', 1000))
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 4))
+    INGEST_RETRY_AFTER = int(os.environ.get('INGEST_RETRY_AFTER', 5))
+    INGEST_DRAIN_TIMEOUT = float(os.environ.get('INGEST_DRAIN_TIMEOUT', 10))
+    
+    # Admission Control Configuration
+    # Each webhook source (repository, organization or app installation) may
+    # send RATE_LIMIT_BURST verified deliveries at once, refilled at
+    # RATE_LIMIT_PER_MINUTE; more get 429. Before verification each client
+    # address gets RATE_LIMIT_ADDRESS_BURST / RATE_LIMIT_ADDRESS_PER_MINUTE
+    # (0 disables it); GitHub delivers every hook from a few shared
+    # addresses, so this bounds all GitHub traffic to one host. Load shedding answers 503 once
+    # the receiver requests in flight across workers reach a bound that
+    # shrinks toward SHED_MIN_IN_FLIGHT while MongoDB writes take longer than
+    # SHED_TARGET_LATENCY_MS and grows back toward SHED_MAX_IN_FLIGHT. The
+    # counters are kept in ADMISSION_STATE_FILE, memory-mapped by every
+    # worker on the host (ADMISSION_STORE 'shared'), or per process ('local')
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'False').lower() == 'true'
+    RATE_LIMIT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_PER_MINUTE', 600))
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 120))
+    RATE_LIMIT_ADDRESS_PER_MINUTE = int(os.environ.get('RATE_LIMIT_ADDRESS_PER_MINUTE', 6000))
+    RATE_LIMIT_ADDRESS_BURST = int(os.environ.get('RATE_LIMIT_ADDRESS_BURST', 1200))
+    SHEDDING_ENABLED = os.environ.get('SHEDDING_ENABLED', 'False').lower() == 'true'
+    SHED_TARGET_LATENCY_MS = int(os.environ.get('SHED_TARGET_LATENCY_MS', 250))
+    SHED_MIN_IN_FLIGHT = int(os.environ.get('SHED_MIN_IN_FLIGHT', 4))
+    SHED_MAX_IN_FLIGHT = int(os.environ.get('SHED_MAX_IN_FLIGHT', 64))
+    SHED_RETRY_AFTER = int(os.environ.get('SHED_RETRY_AFTER', 5))
+    ADMISSION_STORE = os.environ.get('ADMISSION_STORE', 'shared').lower()
+    ADMISSION_STATE_FILE = os.environ.get('ADMISSION_STATE_FILE', '')
+    ADMISSION_BUCKETS = int(os.environ.get('ADMISSION_BUCKETS', 4096))
+    
+    # Delivery Spool Configuration
+    # Deliveries MongoDB fails on (or takes longer than SPOOL_SAVE_TIMEOUT_MS
+    # to store) are appended to segment files in SPOOL_DIR, acknowledged with
+    # 202 and replayed in bulk once the database is back
+    SPOOL_ENABLED = os.environ.get('SPOOL_ENABLED', 'False').lower() == 'true'
+    SPOOL_DIR = os.environ.get('SPOOL_DIR', 'spool')
+    SPOOL_SEGMENT_BYTES = int(os.environ.get('SPOOL_SEGMENT_BYTES', 67108864))
+    SPOOL_FSYNC = os.environ.get('SPOOL_FSYNC', 'True').lower() == 'true'
+    SPOOL_SAVE_TIMEOUT_MS = int(os.environ.get('SPOOL_SAVE_TIMEOUT_MS', 2000))
+    SPOOL_REPLAY_INTERVAL = float(os.environ.get('SPOOL_REPLAY_INTERVAL', 2))
+    SPOOL_REPLAY_BATCH = int(os.environ.get('SPOOL_REPLAY_BATCH', 500))
+    
+    # Retention Configuration
+    # RETENTION_MODE 'none' keeps every event in webhook_events, 'ttl' lets a
+    # TTL index delete events older than RETENTION_DAYS and 'archive' moves
+    # them every RETENTION_INTERVAL seconds (0: only `flask retention
+    # archive`) into monthly webhook_events_archive_YYYY_MM collections
+    # compressed with ARCHIVE_COMPRESSOR, which the API still reads
+    RETENTION_MODE = os.environ.get('RETENTION_MODE', 'none').lower()
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 90))
+    RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', 3600))
+    RETENTION_BATCH = int(os.environ.get('RETENTION_BATCH', 1000))
+    # 'zstd', 'zlib', 'snappy' or 'none'
+    ARCHIVE_COMPRESSOR = os.environ.get('ARCHIVE_COMPRESSOR', 'zstd').lower()
+    
+    # Tenant Routing Configuration
+    # TENANT_ROUTING 'none' stores every event in webhook_events,
+    # 'collection' gives each repository owner in TENANT_OWNERS (unset:
+    # every owner) its own webhook_events_tenant_<owner> collection, read
+    # back by fanning out over TENANT_FANOUT_WORKERS threads, and 'shard'
+    # shards webhook_events on (repository_owner, repository_name)
+    TENANT_ROUTING = os.environ.get('TENANT_ROUTING', 'none').lower()
+    TENANT_OWNERS = [name.strip() for name in os.environ.get('TENANT_OWNERS', '').split(',') if name.strip()] or None
+    TENANT_FANOUT_WORKERS = int(os.environ.get('TENANT_FANOUT_WORKERS', 8))
+    
+    # Hot Collection Configuration
+    # Capped webhook_events_hot collection with the newest events, read by
+    # the dashboard listing when the recent events cache cannot answer
+    HOT_COLLECTION_ENABLED = os.environ.get('HOT_COLLECTION_ENABLED', 'False').lower() == 'true'
+    HOT_COLLECTION_SIZE = int(os.environ.get('HOT_COLLECTION_SIZE', 1000))
+    HOT_COLLECTION_MAX_BYTES = int(os.environ.get('HOT_COLLECTION_MAX_BYTES', 4194304))
+    
+    # API Caching Configuration
+    # Seconds between re-reads of the collection version behind API ETags
+    EVENTS_VERSION_TTL = float(os.environ.get('EVENTS_VERSION_TTL', 2))
+    # max-age sent to browsers, CDNs and reverse proxies for event listings
+    API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 5))
+    # Largest page /api/events will return
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+    
+    # Response Encoding Configuration
+    # JSON encoder of API responses: 'auto' (orjson when installed) or 'json'
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto').lower()
+    # Responses of at least COMPRESSION_MIN_SIZE bytes are compressed with
+    # the first of COMPRESSION_CODINGS the client accepts ('br' needs the
+    # brotli package)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_CODINGS = [
+        name.strip().lower() for name in os.environ.get('COMPRESSION_CODINGS', 'br,gzip').split(',') if name.strip()
+    ]
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # Recent Events Cache Configuration
+    # Newest events kept in memory for /api/events, /api/events/latest and
+    # /webhook/status. RECENT_CACHE_SYNC picks how writes from other workers
+    # are seen: 'auto' (change stream, else polling), 'change_stream', 'poll'
+    # or 'none' (single worker process)
+    RECENT_CACHE_ENABLED = os.environ.get('RECENT_CACHE_ENABLED', 'True').lower() == 'true'
+    RECENT_CACHE_SIZE = int(os.environ.get('RECENT_CACHE_SIZE', 200))
+    RECENT_CACHE_SYNC = os.environ.get('RECENT_CACHE_SYNC', 'auto').lower()
+    RECENT_CACHE_POLL_INTERVAL = float(os.environ.get('RECENT_CACHE_POLL_INTERVAL', 1))
+    
+    # Live Event Stream Configuration
+    SSE_ENABLED = os.environ.get('SSE_ENABLED', 'True').lower() == 'true'
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+    SSE_HISTORY_SIZE = int(os.environ.get('SSE_HISTORY_SIZE', 100))
+    SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', 500))
+    SSE_SUBSCRIBER_QUEUE_SIZE = int(os.environ.get('SSE_SUBSCRIBER_QUEUE_SIZE', 100))
+    
+    # Metrics Configuration
+    # Prometheus counters and latency histograms served at /metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    # Logging Configuration
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    # 'text' or 'json' (one object per line with delivery_id/event/repository)
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+    # Fraction of routine success-path records kept; warnings and errors
+    # are never sampled
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+    # Format and write records on a background thread
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', 'True').lower() == 'true'
+
     # Application Configuration
     HOST = os.environ.get('HOST', '127.0.0.1')
     PORT = int(os.environ.get('PORT', 5000))
@@ -26,11 +233,15 @@ class DevelopmentConfig(Config):
     DEBUG = True
     # Disable webhook signature verification in development
     GITHUB_WEBHOOK_SECRET = None
+    GITHUB_WEBHOOK_SECRETS = {}
+    WEBHOOK_SECRETS_STORE = 'config'
 
 class ProductionConfig(Config):
     DEBUG = False
     # Enable webhook signature verification in production
     GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET')
+    GITHUB_WEBHOOK_SECRETS = json.loads(os.environ.get('GITHUB_WEBHOOK_SECRETS') or '{}')
+    WEBHOOK_SECRETS_STORE = os.environ.get('WEBHOOK_SECRETS_STORE', 'config').lower()
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+from app import create_app
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import recorded GitHub deliveries from an NDJSON file (one {"headers", "body"} object per line).'
+    )
+    parser.add_argument('path', help="Delivery file; .gz is decompressed and '-' reads stdin")
+    parser.add_argument('--workers', type=int,
+                        help='Parser processes (0 parses in this process; default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Events per insert_many (default: 1000)')
+    parser.add_argument('--chunk-lines', type=int, default=500, help='Lines handed to a parser process at a time')
+    parser.add_argument('--dedup-window', type=int, default=1000000,
+                        help='Delivery ids remembered for in-file deduplication (default: 1000000)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check X-Hub-Signature-256 against the repository\'s webhook secret and skip mismatches')
+    parser.add_argument('--quiet', action='store_true', help='Only print the final summary')
+    args = parser.parse_args()
+
+    # Create Flask app (configuration and logging from the usual settings)
+    app = create_app(os.environ.get('FLASK_CONFIG', 'default'))
+
+    from app.models.webhook_event import stats_rollups
+    from app.webhook.importer import DeliveryImporter
+    from app.webhook.signing import webhook_secrets
+
+    secrets = None
+    if args.verify:
+        # Per-repository and per-organization secrets as well as the default
+        secrets = webhook_secrets.snapshot()
+        if not secrets:
+            sys.exit('--verify needs GITHUB_WEBHOOK_SECRET or GITHUB_WEBHOOK_SECRETS')
+
+    def progress(summary, final):
+        if args.quiet and not final:
+            return
+        percent = f" ({summary['percent']}%)" if 'percent' in summary else ''
+        print(
+            f"{'Done' if final else 'Progress'}{percent}: {summary['lines']} deliveries, {summary['stored']} stored, "
+            f"{summary['duplicates']} duplicates, {summary['ignored']} ignored, {summary['rejected']} rejected, "
+            f"{summary['invalid']} invalid, {summary['lines_per_sec']}/s",
+            file=sys.stderr, flush=True
+        )
+
+    importer = DeliveryImporter(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_lines=args.chunk_lines,
+        dedup_window=args.dedup_window,
+        secrets=secrets,
+        start_method=app.config.get('OFFLOAD_START_METHOD', 'forkserver'),
+        progress=progress
+    )
+    with app.app_context():
+        importer.run(args.path)
+        # Write the rollup increments of the imported events now
+        stats_rollups.flush()
+
+if __name__ == '__main__':
+    main()
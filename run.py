@@ -1,14 +1,7 @@
 import os
-import logging
 from app import create_app
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
-# Create Flask app
+# Create Flask app (logging is configured from LOG_* settings)
 config_name = os.environ.get('FLASK_CONFIG', 'default')
 app = create_app(config_name)
 